@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# diff the view json files exported by vplot --export, e.g. for regression checks over replayed dumps.
+# exits with 1 if any difference is found.
+
+import sys
+import json
+import argparse
+import importlib.util
+from pathlib import Path
+
+dir_scripts = Path(__file__).parent.absolute()
+dir_project = dir_scripts.parent
+
+# load snapshot/diff.py by path, since importing the visualinux package requires gdb
+spec = importlib.util.spec_from_file_location('snapshot_diff', dir_project / 'visualinux' / 'snapshot' / 'diff.py')
+snapshot_diff = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(snapshot_diff)
+
+def main():
+    parser = argparse.ArgumentParser(description='diff two exported views (json files) or two export directories')
+    parser.add_argument('src', type=Path)
+    parser.add_argument('dst', type=Path)
+    parser.add_argument('--json', action='store_true', help='print the whole diff document')
+    args = parser.parse_args()
+
+    diff = snapshot_diff.diff_files(args.src, args.dst)
+    if args.json:
+        print(json.dumps(diff, indent=4))
+    else:
+        print(snapshot_diff.summarize(diff))
+    sys.exit(0 if snapshot_diff.is_empty(diff) else 1)
+
+if __name__ == '__main__':
+    main()
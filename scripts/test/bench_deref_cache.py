@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# micro-benchmark of the KValue dereference cache on a 10k-node list walk.
+# the list is built on the target memory of the fake gdb module (see tests/fake_gdb.py),
+# and walked by KValue.dereference() as the List container does, with the cache on and off.
+# note that a miss only costs a page cache lookup on the fake target, while it costs a gdb read on a live one,
+# so the speedup here is a lower bound.
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parents[2]))
+
+from tests import fake_gdb
+fake_gdb.install()
+
+import visualinux.dsl.parser.parser
+from visualinux.runtime.kvalue import KValue
+from visualinux.runtime.gdb.adaptor import gdb_adaptor
+from visualinux.runtime.gdb.type import GDBType
+
+NODES  = 10000
+ROUNDS = 20
+BASE   = 0x10000000
+STRIDE = 0x40
+
+def build_list() -> GDBType:
+    '''a circular list of NODES list_heads, and the type of the pointer to their next fields.
+    '''
+    list_head = fake_gdb.declare_struct('struct list_head')
+    fake_gdb.define_struct('struct list_head', [('next', list_head.pointer()), ('prev', list_head.pointer())])
+    for i in range(NODES):
+        fake_gdb.memory.write_int(BASE + i * STRIDE, BASE + (i + 1) % NODES * STRIDE)
+        fake_gdb.memory.write_int(BASE + i * STRIDE + 8, BASE + (i - 1) % NODES * STRIDE)
+    return GDBType(list_head.pointer().pointer())
+
+def walk(pnext: GDBType) -> float:
+    KValue.reset()
+    gdb_adaptor.reset()
+    tstart = time.perf_counter()
+    for _ in range(ROUNDS):
+        node = KValue(pnext, BASE)
+        for _ in range(NODES):
+            node = KValue(pnext, node.dereference().value)
+    assert node.value == BASE
+    return time.perf_counter() - tstart
+
+def walk_uncached(pnext: GDBType) -> float:
+    '''the same walk where nothing is ever put into the cache, i.e. every dereference reads the memory.
+    '''
+    put = KValue._KValue__dereference_cache_put # type: ignore
+    KValue._KValue__dereference_cache_put = classmethod(lambda cls, key, kobj: None) # type: ignore
+    try:
+        return walk(pnext)
+    finally:
+        KValue._KValue__dereference_cache_put = put # type: ignore
+
+if __name__ == '__main__':
+    pnext = build_list()
+    walk(pnext) # warm up the type and field caches
+    t_off = walk_uncached(pnext)
+    t_on = walk(pnext)
+    steps = NODES * ROUNDS
+    print(f'{NODES} nodes x {ROUNDS} rounds')
+    print(f'cache off: {t_off * 1000:8.1f} ms ({t_off / steps * 1e9:6.0f} ns/node)')
+    print(f'cache on:  {t_on * 1000:8.1f} ms ({t_on / steps * 1e9:6.0f} ns/node)')
+    print(f'speedup:   {t_off / t_on:8.2f}x')
@@ -0,0 +1,28 @@
+# The tests run either inside gdb (e.g. gdb -batch -ex 'python import pytest; pytest.main(["tests"])'),
+# where the expressions are also checked against gdb itself, or standalone with the fake gdb module.
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parents[1]))
+
+try:
+    import gdb
+except ImportError:
+    from tests import fake_gdb
+    fake_gdb.install()
+
+# the same import order as core.py, which resolves the import cycles among the visualinux modules
+import visualinux.dsl.parser.parser
+
+import pytest
+
+@pytest.fixture
+def fake_gdb():
+    '''the fake gdb module with a clean target memory, for the tests that do not run against a real target.
+    '''
+    import gdb
+    if not getattr(gdb, 'FAKE', False):
+        pytest.skip('requires the fake gdb module')
+    gdb.memory.clear()
+    yield gdb
+    gdb.memory.clear()
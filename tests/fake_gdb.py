@@ -0,0 +1,336 @@
+# A minimal stand-in of the gdb python module, installed by conftest.py when the tests do not run inside gdb.
+# It only models what the pure-python parts of visualinux touch: a C type system with a few basic types,
+# structs declared by the tests, global symbols and a sparse little-endian target memory.
+
+FAKE = True
+VERSION = 'fake'
+
+TYPE_CODE_PTR    = 1
+TYPE_CODE_ARRAY  = 2
+TYPE_CODE_STRUCT = 3
+TYPE_CODE_UNION  = 4
+TYPE_CODE_ENUM   = 5
+TYPE_CODE_FUNC   = 7
+TYPE_CODE_INT    = 8
+TYPE_CODE_VOID   = 10
+TYPE_CODE_CHAR   = 19
+TYPE_CODE_BOOL   = 20
+TYPE_CODE_TYPEDEF = 23
+
+SYMBOL_LOC_CONST   = 2
+SYMBOL_LOC_STATIC  = 4
+SYMBOL_LOC_TYPEDEF = 8
+SYMBOL_LOC_BLOCK   = 10
+
+COMMAND_USER = 13
+
+class error(RuntimeError):
+    pass
+
+class MemoryError(error):
+    pass
+
+class Command:
+    def __init__(self, name: str, command_class: int, *args) -> None:
+        self.name = name
+
+class Field:
+    def __init__(self, name: str, type: 'Type', bitpos: int) -> None:
+        self.name = name
+        self.type = type
+        self.bitpos = bitpos
+
+class Type:
+    def __init__(self, name: str, code: int, sizeof: int, target: 'Type | None' = None,
+                 fields: 'list[Field] | None' = None, length: int | None = None) -> None:
+        self.name = name
+        self.code = code
+        self.sizeof = sizeof
+        self.objfile = None
+        self.__target = target
+        self.__fields = fields or []
+        self.__length = length
+        self.__pointer: Type | None = None
+        self.__unqualified = self
+
+    def __str__(self) -> str:
+        return self.name
+
+    @property
+    def is_scalar(self) -> bool:
+        return self.strip_typedefs().code in (TYPE_CODE_INT, TYPE_CODE_CHAR, TYPE_CODE_BOOL, TYPE_CODE_ENUM, TYPE_CODE_PTR)
+
+    def target(self) -> 'Type':
+        if self.__target is None:
+            raise error(f'Type {self.name} does not have a target.')
+        return self.__target
+
+    def pointer(self) -> 'Type':
+        if self.__pointer is None:
+            name = self.name + '*' if self.name.endswith('*') else self.name + ' *'
+            self.__pointer = Type(name, TYPE_CODE_PTR, 8, target=self)
+        return self.__pointer
+
+    def array(self, last: int) -> 'Type':
+        return Type(f'{self.name} [{last + 1}]', TYPE_CODE_ARRAY, self.sizeof * (last + 1), target=self, length=last + 1)
+
+    def range(self) -> tuple[int, int]:
+        if self.__length is None:
+            raise error('This type does not have a range.')
+        return 0, self.__length - 1
+
+    def fields(self) -> list[Field]:
+        return self.__fields
+
+    def set_fields(self, fields: list[Field], sizeof: int) -> None:
+        self.__fields = fields
+        self.sizeof = sizeof
+
+    def strip_typedefs(self) -> 'Type':
+        return self.target().strip_typedefs() if self.code == TYPE_CODE_TYPEDEF else self
+
+    def const(self) -> 'Type':
+        return self.qualified('const')
+
+    def volatile(self) -> 'Type':
+        return self.qualified('volatile')
+
+    def qualified(self, qualifier: str) -> 'Type':
+        qualified = Type(f'{qualifier} {self.name}', self.code, self.sizeof, self.__target, self.__fields, self.__length)
+        qualified.__unqualified = self.__unqualified
+        return qualified
+
+    def unqualified(self) -> 'Type':
+        return self.__unqualified
+
+def int_type(name: str, size: int) -> Type:
+    return Type(name, TYPE_CODE_INT, size)
+
+types: dict[str, Type] = {
+    'void': Type('void', TYPE_CODE_VOID, 1),
+    'bool': Type('bool', TYPE_CODE_BOOL, 1),
+    '_Bool': Type('_Bool', TYPE_CODE_BOOL, 1),
+}
+for _name, _size in [('char', 1), ('short', 2), ('int', 4), ('long', 8), ('long long', 8)]:
+    types[_name] = int_type(_name, _size)
+    types[f'unsigned {_name}'] = int_type(f'unsigned {_name}', _size)
+types['signed char'] = int_type('signed char', 1)
+
+def define_typedef(name: str, target: Type) -> Type:
+    types[name] = Type(name, TYPE_CODE_TYPEDEF, target.sizeof, target=target)
+    return types[name]
+
+# the fixed-size integer types are typedefs as in the kernel, whose signedness is only known from their base types
+for _size, _base in [(8, 'signed char'), (16, 'short'), (32, 'int'), (64, 'long long')]:
+    _unsigned = 'unsigned ' + _base.removeprefix('signed ')
+    define_typedef(f'int{_size}_t', types[_base])
+    define_typedef(f's{_size}', types[_base])
+    define_typedef(f'uint{_size}_t', types[_unsigned])
+    define_typedef(f'u{_size}', types[_unsigned])
+define_typedef('uintptr_t', types['unsigned long'])
+
+def declare_struct(name: str, code: int = TYPE_CODE_STRUCT) -> Type:
+    '''declare an incomplete struct (or union), e.g. to be referred by pointers in its own members.
+    '''
+    if name not in types:
+        types[name] = Type(name, code, 0)
+    return types[name]
+
+def define_struct(name: str, members: list[tuple[str, Type]], code: int = TYPE_CODE_STRUCT) -> Type:
+    '''define a struct (or union) whose members are laid out in order with natural alignment.
+    '''
+    fields: list[Field] = []
+    offset = align = 0
+    for field_name, field_type in members:
+        field_align = min(field_type.sizeof, 8) if field_type.code != TYPE_CODE_ARRAY else min(field_type.target().sizeof, 8)
+        field_align = max(field_align, 1)
+        align = max(align, field_align)
+        if code == TYPE_CODE_STRUCT:
+            offset = (offset + field_align - 1) // field_align * field_align
+        fields.append(Field(field_name, field_type, offset * 8))
+        if code == TYPE_CODE_STRUCT:
+            offset += field_type.sizeof
+        else:
+            offset = max(offset, field_type.sizeof)
+    align = max(align, 1)
+    gtype = declare_struct(name, code)
+    gtype.set_fields(fields, (offset + align - 1) // align * align)
+    return gtype
+
+# kernel types that are looked up when the visualinux modules are imported
+
+define_struct('struct xa_node', [
+    ('shift',     types['unsigned char']),
+    ('offset',    types['unsigned char']),
+    ('count',     types['unsigned char']),
+    ('nr_values', types['unsigned char']),
+    ('parent',    declare_struct('struct xa_node').pointer()),
+    ('array',     types['void'].pointer()),
+    ('slots',     types['void'].pointer().array(63)),
+])
+
+def lookup_type(name: str) -> Type:
+    if name not in types:
+        raise error(f'No type named {name}.')
+    return types[name]
+
+def parse_type(name: str) -> Type:
+    name = name.strip()
+    if name.endswith('*'):
+        return parse_type(name[: -1]).pointer()
+    return lookup_type(name)
+
+#
+# target memory, in sparse 4K pages
+#
+
+PAGE_SIZE = 0x1000
+
+class Memory:
+
+    def __init__(self) -> None:
+        self.pages: dict[int, bytearray] = {}
+        self.reads = 0
+
+    def clear(self) -> None:
+        self.pages.clear()
+        self.reads = 0
+
+    def write(self, addr: int, data: bytes) -> None:
+        for i, byte in enumerate(data):
+            page = self.pages.setdefault((addr + i) // PAGE_SIZE, bytearray(PAGE_SIZE))
+            page[(addr + i) % PAGE_SIZE] = byte
+
+    def write_int(self, addr: int, value: int, size: int = 8) -> None:
+        self.write(addr, (value % (1 << (size * 8))).to_bytes(size, 'little'))
+
+    def read(self, addr: int, size: int) -> bytes:
+        self.reads += 1
+        chunks: list[bytes] = []
+        for pgno in range(addr // PAGE_SIZE, (addr + size - 1) // PAGE_SIZE + 1):
+            if pgno not in self.pages:
+                raise MemoryError(f'Cannot access memory at address {max(addr, pgno * PAGE_SIZE):#x}')
+            chunks.append(bytes(self.pages[pgno]))
+        offset = addr % PAGE_SIZE
+        return b''.join(chunks)[offset : offset + size]
+
+memory = Memory()
+
+class Inferior:
+    def read_memory(self, addr: int, size: int) -> memoryview:
+        return memoryview(memory.read(addr, size))
+
+def selected_inferior() -> Inferior:
+    return Inferior()
+
+class Value:
+    def __init__(self, value: 'int | Value', type: Type | None = None) -> None:
+        self.__value = int(value)
+        self.type = type or types['long']
+        self.address: Value | None = None
+
+    def __int__(self) -> int:
+        return self.__value
+
+    def __index__(self) -> int:
+        return self.__value
+
+    def cast(self, type: Type) -> 'Value':
+        return Value(self.__value, type)
+
+    def dereference(self) -> 'Value':
+        target = self.type.target()
+        value = Value(int.from_bytes(memory.read(self.__value, target.sizeof), 'little', signed=not target.name.startswith('u')), target)
+        value.address = Value(self.__value, self.type)
+        return value
+
+    def __getitem__(self, name: str) -> 'Value':
+        struct = self.type.target() if self.type.code == TYPE_CODE_PTR else self.type
+        for field in struct.fields():
+            if field.name == name:
+                value = Value(0, field.type)
+                value.address = Value(self.__value + field.bitpos // 8, field.type.pointer())
+                return value
+        raise error(f'There is no member named {name}.')
+
+def parse_and_eval(expr: str) -> Value:
+    '''only the type expressions used to resolve type names, e.g. "((struct foo *) 0)" and "sizeof(int)".
+    '''
+    expr = expr.strip()
+    if expr.startswith('((') and expr.endswith('0)'):
+        return Value(0, parse_type(expr[2 : expr.rindex(')', 0, -1)]))
+    if expr.startswith('sizeof(') and expr.endswith(')'):
+        return Value(parse_type(expr[7 : -1]).sizeof, types['unsigned long'])
+    raise error(f'fake gdb cannot evaluate {expr!r}')
+
+#
+# symbols
+#
+
+class Symbol:
+    def __init__(self, name: str, type: Type, addr_class: int, address: int = 0, value: int = 0) -> None:
+        self.name = name
+        self.type = type
+        self.addr_class = addr_class
+        self.__address = address
+        self.__value = value
+
+    def value(self) -> Value:
+        if self.addr_class == SYMBOL_LOC_CONST:
+            return Value(self.__value, self.type)
+        value = Value(0, self.type)
+        value.address = Value(self.__address, self.type.pointer())
+        return value
+
+symbols: dict[str, Symbol] = {}
+
+def define_symbol(name: str, type: Type, address: int) -> Symbol:
+    symbols[name] = Symbol(name, type, SYMBOL_LOC_STATIC, address=address)
+    return symbols[name]
+
+def define_const(name: str, type: Type, value: int) -> Symbol:
+    symbols[name] = Symbol(name, type, SYMBOL_LOC_CONST, value=value)
+    return symbols[name]
+
+def lookup_global_symbol(name: str) -> Symbol | None:
+    return symbols.get(name)
+
+def lookup_static_symbol(name: str) -> Symbol | None:
+    return None
+
+#
+# misc
+#
+
+def execute(command: str, from_tty: bool = False, to_string: bool = False) -> str:
+    if command == 'show endian':
+        return 'The target endianness is set automatically (currently little endian).'
+    raise error(f'fake gdb cannot execute {command!r}')
+
+def newest_frame() -> None:
+    '''no frame, as if the target is not running.
+    '''
+    return None
+
+class Objfile:
+    filename = 'vmlinux'
+    build_id = 'fake-gdb'
+
+def objfiles() -> list[Objfile]:
+    return [Objfile()]
+
+def string_to_argv(arg: str) -> list[str]:
+    return arg.split()
+
+def install() -> None:
+    '''install this module as gdb, together with the kernel gdb scripts (linux.*) that are loaded with vmlinux.
+    '''
+    import sys, types
+    linux = types.ModuleType('linux')
+    cpus = types.ModuleType('linux.cpus')
+    cpus.get_current_cpu = lambda: 0
+    cpus.each_possible_cpu = lambda: iter([0])
+    linux.cpus = cpus
+    sys.modules['gdb'] = sys.modules[__name__]
+    sys.modules['linux'] = linux
+    sys.modules['linux.cpus'] = cpus
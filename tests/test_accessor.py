@@ -0,0 +1,40 @@
+import pytest
+
+from visualinux.runtime.accessor import FieldPath
+from visualinux.runtime.kvalue import KValue
+from visualinux.runtime.gdb.adaptor import gdb_adaptor
+from visualinux.runtime.gdb.type import GDBType
+
+OBJ = 0x7000
+
+def anonymous_struct(fake_gdb, members: list[tuple[str, int]]):
+    '''an anonymous "struct {...}" whose long members are at the given offsets.
+    '''
+    long = fake_gdb.lookup_type('long')
+    gtype = fake_gdb.Type('struct {...}', fake_gdb.TYPE_CODE_STRUCT, 0)
+    gtype.set_fields([fake_gdb.Field(name, long, offset * 8) for name, offset in members], 16)
+    return gtype.pointer()
+
+@pytest.fixture
+def same_named(fake_gdb):
+    first  = GDBType(anonymous_struct(fake_gdb, [('y', 0), ('x', 8)]))
+    second = GDBType(anonymous_struct(fake_gdb, [('x', 0), ('y', 8)]))
+    fake_gdb.memory.write_int(OBJ, 1)
+    fake_gdb.memory.write_int(OBJ + 8, 2)
+    gdb_adaptor.reset()
+    yield first, second
+    gdb_adaptor.reset()
+
+def test_plan_offsets(same_named) -> None:
+    first, _ = same_named
+    plan = FieldPath.compile(first, ['x'])
+    assert [(op.offset, op.deref) for op in plan.ops] == [(8, False)]
+    assert FieldPath.compile(first, ['x']) is plan
+
+def test_same_named_types_have_their_own_plans(same_named) -> None:
+    first, second = same_named
+    assert first is not second and first.name == second.name
+    assert FieldPath.compile(first, ['x']).ops[0].offset == 8
+    assert FieldPath.compile(second, ['x']).ops[0].offset == 0
+    assert KValue(first, OBJ).eval_field('x').address == OBJ + 8
+    assert KValue(second, OBJ).eval_field('x').address == OBJ
@@ -0,0 +1,175 @@
+import gdb
+import pytest
+
+from visualinux.runtime.cexpr import cexpr_evaluate, tokenize, Parser, CExprUnsupported
+from visualinux.runtime.gdb.adaptor import gdb_adaptor
+
+IS_FAKE_GDB = getattr(gdb, 'FAKE', False)
+
+def evaluate(expr: str) -> tuple[str, int] | None:
+    if (evaled := cexpr_evaluate(expr)) is None:
+        return None
+    gtype, value = evaled
+    return gtype.name, value
+
+# (expr, type name, value) as evaluated by gdb, i.e. with the integer semantics of C on LP64
+ARITHMETIC_CASES = [
+    # precedence and associativity
+    ('1 + 2 * 3',               'int', 7),
+    ('(1 + 2) * 3',             'int', 9),
+    ('10 - 3 - 2',              'int', 5),
+    ('64 / 4 / 2',              'int', 8),
+    ('2 * 3 % 4',               'int', 2),
+    ('1 << 2 + 1',              'int', 8),
+    ('1 + 2 * 3 << 1',          'int', 14),
+    ('1 | 2 & 3',               'int', 3),
+    ('1 ^ 3 & 1',               'int', 0),
+    ('6 & 3 == 3',              'int', 0),
+    ('1 < 2 == 1',              'int', 1),
+    ('0 || 1 && 0',             'int', 0),
+    ('!0 + 1',                  'int', 2),
+    ('-2 * -3',                 'int', 6),
+    ('~0',                      'int', -1),
+    ('0 ? 1 : 0 ? 2 : 3',       'int', 3),
+    ('1 ? 2 : 3 ? 4 : 5',       'int', 2),
+    # division truncates toward zero, and the remainder takes the sign of the dividend
+    ('7 / 2',                   'int', 3),
+    ('-7 / 2',                  'int', -3),
+    ('7 / -2',                  'int', -3),
+    ('-7 / -2',                 'int', 3),
+    ('-7 % 2',                  'int', -1),
+    ('7 % -2',                  'int', 1),
+    # 64-bit operands must not lose precision
+    ('0xffffea0000001040 / 64', 'unsigned long', 0x3ffffa800000041),
+    ('0xffffea0000001040 % 64', 'unsigned long', 0),
+    ('0xffff888012345678 % 7',  'unsigned long', 6),
+    ('0xffff888012345678 / 3',  'unsigned long', 0x55552d8006117228),
+    ('-9223372036854775807L / 3', 'long', -3074457345618258602),
+    ('-9223372036854775807L % 10', 'long', -7),
+    # literal types and the usual arithmetic conversions
+    ('2147483647',              'int', 2147483647),
+    ('2147483648',              'long', 2147483648),
+    ('0x80000000',              'unsigned int', 0x80000000),
+    ('0xffffffff + 1',          'unsigned int', 0),
+    ('1UL << 63',               'unsigned long', 1 << 63),
+    ('-1 / 2UL',                'unsigned long', 0x7fffffffffffffff),
+    ('-1 < 1U',                 'int', 0),
+    ('-1L < 1U',                'int', 1),
+    ('-8 >> 1',                 'int', -4),
+    ('~0U',                     'unsigned int', 0xffffffff),
+    ('-0x80000000',             'unsigned int', 0x80000000),
+    ('(unsigned char)-1 + 1',   'int', 256),
+    ('!5 + !0',                 'int', 1),
+    ('3 > 2 > 1',               'int', 0),
+]
+
+@pytest.mark.parametrize('expr, typename, value', ARITHMETIC_CASES)
+def test_arithmetic(expr: str, typename: str, value: int) -> None:
+    assert evaluate(expr) == (typename, value)
+
+@pytest.mark.skipif(IS_FAKE_GDB, reason='requires gdb')
+@pytest.mark.parametrize('expr', [case[0] for case in ARITHMETIC_CASES])
+def test_arithmetic_matches_gdb(expr: str) -> None:
+    gval = gdb.parse_and_eval(expr)
+    assert evaluate(expr) == (str(gval.type), int(gval))
+
+@pytest.mark.parametrize('expr', ['1 / 0', '1 % 0', '"str"', 'foo(1)', '1 +'])
+def test_unsupported_falls_back(expr: str) -> None:
+    assert cexpr_evaluate(expr) is None
+
+def test_ast_is_shared_by_numbers() -> None:
+    '''expressions that only differ in numbers are parsed into the same ast.
+    '''
+    lhs = Parser(tokenize('(1 + 2) * 3')).parse()
+    rhs = Parser(tokenize('(0x10 + 20UL) * 30')).parse()
+    assert lhs == rhs
+
+def test_parse_error() -> None:
+    with pytest.raises(CExprUnsupported):
+        Parser(tokenize('(1 + 2')).parse()
+
+#
+# expressions on the target memory
+#
+
+@pytest.fixture
+def task(fake_gdb):
+    '''a global "struct vl_task vl_task0" at 0x1000 whose next points to a second task at 0x2000.
+    '''
+    task = fake_gdb.declare_struct('struct vl_task')
+    fake_gdb.define_struct('struct vl_task', [
+        ('pid',   fake_gdb.lookup_type('int')),
+        ('flags', fake_gdb.lookup_type('unsigned char')),
+        ('next',  task.pointer()),
+        ('cpus',  fake_gdb.lookup_type('unsigned long').array(3)),
+    ])
+    fake_gdb.define_symbol('vl_task0', task, 0x1000)
+    fake_gdb.memory.write_int(0x1000, 1, 4)
+    fake_gdb.memory.write_int(0x1004, 0xff, 1)
+    fake_gdb.memory.write_int(0x1008, 0x2000)
+    for i in range(4):
+        fake_gdb.memory.write_int(0x1010 + i * 8, 0xffff888000000000 + i)
+    fake_gdb.memory.write_int(0x2000, -2, 4)
+    gdb_adaptor.reset()
+    yield task
+    gdb_adaptor.reset()
+
+def test_symbol_members(task) -> None:
+    assert evaluate('vl_task0.pid') == ('int', 1)
+    assert evaluate('vl_task0.flags') == ('unsigned char', 0xff)
+    assert evaluate('vl_task0.next->pid') == ('int', -2)
+    assert evaluate('vl_task0.next->pid / 2 + vl_task0.pid') == ('int', 0)
+
+def test_address_and_pointer_arithmetic(task) -> None:
+    assert evaluate('&vl_task0') == ('struct vl_task *', 0x1000)
+    assert evaluate('&vl_task0.next') == ('struct vl_task **', 0x1008)
+    assert evaluate('&vl_task0 + 1') == ('struct vl_task *', 0x1000 + 48)
+    assert evaluate('vl_task0.next - &vl_task0') == ('long', (0x2000 - 0x1000) // 48)
+    assert evaluate('(*vl_task0.next).pid') == ('int', -2)
+
+def test_index_and_sizeof(task) -> None:
+    assert evaluate('vl_task0.cpus[3]') == ('unsigned long', 0xffff888000000003)
+    assert evaluate('vl_task0.cpus[2] / 2') == ('unsigned long', 0xffff888000000002 // 2)
+    assert evaluate('sizeof(struct vl_task)') == ('unsigned long', 48)
+    assert evaluate('sizeof(vl_task0.pid)') == ('unsigned long', 4)
+
+def test_casts(task) -> None:
+    assert evaluate('(unsigned char)0x1ff') == ('unsigned char', 0xff)
+    assert evaluate('(struct vl_task *)0x2000') == ('struct vl_task *', 0x2000)
+    assert evaluate('((struct vl_task *)0x2000)->pid') == ('int', -2)
+    assert evaluate('-(unsigned char)1') == ('int', -1)
+
+@pytest.fixture
+def counters(fake_gdb):
+    '''variables of qualified and typedef'd integer types, all holding -300000 as 8 bytes (or 4 for int).
+    '''
+    ulong = fake_gdb.lookup_type('unsigned long')
+    size_t = fake_gdb.define_typedef('size_t', ulong)
+    pgoff_t = fake_gdb.define_typedef('pgoff_t', fake_gdb.define_typedef('__kernel_ulong_t', ulong))
+    variables = [
+        ('vl_jiffies',  ulong.volatile(),                           8),
+        ('vl_uint',     fake_gdb.lookup_type('unsigned int').const(), 4),
+        ('vl_size',     size_t,                                     8),
+        ('vl_pgoff',    pgoff_t.const(),                            8),
+        ('vl_ssize',    fake_gdb.define_typedef('ssize_t', fake_gdb.lookup_type('long')), 8),
+        ('vl_u64',      fake_gdb.lookup_type('u64'),                8),
+    ]
+    for i, (name, gtype, size) in enumerate(variables):
+        fake_gdb.define_symbol(name, gtype, 0x3000 + i * 8)
+        fake_gdb.memory.write_int(0x3000 + i * 8, -300000 % (1 << size * 8), size)
+    gdb_adaptor.reset()
+    yield
+    gdb_adaptor.reset()
+
+@pytest.mark.parametrize('name, typename, value', [
+    ('vl_jiffies', 'volatile unsigned long', (1 << 64) - 300000),
+    ('vl_uint',    'const unsigned int',     (1 << 32) - 300000),
+    ('vl_size',    'size_t',                 (1 << 64) - 300000),
+    ('vl_pgoff',   'const pgoff_t',          (1 << 64) - 300000),
+    ('vl_ssize',   'ssize_t',                -300000),
+    ('vl_u64',     'u64',                    (1 << 64) - 300000),
+])
+def test_signedness_of_qualified_and_typedef_types(counters, name: str, typename: str, value: int) -> None:
+    assert evaluate(name) == (typename, value)
+    assert evaluate(f'{name} > 0') == ('int', int(value > 0))
+    assert evaluate(f'{name} >> 60')[1] == value >> 60
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from visualinux.snapshot.diff import diff_views, diff_files, is_empty, summarize, lcs_pairs, set_pairs
+
+def text(value: str) -> dict:
+    return {'class': 'text', 'type': 'int', 'value': value}
+
+def box(key: str, members: dict[str, dict], parent_members: dict[str, dict] | None = None) -> dict:
+    absts = {'default': {'parent': None, 'members': members}}
+    if parent_members is not None:
+        absts['default']['parent'] = 'base'
+        absts['base'] = {'parent': None, 'members': parent_members}
+    return {'key': key, 'type': 'task_struct', 'addr': '0x0', 'label': '', 'absts': absts, 'parent': None}
+
+def container(key: str, members: list[str | None], links: dict[int, dict[str, str | None]] | None = None) -> dict:
+    links = links or {}
+    return {'key': key, 'type': key.split(':')[1], 'addr': '0x0', 'label': '', 'parent': None, 'members': [
+        {'key': member, 'links': {label: {'class': 'link', 'type': 'DIRECT', 'target': target} for label, target in links.get(i, {}).items()}}
+        for i, member in enumerate(members)
+    ]}
+
+def view(boxes: list[dict], containers: list[dict], name: str = 'view') -> dict:
+    return {'name': name, 'pool': {'boxes': {ent['key']: ent for ent in boxes}, 'containers': {ent['key']: ent for ent in containers}}}
+
+def container_ops(src: list[str | None], dst: list[str | None], type: str = '[List]') -> list[list]:
+    key = '0x10:' + type
+    diff = diff_views(view([], [container(key, src)]), view([], [container(key, dst)]))
+    return diff['containers'][key]['ops'] if key in diff['containers'] else [['=', len(dst)]]
+
+@pytest.mark.parametrize('src, dst, ops', [
+    (['a', 'b', 'c'], ['a', 'c'],                [['=', 1], ['-', 1], ['=', 1]]),
+    (['a', 'c'], ['a', 'b', 'c'],                [['=', 1], ['+', 1], ['=', 1]]),
+    (['a', 'b', 'c'], ['c', 'a', 'b'],           [['+', 1], ['=', 2], ['-', 1]]),
+    (['a', None, 'b'], ['a', None, 'b', 'c'],    [['=', 3], ['+', 1]]),
+    (['a', None, None, 'b'], ['a', None, 'b'],   [['=', 2], ['-', 1], ['=', 1]]),
+    ([None, 'a'], [None, None, 'a'],             [['=', 1], ['+', 1], ['=', 1]]),
+    (['x', 'a', 'x'], ['x', 'a', 'x', 'b'],      [['=', 3], ['+', 1]]),
+    (['a', 'b'], ['c', 'd'],                     [['-', 2], ['+', 2]]),
+])
+def test_ordered_ops(src, dst, ops) -> None:
+    assert container_ops(src, dst) == ops
+
+def test_none_slots_are_matched_by_position() -> None:
+    keys = ['a', None, 'b']
+    assert lcs_pairs(keys, keys) == [(0, 0), (1, 1), (2, 2)]
+    assert lcs_pairs(keys, list(keys)) == [(0, 0), (1, 1), (2, 2)]
+
+@pytest.mark.parametrize('src, dst, ops', [
+    (['a', 'b', 'c'], ['c', 'a', 'b'],           [['=', 3]]),
+    (['a', 'b'], ['b', 'd'],                     [['=', 1], ['+', 1], ['-', 1]]),
+    ([None, 'a', None], ['a', None],             [['=', 2], ['-', 1]]),
+])
+def test_unordered_ops(src, dst, ops) -> None:
+    assert container_ops(src, dst, '[UnorderedSet]') == ops
+
+def test_set_pairs_match_occurrences_in_order() -> None:
+    assert set_pairs(['x', None, 'x'], [None, 'x', 'x', 'x']) == [(1, 0), (0, 1), (2, 2)]
+
+def test_relinked_members() -> None:
+    key = '0x10:[RBTree]'
+    src = container(key, ['a', 'b'], {0: {'left': None, 'right': 'b'}, 1: {'left': None, 'right': None}})
+    dst = container(key, ['c', 'a', 'b'], {0: {'left': None}, 1: {'left': 'c', 'right': 'b'}, 2: {'left': None, 'right': None}})
+    diff = diff_views(view([], [src]), view([], [dst]))['containers'][key]
+    assert diff == {'ordered': True, 'ops': [['+', 1], ['=', 2]], 'relinked': [[1, ['left']]]}
+
+def test_box_members_with_inheritance() -> None:
+    src = box('0x1:task_struct', {'pid': text('1')}, {'comm': text('init'), 'prio': text('120')})
+    dst = box('0x1:task_struct', {'pid': text('1'), 'comm': text('systemd')}, {'comm': text('init'), 'prio': text('100')})
+    diff = diff_views(view([src], []), view([dst], []))
+    assert diff['boxes'] == {'0x1:task_struct': {'default': ['comm', 'prio'], 'base': ['prio']}}
+
+def test_added_removed_and_empty() -> None:
+    a, b = box('0x1:task_struct', {}), box('0x2:task_struct', {})
+    diff = {'view': diff_views(view([a], []), view([b], []))}
+    assert diff['view']['added'] == ['0x2:task_struct']
+    assert diff['view']['removed'] == ['0x1:task_struct']
+    assert not is_empty(diff)
+    assert summarize(diff) == 'view: +1 -1 ~0 boxes ~0 containers'
+    assert is_empty({'view': diff_views(view([a], []), view([a], []))})
+
+def test_diff_files(tmp_path) -> None:
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    src.mkdir(), dst.mkdir()
+    (src / 'view.json').write_text(json.dumps(view([box('0x1:task_struct', {'pid': text('1')})], [])))
+    (dst / 'view.json').write_text(json.dumps(view([box('0x1:task_struct', {'pid': text('2')})], [])))
+    assert diff_files(src, dst)['view']['boxes'] == {'0x1:task_struct': {'default': ['pid']}}
+    assert diff_files(src / 'view.json', dst / 'view.json')['view']['boxes'] == {'0x1:task_struct': {'default': ['pid']}}
@@ -0,0 +1,16 @@
+from visualinux import OrderedDict
+from visualinux.runtime import entity
+from visualinux.runtime.kvalue import KValue
+from visualinux.runtime.gdb.type import GDBType
+
+def default_views() -> OrderedDict[str, entity.View]:
+    return OrderedDict({'default': entity.View('default', None, OrderedDict())})
+
+def test_truncated_box_is_keyed_apart() -> None:
+    root = KValue(GDBType.basic('unsigned long').pointer(), 0x3000)
+    ent = entity.Box(None, root, 'node', default_views())
+    stub = entity.Box(None, root, 'node', default_views(), truncated=True)
+    assert stub.key != ent.key
+    assert stub.key.startswith(ent.key)
+    assert stub.to_json()['truncated'] and not ent.to_json()['truncated']
+    assert stub.clone().key == stub.key
@@ -0,0 +1,140 @@
+import sys
+import pytest
+
+from visualinux import DSL_GRAMMAR_DIR, VL_DIR
+from visualinux.dsl.parser.parser import Parser
+from visualinux.dsl.model.diagram import DiagramSet, get_incremental_sync, set_incremental_sync
+from visualinux.dsl.model.symtable import SymTable
+from visualinux.runtime.kvalue import KValue
+from visualinux.runtime.gdb.adaptor import gdb_adaptor
+from visualinux.evaluation import evaluation_counter
+from visualinux.snapshot import Snapshot
+
+# vl_obj0 (val 1) -> 0x2000 (val 2) -> NULL, and vl_obj1 (val 3) -> NULL
+OBJ0, OBJ1, OBJ2 = '0x1000:vl_obj', '0x2000:vl_obj', '0x3000:vl_obj'
+
+CHAIN = '''
+define Obj as Box<vl_obj> [
+    Text val
+    Link next -> @next
+] where {
+    next = Obj(@this.next)
+}
+obj = Obj(${&vl_obj0})
+diag chain { plot @obj }
+'''
+
+# Inner reads @tag of the Outer box it is plotted in
+ESCAPING = '''
+define Inner as Box<vl_obj> [
+    Text val
+    Text tag: @tag
+]
+define Outer as Box<vl_obj> [
+    Text val
+    Link next -> @next
+] where {
+    tag = @this.val
+    next = Inner(@this.next)
+}
+obj = Outer(${&vl_obj0})
+diag first { plot @obj }
+diag second { plot @obj }
+'''
+
+# the first diagram fails after evaluating vl_obj1
+FAILING = '''
+define Obj as Box<vl_obj> [
+    Text val
+    Link next -> @next
+] where {
+    next = Obj(@this.next)
+}
+other = Obj(${&vl_obj1})
+bad = Obj(${vl_missing})
+diag broken { plot @other plot @bad }
+diag ok { plot @other }
+'''
+
+@pytest.fixture
+def parse(fake_gdb, monkeypatch):
+    '''parse ViewCL code over the objects above, with incremental sync on.
+    '''
+    obj = fake_gdb.declare_struct('struct vl_obj')
+    fake_gdb.define_struct('struct vl_obj', [('val', fake_gdb.lookup_type('int')), ('next', obj.pointer())])
+    fake_gdb.define_symbol('vl_obj0', obj, 0x1000)
+    fake_gdb.define_symbol('vl_obj1', obj, 0x3000)
+    for addr, val, next in [(0x1000, 1, 0x2000), (0x2000, 2, 0), (0x3000, 3, 0)]:
+        fake_gdb.memory.write_int(addr, val, 4)
+        fake_gdb.memory.write_int(addr + 8, next)
+    # lark resolves the grammar imports from the directory of the main script, or the working directory without one (as in gdb)
+    monkeypatch.delattr(sys.modules['__main__'], '__file__', raising=False)
+    monkeypatch.chdir(VL_DIR)
+    incremental = get_incremental_sync()
+    set_incremental_sync(True)
+    yield lambda code: Parser(DSL_GRAMMAR_DIR / 'viewcl.lark').parse(code)
+    set_incremental_sync(incremental)
+    gdb_adaptor.reset()
+
+def sync(model: DiagramSet, previous: Snapshot | None = None) -> Snapshot:
+    gdb_adaptor.reset()
+    KValue.reset()
+    SymTable.reset()
+    return model.sync(previous)
+
+def text_of(snapshot: Snapshot, key: str, member: str, view: int = 0) -> str:
+    return snapshot.views[view].pool.boxes[key].views['default'].members[member].to_json()['value']
+
+def shared_keys(snapshot: Snapshot) -> set[str]:
+    assert snapshot.shared is not None
+    return {shared_key[-1] for shared_key, entry in snapshot.shared.entries.items() if entry is not None}
+
+def test_unchanged_boxes_are_carried_over(parse) -> None:
+    model = parse(CHAIN)
+    sn1 = sync(model)
+    assert shared_keys(sn1) == {OBJ0, OBJ1}
+    sn2 = sync(model, sn1)
+    # the outer box is carried over with the inner one it links to
+    assert evaluation_counter.carried_boxes == 1
+    assert set(sn2.views[0].pool.boxes) == {OBJ0, OBJ1}
+    assert text_of(sn2, OBJ1, 'val') == '2'
+
+def test_changed_byte_is_re_evaluated(parse, fake_gdb) -> None:
+    model = parse(CHAIN)
+    sn1 = sync(model)
+    fake_gdb.memory.write(0x2000, b'\x05')
+    sn2 = sync(model, sn1)
+    # the read records of the outer box cover the reads of the inner one
+    assert evaluation_counter.carried_boxes == 0
+    assert text_of(sn2, OBJ1, 'val') == '5'
+    assert text_of(sn2, OBJ0, 'val') == '1'
+
+def test_unread_byte_does_not_prevent_carry_over(parse, fake_gdb) -> None:
+    model = parse(CHAIN)
+    sn1 = sync(model)
+    # the padding between val and next is never read
+    fake_gdb.memory.write(0x2004, b'\xff')
+    sync(model, sn1)
+    assert evaluation_counter.carried_boxes == 1
+
+def test_escaped_box_is_never_shared(parse, fake_gdb) -> None:
+    model = parse(ESCAPING)
+    sn1 = sync(model)
+    assert shared_keys(sn1) == {OBJ0}
+    assert [text_of(sn1, OBJ1, 'tag', view) for view in (0, 1)] == ['1', '1']
+    # the tag read from the outer box is not in the records of the inner box
+    fake_gdb.memory.write(0x1000, b'\x07')
+    sn2 = sync(model, sn1)
+    assert evaluation_counter.carried_boxes == 0
+    assert [text_of(sn2, OBJ1, 'tag', view) for view in (0, 1)] == ['7', '7']
+
+def test_failed_view_rolls_back_its_entries(parse) -> None:
+    model = parse(FAILING)
+    sn1 = sync(model)
+    broken, ok = sn1.views
+    assert broken.error and not broken.pool.boxes
+    assert sn1.shared is not None
+    entries = [entry for shared_key, entry in sn1.shared.entries.items() if shared_key[-1] == OBJ2]
+    assert len(entries) == 1 and entries[0] is not None
+    assert entries[0].pool is ok.pool
+    assert text_of(sn1, OBJ2, 'val', 1) == '3'
@@ -0,0 +1,51 @@
+import pytest
+
+import visualinux.runtime.kvalue as kvalue_module
+from visualinux.runtime.kvalue import KValue
+from visualinux.runtime.gdb.adaptor import gdb_adaptor
+from visualinux.runtime.gdb.type import GDBType
+
+NODES = 0x3000
+
+@pytest.fixture
+def pptr(fake_gdb, monkeypatch):
+    '''the type unsigned long **, whose dereferences read pointers at NODES + 8 * i.
+    '''
+    for i in range(8):
+        fake_gdb.memory.write_int(NODES + i * 8, 0x5000 + i)
+    monkeypatch.setattr(kvalue_module, 'DEREF_CACHE_SIZE', 4)
+    cache = KValue._KValue__dereference_cache # type: ignore
+    cache.clear()
+    gdb_adaptor.reset()
+    yield GDBType.basic('unsigned long').pointer().pointer()
+    cache.clear()
+    gdb_adaptor.reset()
+
+def cached_addrs() -> list[int]:
+    return [addr for _, addr in KValue._KValue__dereference_cache] # type: ignore
+
+def test_dereference_is_cached(pptr) -> None:
+    kobj = KValue(pptr, NODES).dereference()
+    assert kobj.value == 0x5000
+    assert kobj.gtype is pptr.target()
+    assert KValue(pptr, NODES).dereference() is kobj
+
+def test_bounded_cache_evicts_least_recently_used(pptr) -> None:
+    for i in range(4):
+        KValue(pptr, NODES + i * 8).dereference()
+    # a hit refreshes the entry, so that the next insert evicts the second one instead
+    KValue(pptr, NODES).dereference()
+    KValue(pptr, NODES + 4 * 8).dereference()
+    assert cached_addrs() == [NODES + 2 * 8, NODES + 3 * 8, NODES, NODES + 4 * 8]
+
+def test_walk_larger_than_cache_keeps_recent_entries(pptr) -> None:
+    for i in range(8):
+        KValue(pptr, NODES + i * 8).dereference()
+    assert cached_addrs() == [NODES + i * 8 for i in range(4, 8)]
+
+def test_reset_invalidates_entries(fake_gdb, pptr) -> None:
+    KValue(pptr, NODES).dereference()
+    fake_gdb.memory.write_int(NODES, 0x6000)
+    KValue.reset()
+    gdb_adaptor.reset()
+    assert KValue(pptr, NODES).dereference().value == 0x6000
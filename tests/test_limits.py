@@ -0,0 +1,56 @@
+import pytest
+
+from visualinux.dsl.model.limits import BrentWalker, ContainerBudget, ContainerLimits
+from visualinux.runtime.kvalue import KValue
+from visualinux.runtime.gdb.type import GDBType
+
+@pytest.mark.parametrize('max_members', [1, 3, 256, 300])
+def test_budget_keeps_the_items_left_behind(max_members: int) -> None:
+    items = iter(range(1000))
+    budget = ContainerBudget(ContainerLimits(max_members=max_members))
+    assert list(budget.iterate(items)) == list(range(max_members))
+    assert budget.truncated and budget.rest is not None
+    resumed = ContainerBudget(ContainerLimits())
+    assert list(resumed.iterate(budget.rest)) == list(range(max_members, 1000))
+    assert not resumed.truncated and resumed.rest is None
+
+def test_budget_left_behind_in_the_batch(monkeypatch) -> None:
+    '''items already pulled in the batch when another limit is hit are not lost.
+    '''
+    budget = ContainerBudget(ContainerLimits())
+    seen = []
+    monkeypatch.setattr(budget, 'exhausted', lambda: len(seen) >= 5)
+    for item in budget.iterate(range(20)):
+        seen.append(item)
+    assert seen == list(range(5))
+    assert list(budget.rest) == list(range(5, 20))
+
+#
+# cycle detection
+#
+
+def walk(links: dict[int, int], start: int) -> BrentWalker:
+    '''a chain of nodes by their numbers, where 0 stops the walk.
+    '''
+    gtype = GDBType.basic('unsigned long').pointer()
+    return BrentWalker(KValue(gtype, start), lambda node: KValue(gtype, links[node.value]), lambda node: node.value == 0)
+
+def test_walk_without_cycle() -> None:
+    walker = walk({1: 2, 2: 3, 3: 0}, 1)
+    assert [node.value for node in walker] == [1, 2, 3]
+    assert walker.cycle is None
+    assert list(walk({}, 0)) == []
+
+@pytest.mark.parametrize('tail, length', [(0, 1), (0, 5), (1, 1), (3, 4), (10, 7), (6, 64)])
+def test_walk_finds_cycle(tail: int, length: int) -> None:
+    '''nodes 1..tail lead to the cycle of nodes tail+1..tail+length.
+    '''
+    count = tail + length
+    links = {i: i + 1 for i in range(1, count)} | {count: tail + 1}
+    walker = walk(links, 1)
+    nodes = [node.value for node in walker]
+    assert walker.cycle is not None
+    assert (walker.cycle.addr, walker.cycle.index, walker.cycle.length) == (tail + 1, tail, length)
+    # all nodes are yielded before the walk comes back, with repeated ones only beyond index + length
+    assert nodes[: count] == list(range(1, count + 1))
+    assert set(nodes) == set(range(1, count + 1))
@@ -0,0 +1,66 @@
+import pytest
+
+from visualinux.runtime.gdb.memcache import PageCache, coalesce_pages, coalesce_ranges
+
+PAGE = 0x1000
+
+def test_coalesce_pages() -> None:
+    assert coalesce_pages([]) == []
+    assert coalesce_pages([3]) == [(3, 1)]
+    assert coalesce_pages([1, 2, 3, 5, 7, 8]) == [(1, 3), (5, 1), (7, 2)]
+
+def test_coalesce_ranges() -> None:
+    assert coalesce_ranges([]) == []
+    # overlapping, adjacent and empty ranges in any order
+    assert coalesce_ranges([(0x30, 0x10), (0x10, 0x10), (0x18, 0x4), (0x20, 0x8), (0x100, 0)]) == [(0x10, 0x28), (0x30, 0x40)]
+    assert coalesce_ranges([(0x10, 0x100), (0x20, 0x10)]) == [(0x10, 0x110)]
+
+@pytest.fixture
+def memory(fake_gdb):
+    for pgno in range(8):
+        fake_gdb.memory.write(0x10000 + pgno * PAGE, bytes([pgno]) * PAGE)
+    fake_gdb.memory.reads = 0
+    return fake_gdb.memory
+
+def test_read_across_pages(memory) -> None:
+    cache = PageCache(PAGE, 8)
+    assert cache.read(0x10000 + PAGE - 2, 4) == bytes([0, 0, 1, 1])
+    assert memory.reads == 2
+    assert cache.read(0x10000 + PAGE, 8) == bytes([1]) * 8
+    assert memory.reads == 2
+    assert cache.read(0x10000, 0) == b''
+
+def test_unreadable_pages_are_cached_as_none(memory) -> None:
+    cache = PageCache(PAGE, 8)
+    assert cache.read(0x10000 + 8 * PAGE - 4, 8) is None
+    assert cache.read(0x10000 + 8 * PAGE, 1) is None
+    assert memory.reads == 2
+
+def test_lru_eviction(memory) -> None:
+    cache = PageCache(PAGE, 2)
+    cache.read(0x10000, 1)
+    cache.read(0x10000 + PAGE, 1)
+    cache.read(0x10000, 1)
+    cache.read(0x10000 + 2 * PAGE, 1)
+    assert list(cache.pages) == [0x10, 0x12]
+
+def test_fetch_coalesces_missing_pages(memory) -> None:
+    cache = PageCache(PAGE, 8)
+    cache.read(0x10000 + 2 * PAGE, 1)
+    memory.reads = 0
+    cache.fetch([(0x10000, 2 * PAGE), (0x10000 + 2 * PAGE, 4), (0x10000 + 3 * PAGE + 8, PAGE)])
+    # pages 0-1 and 3-4 in two round trips, and page 2 is already cached
+    assert memory.reads == 2
+    assert [cache.read(0x10000 + pgno * PAGE, 1) for pgno in range(5)] == [bytes([pgno]) for pgno in range(5)]
+    assert memory.reads == 2
+
+def test_fetch_falls_back_to_pages_on_error(memory) -> None:
+    cache = PageCache(PAGE, 8)
+    cache.fetch([(0x10000 + 6 * PAGE, 3 * PAGE)])
+    assert cache.pages[0x16] == bytes([6]) * PAGE
+    assert cache.pages[0x18] is None
+
+def test_fetch_skips_more_pages_than_cached(memory) -> None:
+    cache = PageCache(PAGE, 2)
+    cache.fetch([(0x10000, 4 * PAGE)])
+    assert memory.reads == 0 and not cache.pages
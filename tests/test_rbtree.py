@@ -0,0 +1,103 @@
+import pytest
+import time
+
+from visualinux.runtime import entity
+from visualinux.runtime.kvalue import KValue
+from visualinux.runtime.gdb.adaptor import gdb_adaptor
+from visualinux.runtime.gdb.type import GDBType
+from visualinux.dsl.model.symtable import SymTable
+from visualinux.dsl.model.limits import ContainerBudget, ContainerLimits
+from visualinux.dsl.model.containers.rbtree import RBTree
+
+ROOT = 0x4000
+NODE_SIZE = 0x18
+
+#         4
+#      2     6
+#     1 3   5 7
+TREE = {4: (2, 6), 2: (1, 3), 6: (5, 7), 1: (0, 0), 3: (0, 0), 5: (0, 0), 7: (0, 0)}
+
+def node_addr(n: int) -> int:
+    return ROOT + n * NODE_SIZE if n else 0
+
+def key_of(n: int) -> str | None:
+    return f'{node_addr(n):#x}:rb_node' if n else None
+
+class FakeMember:
+    def __init__(self, key: str) -> None:
+        self.key = key
+
+@pytest.fixture
+def rbtree(fake_gdb):
+    '''an RBTree whose members are the rb_nodes themselves, recording the order of evaluation.
+    '''
+    rb_node = fake_gdb.declare_struct('struct rb_node')
+    fake_gdb.define_struct('struct rb_node', [
+        ('__rb_parent_color', fake_gdb.lookup_type('unsigned long')),
+        ('rb_right',          rb_node.pointer()),
+        ('rb_left',           rb_node.pointer()),
+    ])
+    fake_gdb.define_struct('struct rb_root', [('rb_node', rb_node.pointer())])
+    fake_gdb.memory.write_int(ROOT, node_addr(4))
+    for n, (left, right) in TREE.items():
+        fake_gdb.memory.write_int(node_addr(n) + 8, node_addr(right))
+        fake_gdb.memory.write_int(node_addr(n) + 16, node_addr(left))
+    gdb_adaptor.reset()
+
+    tree = RBTree.__new__(RBTree)
+    tree.name = 'RBTree'
+    tree.parent = None
+    tree.type = None
+    tree.scope = SymTable(this=tree)
+    tree.evaluated = []
+    def evaluate_member(pool, node: KValue) -> FakeMember:
+        tree.evaluated.append((node.value - ROOT) // NODE_SIZE)
+        return FakeMember(key_of(tree.evaluated[-1]))
+    tree.evaluate_member = evaluate_member
+    tree.prefetch_members = lambda nodes: None
+    root = KValue(GDBType.lookup('rb_root'), ROOT)
+    yield tree, entity.Container(tree, root, 'tree')
+    gdb_adaptor.reset()
+
+def links_of(ent_container: entity.Container) -> dict[str | None, tuple]:
+    return {member.key: (member.links['left'].target_key, member.links['right'].target_key) for member in ent_container.members}
+
+def expected_links() -> dict[str | None, tuple]:
+    return {key_of(n): (key_of(left), key_of(right)) for n, (left, right) in TREE.items()}
+
+def test_preorder_evaluation_inorder_members(rbtree) -> None:
+    tree, ent_container = rbtree
+    tree.evaluate_members(None, ent_container, ContainerBudget(ContainerLimits()), None)
+    assert tree.evaluated == [4, 2, 1, 3, 6, 5, 7]
+    assert [member.key for member in ent_container.members] == [key_of(n) for n in range(1, 8)]
+    assert links_of(ent_container) == expected_links()
+    assert ent_container.cursor is None
+
+@pytest.mark.parametrize('max_members', [1, 2, 3, 5, 6])
+def test_truncation_resumes_from_the_stack(rbtree, max_members: int) -> None:
+    tree, ent_container = rbtree
+    tree.evaluate_members(None, ent_container, ContainerBudget(ContainerLimits(max_members=max_members)), None)
+    assert tree.evaluated == [4, 2, 1, 3, 6, 5, 7][: max_members]
+    # every evaluated node is a member, even if its left subtree is not finished
+    assert sorted(member.key for member in ent_container.members) == sorted(key_of(n) for n in tree.evaluated)
+    while (cursor := ent_container.cursor) is not None:
+        tree.evaluate_members(None, ent_container, ContainerBudget(ContainerLimits(max_members=max_members)), cursor)
+    assert tree.evaluated == [4, 2, 1, 3, 6, 5, 7]
+    assert len(ent_container.members) == 7
+    assert links_of(ent_container) == expected_links()
+
+@pytest.mark.parametrize('limits', [ContainerLimits(time_budget=50), ContainerLimits(max_bytes=4096), ContainerLimits(max_members=100)])
+def test_cyclic_tree_is_truncated(rbtree, fake_gdb, limits: ContainerLimits) -> None:
+    '''a corrupted tree where the right child of 7 links back to 4 is walked only within the budget.
+    '''
+    tree, ent_container = rbtree
+    fake_gdb.memory.write_int(node_addr(7) + 8, node_addr(4))
+    gdb_adaptor.reset()
+    prefetched: list[int] = []
+    tree.prefetch_members = lambda nodes: prefetched.extend(node.value for node in nodes)
+    tstart = time.monotonic()
+    tree.evaluate_members(None, ent_container, ContainerBudget(limits), None)
+    assert time.monotonic() - tstart < 5
+    assert ent_container.cursor is not None
+    assert sorted(prefetched) == sorted(node_addr(n) for n in TREE)
+    assert tree.evaluated[: 7] == [4, 2, 1, 3, 6, 5, 7]
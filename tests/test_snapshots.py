@@ -0,0 +1,132 @@
+from visualinux import OrderedDict
+from visualinux.runtime import entity
+from visualinux.runtime.kvalue import KValue, KValueVBox
+from visualinux.runtime.gdb.type import GDBType
+from visualinux.dsl.model.decorators import LinkType
+from visualinux.dsl.model.limits import ContainerCursor
+from visualinux.snapshot.snapshots import Snapshot, SnapshotManager
+from visualinux.snapshot.state import Pool, SerializedView
+
+CODE = 'diag example { ... }'
+
+def box(key: str, value: str) -> dict:
+    return {'key': key, 'type': 'task_struct', 'addr': key.split(':')[0], 'label': 'task',
+            'absts': {'default': {'parent': None, 'members': {'pid': {'class': 'text', 'type': 'int', 'value': value}}}},
+            'parent': None, 'truncated': False}
+
+def container(key: str, members: list[str]) -> dict:
+    return {'key': key, 'type': '[List]', 'addr': key.split(':')[0], 'label': 'tasks',
+            'members': [{'key': member, 'links': {}} for member in members], 'parent': None}
+
+def snapshot(key: str, boxes: dict[str, dict], containers: dict[str, dict]) -> Snapshot:
+    snapshot = Snapshot()
+    snapshot.key = key
+    snapshot.add_view(SerializedView('view', {
+        'name': 'view', 'pool': {'boxes': boxes, 'containers': containers},
+        'plot': list(containers), 'init_attrs': {}, 'stat': 0,
+    }))
+    return snapshot
+
+A, B, C = '0x1000:task_struct', '0x2000:task_struct', '0x3000:task_struct'
+LIST, LIST2 = '0x4000:[List]', '0x5000:[List]'
+
+def test_delta_ships_changes_and_removed_keys_by_section() -> None:
+    manager = SnapshotManager()
+    sn1 = snapshot('sn1', {A: box(A, '1'), B: box(B, '2')}, {LIST: container(LIST, [A, B])})
+    manager.set(sn1.key, sn1)
+    command, on_sent = manager.delta(sn1, CODE)
+    assert command['baseSnKey'] is None
+    on_sent()
+
+    sn2 = snapshot('sn2', {A: box(A, '1'), C: box(C, '3')}, {LIST2: container(LIST2, [A, C])})
+    manager.set(sn2.key, sn2)
+    command, _ = manager.delta(sn2, CODE)
+    view = command['patch']['views']['view']
+    assert command['baseSnKey'] == 'sn1'
+    assert list(view['boxes']) == [C]
+    assert list(view['containers']) == [LIST2]
+    assert view['removed'] == {'boxes': [B], 'containers': [LIST]}
+
+def test_delta_base_is_kept_until_sent() -> None:
+    manager = SnapshotManager()
+    sn1 = snapshot('sn1', {A: box(A, '1')}, {})
+    manager.set(sn1.key, sn1)
+    _, on_sent = manager.delta(sn1, CODE)
+    on_sent()
+    # a patch that is never sent is not the base of the next one
+    sn2 = snapshot('sn2', {A: box(A, '2')}, {})
+    manager.set(sn2.key, sn2)
+    manager.delta(sn2, CODE)
+    assert sn2.digests is None
+    sn3 = snapshot('sn3', {A: box(A, '2')}, {})
+    manager.set(sn3.key, sn3)
+    command, _ = manager.delta(sn3, CODE)
+    assert command['baseSnKey'] == 'sn1'
+    assert list(command['patch']['views']['view']['boxes']) == [A]
+
+#
+# boxes shared across views
+#
+
+class ContainerModel:
+    name = 'List'
+
+def default_views() -> OrderedDict[str, entity.View]:
+    return OrderedDict({'default': entity.View('default', None, OrderedDict())})
+
+def task(addr: int, truncated: bool = False) -> entity.Box:
+    return entity.Box(None, KValue(GDBType.basic('unsigned long').pointer(), addr), 'task', default_views(), truncated)
+
+def source_pool() -> tuple[Pool, entity.Box, entity.Container]:
+    '''0x1000 -> list 0x4000 of [0x2000 -> 0x3000, 0x3000], and 0x5000 not reachable from 0x1000.
+    '''
+    pool = Pool()
+    head, first, second, unreachable = task(0x1000), task(0x2000), task(0x3000), task(0x5000)
+    tasks = entity.Container(ContainerModel(), KValue(GDBType.basic('unsigned long').pointer(), 0x4000), 'tasks')
+    tasks.add_member(first.key)
+    tasks.add_member(second.key)
+    first.add_member('default', 'next', entity.Link(LinkType.DIRECT, second.key, None))
+    head.add_member('default', 'tasks', entity.Link(LinkType.DIRECT, tasks.key, None))
+    for box in (head, first, second, unreachable):
+        pool.add_box(box)
+    pool.add_container(tasks)
+    return pool, head, tasks
+
+def test_import_clones_the_reachable_closure() -> None:
+    source, head, tasks = source_pool()
+    pool = Pool()
+    imported = pool.import_from(source, head.key)
+    assert imported is not None and imported is not head
+    assert imported.to_json() == head.to_json()
+    assert set(pool.boxes) == {head.key, '0x2000:long', '0x3000:long'}
+    assert set(pool.containers) == {tasks.key}
+    # the clones are independent of the source pool
+    assert all(pool.find(key) is not source.find(key) for key in [*pool.boxes, *pool.containers])
+    pool.boxes['0x2000:long'].views['default'].members.clear()
+    assert 'next' in source.boxes['0x2000:long'].views['default'].members
+
+def test_import_keeps_existing_entities() -> None:
+    source, head, _ = source_pool()
+    pool = Pool()
+    existing = task(0x3000)
+    pool.add_box(existing)
+    pool.import_from(source, head.key)
+    assert pool.boxes[existing.key] is existing
+
+def test_import_refuses_virtual_entities() -> None:
+    source, head, _ = source_pool()
+    vbox = entity.Box(None, KValueVBox(-1), 'spec', default_views())
+    source.add_box(vbox)
+    source.boxes['0x3000:long'].add_member('default', 'spec', vbox)
+    pool = Pool()
+    assert pool.import_from(source, head.key) is None
+    assert not pool.boxes and not pool.containers
+
+def test_import_refuses_truncated_containers() -> None:
+    source, head, tasks = source_pool()
+    tasks.cursor = ContainerCursor(0x2000, 1, [], {})
+    pool = Pool()
+    assert pool.import_from(source, head.key) is None
+    assert not pool.boxes and not pool.containers
+    # a box out of the truncated container is still shareable
+    assert pool.import_from(source, '0x3000:long') is not None
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from visualinux.transport import Transport
+
+class FakeResponse:
+    ok = True
+    headers = {'X-Visualinux-Content-Encodings': 'gzip', 'X-Visualinux-Encodings': 'json,cbor-v1'}
+
+class FakeSession:
+    '''records the posts with the thread they are sent in, where each post may be held until release is set.
+    '''
+    def __init__(self) -> None:
+        self.headers: dict[str, str] = {}
+        self.posts: list[tuple[str, str, bytes, float | None]] = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def options(self, url: str, timeout: float | None = None) -> FakeResponse:
+        return FakeResponse()
+
+    def post(self, url: str, data, headers: dict[str, str], timeout: float | None = None) -> FakeResponse:
+        self.release.wait(5)
+        body = data if isinstance(data, bytes) else b''.join(data)
+        self.posts.append((threading.current_thread().name, headers['X-Name'], body, timeout))
+        return FakeResponse()
+
+@pytest.fixture
+def transport():
+    transport = Transport('http://localhost/vcmd', compression='none', queue_size=2, timeout=7)
+    transport.session = FakeSession()
+    yield transport
+    transport.session.release.set()
+    transport.flush(5)
+
+def submit(transport: Transport, name: str, body) -> None:
+    transport.submit(name, body, {'X-Name': name})
+
+def test_bytes_are_sent_in_background(transport) -> None:
+    submit(transport, 'a', b'{}')
+    assert transport.flush(5)
+    assert transport.session.posts == [('visualinux-transport', 'a', b'{}', 7)]
+
+def test_streams_are_sent_in_caller_thread_in_order(transport) -> None:
+    transport.session.release.clear()
+    submit(transport, 'a', b'{}')
+    threading.Timer(0.05, transport.session.release.set).start()
+    consumed: list[int] = []
+    def chunks():
+        for i in range(3):
+            consumed.append(i)
+            yield b'[%d]' % i
+    submit(transport, 'b', chunks())
+    # the stream is consumed while being sent, after the command queued before it
+    assert consumed == [0, 1, 2]
+    assert [(thread, name, body) for thread, name, body, _ in transport.session.posts] == [
+        ('visualinux-transport', 'a', b'{}'),
+        (threading.current_thread().name, 'b', b'[0][1][2]'),
+    ]
+
+def test_streams_are_queued_if_allowed(transport) -> None:
+    transport.queue_streams = True
+    submit(transport, 'a', iter([b'[0]', b'[1]']))
+    assert transport.flush(5)
+    assert transport.session.posts == [('visualinux-transport', 'a', b'[0][1]', 7)]
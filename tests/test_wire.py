@@ -0,0 +1,164 @@
+import struct
+
+import pytest
+
+from visualinux import OrderedDict
+from visualinux.runtime import entity
+from visualinux.runtime.kvalue import KValue, KValueVBox
+from visualinux.runtime.gdb.type import GDBType
+from visualinux.dsl.model.decorators import LinkType, TextFormat
+from visualinux.dsl.model.limits import ContainerCursor, ContainerCycle
+from visualinux.snapshot.snapshots import Snapshot
+from visualinux.snapshot.state import StateView, SerializedView
+from visualinux.snapshot.wire import CBORWriter, encode_snapshot, WIRE_FORMAT
+
+#
+# a minimal CBOR decoder of what CBORWriter writes
+#
+
+def decode(data: bytes) -> object:
+    value, offset = decode_at(data, 0)
+    assert offset == len(data)
+    return value
+
+def decode_at(data: bytes, offset: int) -> tuple[object, int]:
+    head = data[offset]
+    major, info = head >> 5, head & 0x1f
+    offset += 1
+    if major == 7:
+        if info == 27:
+            return struct.unpack('>d', data[offset : offset + 8])[0], offset + 8
+        return {20: False, 21: True, 22: None}[info], offset
+    if info < 24:
+        n = info
+    else:
+        size = 1 << (info - 24)
+        n = int.from_bytes(data[offset : offset + size], 'big')
+        offset += size
+    if major == 0:
+        return n, offset
+    if major == 1:
+        return -1 - n, offset
+    if major == 3:
+        return data[offset : offset + n].decode(), offset + n
+    if major == 4:
+        items = []
+        for _ in range(n):
+            item, offset = decode_at(data, offset)
+            items.append(item)
+        return items, offset
+    if major == 5:
+        items = {}
+        for _ in range(n):
+            key, offset = decode_at(data, offset)
+            items[key], offset = decode_at(data, offset)
+        return items, offset
+    raise AssertionError(f'unexpected cbor head {head:#x}')
+
+@pytest.mark.parametrize('value', [
+    0, 23, 24, 0xff, 0x100, 0xffff, 0x10000, 0xffffffff, 0x100000000, 0xffff888012345678,
+    -1, -24, -25, -0x10000, -(1 << 63),
+    '', 'text', 'ünicode', None, True, False, 1.5,
+    [], [1, [2, None]], {'a': [1, 'b'], 'c': {}},
+])
+def test_cbor_roundtrip(value) -> None:
+    writer = CBORWriter()
+    writer.value(value)
+    assert decode(bytes(writer.buffer)) == value
+
+#
+# the snapshot document, decoded in the same way as visualizer/src/visual/wire.ts
+#
+
+def decode_snapshot(data: bytes) -> tuple[str, str, dict]:
+    version, strings, command, sn_key, body = decode(data)
+    assert version == WIRE_FORMAT
+    s = lambda sid: None if sid is None else strings[sid]
+    key, pc, timestamp, views = body
+    snapshot = {'key': s(key), 'pc': s(pc), 'timestamp': timestamp, 'views': {}}
+    for view in views:
+        if isinstance(view, dict):
+            snapshot['views'][view['name']] = view
+            continue
+        name, stat, plot, boxes, containers, init_attrs, (key_addrs, key_types) = view
+        keys = [s(key_types[i]) if addr is None else hex(addr) + ':' + s(key_types[i]) for i, addr in enumerate(key_addrs)]
+        ref = lambda index: None if index is None else keys[index]
+        pool = {'boxes': {}, 'containers': {}}
+        b_types, b_addrs, b_labels, b_parents, b_absts, b_truncated = boxes
+        for i in range(len(b_types)):
+            absts = {}
+            for abst_name, parent, labels, kinds, args, refs in b_absts[i]:
+                members = {}
+                for j, label in enumerate(labels):
+                    if kinds[j] == 0:
+                        members[s(label)] = {'class': 'text', 'type': s(args[j]), 'value': s(refs[j])}
+                    elif kinds[j] == 1:
+                        members[s(label)] = {'class': 'link', 'type': s(args[j]), 'target': ref(refs[j])}
+                    else:
+                        members[s(label)] = {'class': 'box', 'object': ref(refs[j])}
+                absts[s(abst_name)] = {'parent': s(parent), 'members': members}
+            pool['boxes'][keys[i]] = {
+                'key': keys[i], 'type': s(b_types[i]), 'addr': hex(b_addrs[i]), 'label': s(b_labels[i]),
+                'absts': absts, 'parent': ref(b_parents[i]), 'truncated': b_truncated[i],
+            }
+        c_types, c_addrs, c_labels, c_parents, c_sources, c_members, c_cursors, c_cycles = containers
+        for i in range(len(c_types)):
+            index = len(b_types) + i
+            members = []
+            for member_key, links in c_members[i]:
+                xlinks = {}
+                if links is not None:
+                    labels, types, targets = links
+                    xlinks = {s(label): {'class': 'link', 'type': s(types[j]), 'target': ref(targets[j])} for j, label in enumerate(labels)}
+                members.append({'key': ref(member_key), 'links': xlinks})
+            cursor, cycle = c_cursors[i], c_cycles[i]
+            pool['containers'][keys[index]] = {
+                'key': keys[index], 'type': s(c_types[i]), 'addr': hex(c_addrs[i]), 'label': s(c_labels[i]),
+                'members': members, 'parent': ref(c_parents[i]), 'truncated': cursor is not None,
+                'cursor': None if cursor is None else {'addr': hex(cursor[0]), 'index': cursor[1]},
+                'cycle': None if cycle is None else {'addr': hex(cycle[0]), 'index': cycle[1], 'length': cycle[2]},
+            }
+        snapshot['views'][s(name)] = {'name': s(name), 'pool': pool, 'plot': [ref(key) for key in plot], 'init_attrs': init_attrs, 'stat': stat}
+    return command, sn_key, snapshot
+
+class ContainerModel:
+    name = 'List'
+
+def default_views() -> OrderedDict[str, entity.View]:
+    return OrderedDict({'default': entity.View('default', None, OrderedDict())})
+
+def build_view() -> StateView:
+    ptr = GDBType.basic('unsigned long').pointer()
+    view = StateView('tasks', error=False)
+    parent = entity.Box(None, KValue(ptr, 0xffff888000001000), 'task', default_views())
+    child = entity.Box(None, KValue(ptr, 0xffff888000002000), 'task', default_views(), truncated=True)
+    vbox = entity.Box(None, KValueVBox(-1), 'spec', default_views())
+    parent.add_member('default', 'pid', entity.Text(KValue(GDBType.basic('int'), -7), TextFormat.gen_default()))
+    parent.add_member('default', 'next', entity.Link(LinkType.DIRECT, child.key, None))
+    parent.add_member('default', 'none', entity.Link(LinkType.DIRECT, None, None))
+    parent.add_member('default', 'spec', vbox)
+    parent.views['full'] = entity.View('full', 'default', OrderedDict())
+    parent.add_member('full', 'child', child)
+    container = entity.Container(ContainerModel(), KValue(ptr, 0xffff888000003000), 'list')
+    container.add_member(parent.key, next=child.key)
+    container.add_member(child.key)
+    container.add_member(None, next=None)
+    container.cursor = ContainerCursor(0xffff888000002000, 2, [], {})
+    container.cycle = ContainerCycle(0xffff888000001000, 0, 2)
+    for ent in (parent, child, vbox):
+        view.pool.add_box(ent)
+    view.pool.add_container(container)
+    child.parent = parent.key
+    parent.parent = container.key
+    view.add_plot(container.key)
+    return view
+
+def test_snapshot_roundtrip() -> None:
+    snapshot = Snapshot()
+    snapshot.key = 'sn1'
+    view = build_view()
+    snapshot.add_view(view)
+    snapshot.add_view(SerializedView('worker', {'name': 'worker', 'pool': {'boxes': {}, 'containers': {}}, 'plot': [], 'init_attrs': {}, 'stat': 1}))
+    command, sn_key, decoded = decode_snapshot(encode_snapshot('NEW', snapshot))
+    assert (command, sn_key) == ('NEW', 'sn1')
+    assert decoded == snapshot.to_json()
@@ -1,6 +1,7 @@
 from visualinux import *
 from visualinux.core import core
 from visualinux.snapshot import *
+from visualinux.snapshot.diff import diff_snapshots, summarize
 
 import gdb
 import argparse
@@ -36,7 +37,8 @@ class VDiffHandler:
         if snapshot_2 is None:
             print(f'  > vdiff error: snapshot dst not found: {sn_key_2}')
             return
-        if snapshot_1.timestamp < snapshot_2.timestamp:
-            core.send_diff(sn_key_1, sn_key_2)
-        else:
-            core.send_diff(sn_key_2, sn_key_1)
+        if snapshot_1.timestamp >= snapshot_2.timestamp:
+            sn_key_1, sn_key_2, snapshot_1, snapshot_2 = sn_key_2, sn_key_1, snapshot_2, snapshot_1
+        diff = diff_snapshots(snapshot_1, snapshot_2)
+        print(f'  > vdiff {sn_key_1} {sn_key_2}: {summarize(diff)}')
+        core.send_diff(sn_key_1, sn_key_2, diff)
@@ -2,8 +2,13 @@ from visualinux import *
 from visualinux.dsl.parser.units import *
 from visualinux.dsl.parser.utils import *
 from visualinux.runtime.kvalue import KValue
+from visualinux.runtime.gdb.adaptor import gdb_adaptor
+from visualinux.runtime.gdb.backend import open_backend
 from visualinux.runtime.utils import *
 from visualinux.core import core
+from visualinux.dsl.model.limits import ContainerLimits, set_container_limits
+from visualinux.dsl.model.diagram import set_sync_jobs, set_incremental_sync
+from visualinux.snapshot.snapshots import set_delta_push
 from visualinux.cmd.vdiff import VDiffHandler
 from visualinux.cmd.askllm import askllm
 
@@ -55,6 +60,15 @@ class VPlotHandler:
         parser.add_argument('-c', '--chat', action='store_true', help='chat with LLM')
         parser.add_argument('-q', '--query', action='store_true', help='show all extracted snapshots')
         parser.add_argument('-d', '--diff', nargs=2, metavar=('snapshot_1', 'snapshot_2'), help='create a plot that diffs two snapshots')
+        parser.add_argument('--dump', type=str, metavar='PATH', help='read memory from an offline ELF core dump instead of the gdb target (persistent)')
+        parser.add_argument('--live', action='store_true', help='switch back to read memory from the gdb target')
+        parser.add_argument('--more', type=str, metavar='CONTAINER', help='continue a truncated container of the snapshot (the latest one by default)')
+        parser.add_argument('--max-members', type=int, default=CONTAINER_MAX_MEMBERS, metavar='N', help='limit the number of members of each container (0 for unlimited)')
+        parser.add_argument('--max-bytes',   type=int, default=CONTAINER_MAX_BYTES,   metavar='N', help='limit the bytes read for each container (0 for unlimited)')
+        parser.add_argument('--time-budget', type=int, default=CONTAINER_TIME_BUDGET, metavar='MS', help='limit the time spent on each container (0 for unlimited)')
+        parser.add_argument('-j', '--jobs', type=int, default=SYNC_JOBS, metavar='N', help='sync diagrams in N worker processes (only for offline dumps)')
+        parser.add_argument('-i', '--incremental', action='store_true', default=INCREMENTAL_SYNC, help='re-sync the same code incrementally, only re-evaluating objects whose bytes are changed')
+        parser.add_argument('--delta', action='store_true', default=DELTA_PUSH, help='push only the objects changed since the last plot of the same code to the visualizer')
         parser.add_argument('--export', action='store_true', help='export plots to json files in local')
         parser.add_argument('--debug',  action='store_true', help='show debug info while processing request')
         parser.add_argument('--perf',   action='store_true', help='show profiling results while processing request')
@@ -67,15 +81,25 @@ class VPlotHandler:
 
         set_vl_debug(args.debug)
         set_vl_perf(args.perf)
+        set_container_limits(ContainerLimits(args.max_members, args.max_bytes, args.time_budget))
+        set_sync_jobs(args.jobs)
+        set_incremental_sync(args.incremental)
+        set_delta_push(args.delta)
+
+        if args.dump is not None and args.live:
+            parser.error("Arguments --dump and --live are mutually exclusive with each other")
+        if args.dump is not None or args.live:
+            cls.handle_backend(args.dump)
 
         mutual = (args.output is not None or len(args.entries) > 0) + \
             (args.list is not None) + \
             (args.file is not None) + \
             (args.chat is True) + \
             (args.query is True) + \
-            (args.diff is not None)
+            (args.diff is not None) + \
+            (args.more is not None)
         if mutual > 1:
-            parser.error("Arguments -o/-l/-f/-c/-q/-d are mutually exclusive with each other")
+            parser.error("Arguments -o/-l/-f/-c/-q/-d/--more are mutually exclusive with each other")
 
         if (args.list is not None) and (args.convar is not None):
             parser.error("Argument -l is mutually exclusive with convar")
@@ -90,6 +114,8 @@ class VPlotHandler:
             return cls.handle_query()
         if args.diff:
             return VDiffHandler.handle(args.diff[0], args.diff[1])
+        if args.more:
+            return cls.handle_more(args.convar, args.more)
 
         # print(f'{args.entries = !s}, {len(args.entries) = !s}')
         if len(args.entries) > 0:
@@ -97,9 +123,19 @@ class VPlotHandler:
                 cls.handle_plot(args.convar, args.output or '__ANON__', ' '.join(args.entries))
             except cls.ViewCLSynthesisError:
                 parser.print_help()
-        else:
+        elif args.dump is None and not args.live:
             parser.print_help()
 
+    @classmethod
+    def handle_backend(cls, path: str | None):
+        print(f'+ vplot --{"dump " + path if path else "live"}')
+        gdb_adaptor.set_backend(open_backend(path))
+
+    @classmethod
+    def handle_more(cls, convar: str | None, container_key: str):
+        print(f'+ vplot --more {container_key}')
+        core.extend(convar, container_key)
+
     @classmethod
     def handle_list(cls, symbol: str):
         print(f'+ vplot --list {symbol = }')
@@ -37,6 +37,34 @@ EXPORT_DIR         = VL_DIR / os.getenv('VISUALINUX_EXPORT_DIR', 'out')
 
 VISUALIZER_PORT    = int(os.getenv('VISUALINUX_VISUALIZER_PORT', 3000))
 
+MEMCACHE_PAGE_SIZE = int(os.getenv('VISUALINUX_MEMCACHE_PAGE_SIZE', 4096))
+MEMCACHE_MAX_PAGES = int(os.getenv('VISUALINUX_MEMCACHE_MAX_PAGES', 4096))
+DEREF_CACHE_SIZE   = int(os.getenv('VISUALINUX_DEREF_CACHE_SIZE', 0x40000))
+NATIVE_CEXPR       = os.getenv('VISUALINUX_NATIVE_CEXPR', '1') != '0'
+MAX_RECURSION_DEPTH = int(os.getenv('VISUALINUX_MAX_RECURSION_DEPTH', 32))
+# default limits of each container (0 for unlimited), overridable by vplot flags and ViewCL
+CONTAINER_MAX_MEMBERS = int(os.getenv('VISUALINUX_CONTAINER_MAX_MEMBERS', 0))
+CONTAINER_MAX_BYTES   = int(os.getenv('VISUALINUX_CONTAINER_MAX_BYTES', 0))
+CONTAINER_TIME_BUDGET = int(os.getenv('VISUALINUX_CONTAINER_TIME_BUDGET', 0))
+# number of worker processes to sync diagrams in parallel over an offline dump (1 for sequential sync)
+SYNC_JOBS = int(os.getenv('VISUALINUX_SYNC_JOBS', 1))
+# re-sync the same ViewCL code incrementally, i.e. carry over the boxes whose bytes are not changed since the last sync
+INCREMENTAL_SYNC = os.getenv('VISUALINUX_INCREMENTAL_SYNC', '0') != '0'
+# push only the changes relative to the previous snapshot of the same diagram to the visualizer (the PATCH command)
+DELTA_PUSH = os.getenv('VISUALINUX_DELTA_PUSH', '0') != '0'
+# preferred encoding of snapshots sent to the visualizer (json or cbor-v1), used only if the visualizer accepts it
+WIRE_ENCODING = os.getenv('VISUALINUX_WIRE_ENCODING', 'cbor-v1')
+# compression of request bodies sent to the visualizer (none, gzip or zstd), used only if the visualizer accepts it
+TRANSPORT_COMPRESSION    = os.getenv('VISUALINUX_TRANSPORT_COMPRESSION', 'gzip')
+TRANSPORT_COMPRESS_LEVEL = int(os.getenv('VISUALINUX_TRANSPORT_COMPRESS_LEVEL', 6))
+# max number of commands pending in the background sender (0 to send synchronously)
+TRANSPORT_QUEUE_SIZE     = int(os.getenv('VISUALINUX_TRANSPORT_QUEUE_SIZE', 8))
+# whether streamed (json) bodies are joined and queued to the background sender as well,
+# rather than sent in the caller thread while being serialized, which holds up to TRANSPORT_QUEUE_SIZE whole bodies in memory
+TRANSPORT_QUEUE_STREAMS  = os.getenv('VISUALINUX_TRANSPORT_QUEUE_STREAMS', '0') != '0'
+# seconds to wait for the visualizer to accept the connection and then to respond
+TRANSPORT_TIMEOUT        = float(os.getenv('VISUALINUX_TRANSPORT_TIMEOUT', 30))
+
 # exception re-throw utils
 # by default python gdb in vscode throw exceptions silently, which is really annoying
 
@@ -1,13 +1,19 @@
 from visualinux import *
 from visualinux.dsl.parser.parser import Parser
 from visualinux.dsl.model.symtable import *
+from visualinux.dsl.model.diagram import DiagramSet, get_incremental_sync
 from visualinux.runtime.gdb.adaptor import gdb_adaptor
+from visualinux.runtime.gdb.layout import layout_cache
+from visualinux.runtime import entity
 from visualinux.snapshot import *
+from visualinux.snapshot.stream import iter_command, iter_view, chunked, write_stream
+from visualinux.snapshot.wire import WIRE_CONTENT_TYPE, WIRE_FORMAT, encode_snapshot
 from visualinux.vdiff_monitor import VDiffMonitor
+from visualinux.transport import Transport
 
 import json
 import shutil
-import requests
+import time
 from datetime import datetime
 
 import cProfile, pstats, io
@@ -22,6 +28,9 @@ class Core:
         self.parser = Parser(VIEWCL_GRAMMAR_PATH)
         self.sn_manager = SnapshotManager()
         self.vdiff_monitor = VDiffMonitor()
+        # (code, model, snapshot) of the last sync, for the next incremental sync of the same code
+        self.last_sync: tuple[str, DiagramSet, Snapshot] | None = None
+        self.transport = Transport(f'http://localhost:{VISUALIZER_PORT}/vcmd')
 
     def parse_file(self, src_file: Path):
         return self.parse(src_file.read_text())
@@ -47,11 +56,18 @@ class Core:
             pr.enable()
 
         try:
-            model = self.parse(code)
-            snapshot = model.sync()
+            # an incremental sync reuses the parsed model, so that shape templates are the same as the last sync
+            if get_incremental_sync() and self.last_sync and self.last_sync[0] == code:
+                _, model, previous = self.last_sync
+            else:
+                model, previous = self.parse(code), None
+            snapshot = model.sync(previous)
+            self.last_sync = (code, model, snapshot) if get_incremental_sync() else None
         except Exception as e:
             print(f'vl_sync() unhandled exception: ' + str(e))
             snapshot = Snapshot()
+            self.last_sync = None
+        layout_cache.save()
 
         if vl_debug_on(): printd(f'vl_sync(): view sync OK')
         if vl_perf_on():
@@ -68,11 +84,10 @@ class Core:
         snapshot.key = sn_key
         self.sn_manager.set(sn_key, snapshot)
 
-        self.send({
-            'command': 'NEW',
-            'snKey': sn_key,
-            'snapshot': snapshot.to_json(),
-        })
+        if get_delta_push():
+            self.send(*self.sn_manager.delta(snapshot, code))
+        else:
+            self.send_snapshot('NEW', snapshot)
         if if_export or vl_debug_on():
             TMP_DIR.mkdir(exist_ok=True)
             EXPORT_DIR.mkdir(exist_ok=True)
@@ -81,11 +96,11 @@ class Core:
             export_dir.mkdir(exist_ok=True)
             for view in snapshot.views:
                 print(f'--export {view.name}.json')
-                self.export_for_debug(view.to_json(), export_dir / f'{view.name}.json')
+                write_stream(export_dir / f'{view.name}.json', iter_view(view))
             # self.reload_and_reexport_debug()
 
         # update tracked addresses for vdiff monitor
-        if self.vdiff_monitor.enabled:
+        if self.vdiff_monitor.enabled and gdb_adaptor.backend.is_live():
             try:
                 if self.vdiff_monitor.bpf_map.value == 0:
                     print(f'vl_sync() vdiff monitor init')
@@ -112,6 +127,51 @@ class Core:
 
         return snapshot
 
+    def extend(self, sn_key: str | None, container_key: str):
+        '''continue a truncated container of a synced snapshot (the latest one by default) from its cursor,
+           and send the extended snapshot without re-syncing the whole diagram.
+        '''
+        snapshot = self.sn_manager.get(sn_key) if sn_key else self.sn_manager.latest()
+        if snapshot is None:
+            print(f'[ERROR] snapshot {sn_key or "<latest>"} not found')
+            return None
+        if vl_debug_on(): printd(f'vl_extend({snapshot.key}, {container_key})')
+        gdb_adaptor.reset()
+        KValue.reset()
+        SymTable.reset()
+
+        extended = False
+        for view in snapshot.views:
+            if not isinstance(view, StateView):
+                continue
+            ent = view.pool.containers.get(container_key)
+            if not isinstance(ent, entity.Container):
+                continue
+            if ent.cursor is None:
+                print(f'container {container_key} in view {view.name} is not truncated')
+                continue
+            try:
+                count = ent.model.evaluate_more(view.pool, ent)
+            except Exception as e:
+                print(f'vl_extend() unhandled exception: ' + str(e))
+                continue
+            view.redo_postprocess()
+            remaining = f', truncated again at {ent.cursor.index}' if ent.cursor else ''
+            print(f'container {container_key} in view {view.name}: {count} more members{remaining}')
+            extended = True
+        layout_cache.save()
+        if not extended:
+            print(f'[ERROR] no truncated container {container_key} found in snapshot {snapshot.key}')
+            return snapshot
+
+        if get_delta_push():
+            self.send(*self.sn_manager.delta_against(snapshot, snapshot))
+        else:
+            # the visualizer no longer keeps the pushed snapshot as a patch base
+            snapshot.digests = None
+            self.send_snapshot('NEW', snapshot)
+        return snapshot
+
     def __init_vdiff_monitor(self):
         snapshot = self.__fetch_bpf_map_snapshot()
         for box in snapshot.views[0].pool.boxes.values():
@@ -133,31 +193,45 @@ class Core:
     def __update_vdiff_monitor(self, snapshot: Snapshot):
         tracked_addrs: list[int] = []
         for view in snapshot.views:
+            if not isinstance(view, StateView):
+                continue
             for box in view.pool.boxes.values():
                 tracked_addrs.append(box.addr)
             for box in view.pool.containers.values():
                 tracked_addrs.append(box.addr)
         self.vdiff_monitor.update(tracked_addrs)
 
-    def send_diff(self, sn_key_src: str, sn_key_dst: str):
+    def send_diff(self, sn_key_src: str, sn_key_dst: str, diff: dict[str, dict] | None = None):
+        '''send a DIFF command, with the diff document computed by snapshot.diff if given,
+           so that the visualizer synthesizes the diff plot without comparing the snapshots by itself.
+        '''
         self.send({
             'command': 'DIFF',
             'snKeySrc': sn_key_src,
             'snKeyDst': sn_key_dst,
-            'trackedAddrs': self.vdiff_monitor.get_tracked_addrs(sn_key_src, sn_key_dst)
+            'trackedAddrs': self.vdiff_monitor.get_tracked_addrs(sn_key_src, sn_key_dst),
+            'diff': diff,
         })
 
-    def send(self, json_data: dict):
-        server_url = f'http://localhost:{VISUALIZER_PORT}'
-        url = f'{server_url}/vcmd'
-        headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
-        try:
-            response = requests.post(url, headers=headers, json=json_data)
-            print(f'POST to visualizer {response}')
-        except Exception as e:
-            print(f'[ERROR] Failed to POST data to visualizer; please check the connection.')
-            print(f'- {e!s}')
-            print(f'- {url = }')
+    def send(self, json_data: dict, on_sent: Callable[[], None] | None = None):
+        self.transport.submit_json(json_data.get('command', 'json'), json_data, on_sent)
+
+    def send_snapshot(self, command: str, snapshot: Snapshot):
+        '''send a snapshot command in the binary wire format if the visualizer accepts it,
+           which is encoded here as a whole and sent in the background if the transport is async;
+           otherwise its json text is encoded here while being sent (by chunked transfer),
+           so that neither the whole dict nor the whole text of a large snapshot is built in memory,
+           unless VISUALINUX_TRANSPORT_QUEUE_STREAMS joins it to be sent in the background.
+        '''
+        if WIRE_ENCODING == WIRE_FORMAT and self.transport.accepts(WIRE_FORMAT):
+            tstart = time.time()
+            data = encode_snapshot(command, snapshot)
+            serialize_ms = (time.time() - tstart) * 1000
+            if vl_debug_on(): printd(f'send_snapshot {snapshot.key} as {WIRE_FORMAT}: {len(data)} bytes')
+            headers = {'Content-type': WIRE_CONTENT_TYPE, 'X-Visualinux-Encoding': WIRE_FORMAT}
+            self.transport.submit(command, data, headers, serialize_ms)
+            return
+        self.transport.submit(command, chunked(iter_command({'command': command, 'snKey': snapshot.key}, snapshot)))
 
     def export_for_debug(self, json_data: dict, path: Path):
         with open(path, 'w') as f:
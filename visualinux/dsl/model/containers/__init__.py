@@ -3,6 +3,7 @@ from visualinux.dsl.model.containers.linkedlist import *
 from visualinux.dsl.model.containers.hlist import *
 from visualinux.dsl.model.containers.rbtree import *
 from visualinux.dsl.model.containers.xarray import *
+from visualinux.dsl.model.containers.maple_tree import *
 from visualinux.dsl.model.containers.unordered_set import *
 
 def get_basic_container_shape(name: str) -> Type[Container]:
@@ -12,5 +13,6 @@ def get_basic_container_shape(name: str) -> Type[Container]:
         case 'HList':  return HList
         case 'RBTree': return RBTree
         case 'XArray': return XArray
+        case 'MapleTree': return MapleTree
         case 'UnorderedSet': return UnorderedSet
         case _: raise fuck_exc(AssertionError, f'undefined container type {name = }')
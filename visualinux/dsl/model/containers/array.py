@@ -42,42 +42,39 @@ class Array(Container):
 
         if not root.gtype.target().is_array():
             raise fuck_exc(AssertionError, f'{self.name} {root = !s} should be of array type')
-        arr = root.decompose_array()
+        self.evaluate_members(pool, ent_container, self.start_budget(), None)
 
-        for i, member_value in enumerate(arr):
+        pool.add_container(ent_container)
+        return ent_container
+
+    def evaluate_members(self, pool: Pool, ent_container: entity.Container, budget: ContainerBudget, cursor: ContainerCursor | None) -> None:
+        root = ent_container.root
+        arr = root.decompose_array()
+        item_size = root.gtype.target().target().sizeof()
+        start = cursor.index if cursor else 0
+        last = root.address
+        for i, member_value in budget.iterate(enumerate(arr[start :], start), self.prefetch_indexed):
             if vl_debug_on(): printd(f'{self.name} __evaluate_member {i = }, {member_value = !s}')
             # if not member_value.is_pointer() and not member_value.type.is_scalar():
             #     member_value = member_value.address_of()
             ent = self.evaluate_member(pool, member_value, i)
             if vl_debug_on(): printd(f'+ {member_value = !s}, {ent.key = !s}')
             ent_container.add_member(ent.key)
+            last = root.address + i * item_size
+        self.set_cursor(ent_container, budget, last)
 
-        pool.add_container(ent_container)
-        return ent_container
+    def prefetch_indexed(self, batch: list[tuple[int, KValue]]) -> None:
+        self.prefetch_members([member_value for _, member_value in batch])
 
     def evaluate_member(self, pool: Pool, member: KValue, index: int) -> entity.NotPrimitive:
 
-        member_shape = self.member_shape
-        while isinstance(member_shape, SwitchCase):
-            member_shape = member_shape.evaluate_on(pool, member)
-
-        if isinstance(member_shape, BoxRecursion):
-            member_shape = member_shape.expand_to(self)
-        else:
-            member_shape = member_shape.clone_to(self)
-
-        if not isinstance(member_shape, Box | Container):
-            raise fuck_exc(AssertionError, f'{self.name} member_shape must be Box or Container but {member_shape = !s}')
+        member_shape = self.resolve_member_shape(pool, member)
 
         if vl_debug_on(): printd(f'{self.name} eval_member {member!s}')
         if vl_debug_on(): printd(f'    {self.name} {member_shape.format_string_head() = !s}')
         # if VL_DEBUG_ON: printd(f'    {self.name} {member_shape.scope = !s}')
-        if 'index' in member_shape.scope:
-            print(str(member_shape.scope))
-            raise fuck_exc(AssertionError, 'Array temp_patch variable "index" conflicted')
-        member_shape.scope['index'] = Term.CExpr(str(index))
 
-        return member_shape.evaluate_on(pool, member)
+        return self.evaluate_member_shape(pool, member_shape, member, index=Term.CExpr(str(index)))
 
     def evaluate_from_py_value(self, pool: Pool, root: PyListOfKValues) -> entity.Container:
         ent_container = entity.Container(self, KValueVBox(pool.gen_vbox_addr()), self.label)
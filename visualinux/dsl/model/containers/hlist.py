@@ -35,21 +35,51 @@ class HList(Container):
             return ent_existed
         if vl_debug_on(): printd(f'{self.name} {ent_container = !s}')
 
-        curr = root.eval_field('first')
+        self.evaluate_members(pool, ent_container, self.start_budget(), None)
+
+        pool.add_container(ent_container)
+        return ent_container
+
+    def evaluate_members(self, pool: Pool, ent_container: entity.Container, budget: ContainerBudget, cursor: ContainerCursor | None) -> None:
+        root = ent_container.root
+        first = root.eval_field('first')
+        start = first if cursor is None or cursor.index == 0 else KValue(first.gtype, cursor.addr).eval_field('next')
+        last = cursor.addr if cursor else root.value
+
+        walker = BrentWalker(start, self.next_of, lambda node: node.value == KValue_NULL.value)
         members: list[entity.NotPrimitive] = []
-        while curr.value != KValue_NULL.value:
+        for curr in budget.iterate(walker, self.prefetch_members):
             try:
                 if vl_debug_on(): printd(f'{self.name} __evaluate_member {curr = !s}')
                 ent = self.evaluate_member(pool, curr)
                 if vl_debug_on(): printd(f'+ {curr = !s}, {root = !s}, {ent.key = !s}')
                 members.append(ent)
-                curr = curr.eval_field('next')
             except Exception as e:
                 raise fuck_exc(e.__class__, str(e) + f' in {curr = !s}')
+            last = curr.value
 
+        # nodes after the cycle are repeated ones, and the last member links back instead.
+        # the cycle is ignored if the budget runs out before all of its nodes are evaluated,
+        # in which case it will be found again when the container is continued.
+        cycle = walker.cycle
+        if cycle and len(members) >= cycle.index + cycle.length:
+            members = members[: cycle.index + cycle.length]
+            budget.truncated = False
+        else:
+            cycle = None
+        base = len(ent_container.members)
+        # the last member of the previous page is linked to the first new one
+        if members and ent_container.members:
+            ent_container.add_link_to_member(ent_container.members[-1].key, next=members[0].key)
         for i in range(len(members)):
             next_key = members[i + 1].key if i < len(members) - 1 else None
             ent_container.add_member(members[i].key, next=next_key)
 
-        pool.add_container(ent_container)
-        return ent_container
+        if cycle:
+            ent_container.add_link_to_member(members[-1].key, next=members[cycle.index].key)
+        self.set_cycle(ent_container, cycle, base)
+        self.set_cursor(ent_container, budget, last)
+
+    @staticmethod
+    def next_of(node: KValue) -> KValue:
+        return node.eval_field('next')
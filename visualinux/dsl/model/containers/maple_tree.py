@@ -0,0 +1,93 @@
+from visualinux import *
+from visualinux.term import *
+from visualinux.dsl.model.shape import *
+from visualinux.runtime import utils
+
+class MapleTree(Container):
+
+    def __init__(self, label: str, root: Term, type: Term, parent: 'NotPrimitive | None' = None) -> None:
+
+        root = Term.Field(type.field_seq) if type and type.field_seq else root
+        if vl_debug_on(): printd(f'creat MapleTree {root = !s}')
+
+        super().__init__('MapleTree', label, root, type, parent)
+        self.type: Term
+        self.parent: 'NotPrimitive'
+
+    def clone_to(self, parent: 'NotPrimitive') -> 'MapleTree':
+        mtree = MapleTree(self.label, self.root, self.type, parent)
+        mtree.scope = self.scope.clone_to(mtree)
+        mtree.member_shape = self.member_shape.clone_to(mtree)
+        return mtree
+
+    def evaluate_on(self, pool: Pool, iroot: KValue | None = None) -> entity.Container:
+        super().evaluate_on(pool, iroot)
+        assert self.root
+
+        if vl_debug_on(): printd(f'{self.name} evaluate_on {self.root = !s}, {iroot = !s}')
+        root = iroot if iroot else self.parent.scope.evaluate_term(self.root)
+
+        if vl_debug_on(): printd(f'{self.name} evaluate_on {root = !s}')
+        self.scope.root_value = root.cast(self.type)
+
+        ent_container = entity.Container(self, root, self.label)
+        if ent_existed := pool.find_container(ent_container.key):
+            if vl_debug_on(): printd(f'{self.name} evaluate_on {root = !s} duplicated;')
+            return ent_existed
+        if vl_debug_on(): printd(f'{self.name} {ent_container = !s}')
+
+        self.evaluate_members(pool, ent_container, self.start_budget(), None)
+
+        pool.add_container(ent_container)
+        return ent_container
+
+    def evaluate_members(self, pool: Pool, ent_container: entity.Container, budget: ContainerBudget, cursor: ContainerCursor | None) -> None:
+        if cursor:
+            # resume the walk saved on truncation, whose stack is where the last evaluation stopped
+            walker = cursor.state['walker']
+        else:
+            walker = enumerate(self.walk(ent_container.root.eval_field('ma_root')))
+        last = cursor.addr if cursor else ent_container.root.address
+        for index, (member, ma_min, ma_max) in budget.iterate(walker):
+            ent_curr = self.evaluate_member(pool, member, index, ma_min, ma_max)
+            ent_container.add_member(ent_curr.key)
+            last = member.value
+        self.set_cursor(ent_container, budget, last, walker=budget.rest)
+
+    def walk(self, entry: KValue) -> Generator[tuple[KValue, int, int], None, None]:
+        '''depth-first traversal with an explicit stack, yielding (entry, ma_min, ma_max) for each non-NULL leaf entry in index order.
+           The slots and pivots of each node are read only once, and the ranges are computed in python.
+           It is lazy, so that the container budget stops it (and keeps it to resume) by not iterating further.
+        '''
+        if entry.value == KValue_NULL.value:
+            return
+        if not self.mt_is_node(entry.value):
+            # a single entry stored in the root covers the index 0 only
+            yield entry, 0, 0
+            return
+        stack: list[tuple[KValue, int, int]] = [(entry, 0, utils.mt_max[utils.mte_node_type(entry).value])]
+        while stack:
+            entry, ma_min, ma_max = stack.pop()
+            if vl_debug_on(): printd(f'{self.name} walk {entry!s}, {ma_min = :#x}, {ma_max = :#x}')
+            is_leaf, slots = utils.mt_node_entries(entry, ma_min, ma_max)
+            if not is_leaf:
+                children = [KValue(entry.gtype, slot) for slot, _, _ in slots]
+                gdb_adaptor.preload_many([(utils.mte_to_node(child).value, utils.gtype_ptr_maple_node) for child in children])
+                for child, (_, lo, hi) in zip(reversed(children), reversed(slots)):
+                    stack.append((child, lo, hi))
+                continue
+            members = [KValue(entry.gtype, slot) for slot, _, _ in slots]
+            gdb_adaptor.preload_many(self.member_objects(members))
+            for member, (_, lo, hi) in zip(members, slots):
+                yield member, lo, hi
+
+    @staticmethod
+    def mt_is_node(entry: int) -> bool:
+        '''xa_is_node(entry): internal entries with the low bits 0b10, excluding the small reserved values.
+        '''
+        return entry & 3 == 2 and entry > 4096
+
+    def evaluate_member(self, pool: Pool, member: KValue, index: int, ma_min: int, ma_max: int) -> entity.NotPrimitive:
+        member_shape = self.resolve_member_shape(pool, member)
+        return self.evaluate_member_shape(pool, member_shape, member,
+            index=Term.CExpr(str(index)), ma_min=Term.CExpr(str(ma_min)), ma_max=Term.CExpr(str(ma_max)))
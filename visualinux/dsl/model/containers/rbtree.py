@@ -1,6 +1,7 @@
 from visualinux import *
 from visualinux.term import *
 from visualinux.dsl.model.shape import *
+from visualinux.evaluation import evaluation_counter
 
 class RBTree(Container):
 
@@ -41,30 +42,104 @@ class RBTree(Container):
             return ent_existed
         if vl_debug_on(): printd(f'{self.name} {ent_container = !s}')
 
-        if vl_debug_on(): printd(f'!!! RBTREE __evaluate_dfs {pool = } {ent_container = } {root.eval_field("rb_node") = }')
-        self.__evaluate_dfs(pool, ent_container, root.eval_field('rb_node'))
+        self.evaluate_members(pool, ent_container, self.start_budget(), None)
 
         pool.add_container(ent_container)
         return ent_container
 
-    def __evaluate_dfs(self, pool: Pool, ent_container: entity.Container, node_addr: KValue) -> entity.NotPrimitive:
-
-        if vl_debug_on(): printd(f'??? RBTREE __evaluate_dfs {pool = } {ent_container = } {node_addr = }')
-        if node_addr.value == KValue_NULL.value:
-            return entity.Box(None, KValue_NULL, '', OrderedDict())
-
-        if vl_debug_on(): printd(f'RBTree __evaluate_dfs {node_addr = }')
-        ent_curr = self.evaluate_member(pool, node_addr)
-        if vl_debug_on(): printd(f'    RBTree __evaluate_dfs {ent_curr.key = !s}')
-
-        ent_left  = self.__evaluate_dfs(pool, ent_container, node_addr.eval_field('rb_left'))
-
-        ent_container.add_member(ent_curr.key)
-
-        ent_right = self.__evaluate_dfs(pool, ent_container, node_addr.eval_field('rb_right'))
-
-        # ent_container.add_member(ent_curr.key, view, left=ent_left.key, right=ent_right.key)
-        ent_container.add_link_to_member(ent_curr.key, left=ent_left.key, right=ent_right.key)
-
-        if vl_debug_on(): printd(f'    RBTree __evaluate_dfs {ent_curr.key = }, {ent_left.key = }, {ent_right.key = }')
-        return ent_curr
+    def evaluate_members(self, pool: Pool, ent_container: entity.Container, budget: ContainerBudget, cursor: ContainerCursor | None) -> None:
+        '''walk the tree with an explicit stack in the order of a recursive dfs: each node is evaluated before its subtrees,
+           while it is added as a member after its left subtree, i.e. members are in order.
+           On truncation the nodes on the stack are added with their known links, and the walk state is kept in the cursor,
+           so that continuation goes on from the stack rather than walking the tree again.
+        '''
+        rb_node = ent_container.root.eval_field('rb_node')
+        self.__prefetch_bfs(rb_node, budget, cursor.index if cursor else 0)
+        if cursor:
+            node, stack, pending = cursor.state['node'], cursor.state['stack'], cursor.state['pending']
+        else:
+            node, stack, pending = rb_node, [], None
+        last = cursor.addr if cursor else ent_container.root.address
+        while stack or node.value != KValue_NULL.value:
+            while node.value != KValue_NULL.value:
+                if not budget.take():
+                    self.__add_stacked(ent_container, stack)
+                    self.set_cursor(ent_container, budget, last, node=node, stack=stack, pending=pending)
+                    return
+                if vl_debug_on(): printd(f'RBTree evaluate_member {node = !s}')
+                key = self.evaluate_member(pool, node).key
+                last = node.value
+                # the node is either the right child of the pending member, or the left child of the top of the stack
+                if pending is not None:
+                    pending.link(right=key)
+                    pending = None
+                elif stack:
+                    stack[-1].left_key = key
+                    if stack[-1].member is not None:
+                        stack[-1].member.link(left=key)
+                frame = RBTreeFrame(node, key, node.eval_field('rb_left'), node.eval_field('rb_right'))
+                stack.append(frame)
+                node = frame.left
+            frame = stack.pop()
+            if frame.member is None:
+                frame.member = ent_container.add_member(frame.key, left=frame.left_key_or_null(), right=frame.right_key_or_null())
+            if frame.right.value != KValue_NULL.value:
+                pending = frame.member
+            node = frame.right
+        self.set_cursor(ent_container, budget, last)
+
+    @staticmethod
+    def __add_stacked(ent_container: entity.Container, stack: list['RBTreeFrame']) -> None:
+        '''add the evaluated nodes whose left subtrees are not finished, in order (the top of the stack first),
+           where links to the nodes not evaluated yet are None until the continuation reaches them.
+        '''
+        for frame in reversed(stack):
+            if frame.member is None:
+                frame.member = ent_container.add_member(frame.key, left=frame.left_key_or_null(), right=frame.right_key_or_null())
+
+    def __prefetch_bfs(self, rb_node: KValue, budget: ContainerBudget, start: int) -> None:
+        '''fetch the tree level by level, so that round trips are O(depth) rather than O(nodes).
+           It stops once the budget is exhausted or the nodes to be evaluated (start + max_members) are fetched,
+           and never fetches a node twice, so that a corrupted (cyclic) tree cannot keep it going.
+           Its own reads are only bounded by max_bytes rather than charged to the budget, since the walk reads them again.
+        '''
+        bytes_start = evaluation_counter.bytes
+        max_members = budget.limits.max_members
+        max_nodes = start + max_members if max_members else None
+        level = [rb_node] if rb_node.value != KValue_NULL.value else []
+        visited: set[int] = {rb_node.value}
+        try:
+            while level and not budget.exhausted():
+                self.prefetch_members(level)
+                if max_nodes is not None and len(visited) >= max_nodes:
+                    return
+                if budget.limits.max_bytes and evaluation_counter.bytes - bytes_start >= budget.limits.max_bytes:
+                    return
+                next_level: list[KValue] = []
+                for node in level:
+                    for child in (node.eval_field('rb_left'), node.eval_field('rb_right')):
+                        if child.value != KValue_NULL.value and child.value not in visited:
+                            visited.add(child.value)
+                            next_level.append(child)
+                level = next_level
+        finally:
+            budget.bytes_start += evaluation_counter.bytes - bytes_start
+
+@dataclass(slots=True)
+class RBTreeFrame:
+    '''A node on the walking stack of RBTree, whose child links are read once.
+       - left_key: key of the evaluated left child, or None if it is not evaluated yet
+       - member:   the container member of the node, or None if it is not added yet
+    '''
+    node:  KValue
+    key:   str
+    left:  KValue
+    right: KValue
+    left_key: str | None = None
+    member: entity.ContainerMember | None = None
+
+    def left_key_or_null(self) -> str | None:
+        return KValue_NULL.json_data_key if self.left.value == KValue_NULL.value else self.left_key
+
+    def right_key_or_null(self) -> str | None:
+        return KValue_NULL.json_data_key if self.right.value == KValue_NULL.value else None
@@ -39,32 +39,30 @@ class UnorderedSet(Container):
 
         if not root.gtype.target().is_array():
             raise fuck_exc(AssertionError, f'{self.name} {root = !s} should be of array type')
-        arr = root.decompose_array()
-
-        for i, member_value in enumerate(arr):
-            if vl_debug_on(): printd(f'{self.name} __evaluate_member {i = }, {member_value = !s}')
-            ent = self.evaluate_member(pool, member_value)
-            if vl_debug_on(): printd(f'+ {member_value = !s}, {ent.key = !s}')
-            ent_container.add_member(ent.key)
+        self.evaluate_members(pool, ent_container, self.start_budget(), None)
 
         pool.add_container(ent_container)
         return ent_container
 
-    def evaluate_member(self, pool: Pool, member: KValue) -> entity.NotPrimitive:
-
-        member_shape = self.member_shape
-        while isinstance(member_shape, SwitchCase):
-            member_shape = member_shape.evaluate_on(pool, member)
+    def evaluate_members(self, pool: Pool, ent_container: entity.Container, budget: ContainerBudget, cursor: ContainerCursor | None) -> None:
+        root = ent_container.root
+        arr = root.decompose_array()
+        item_size = root.gtype.target().target().sizeof()
+        start = cursor.index if cursor else 0
+        last = cursor.addr if cursor else root.address
+        for i, member_value in budget.iterate(enumerate(arr[start :], start)):
+            if vl_debug_on(): printd(f'{self.name} __evaluate_member {i = }, {member_value = !s}')
+            ent = self.evaluate_member(pool, member_value, i)
+            if vl_debug_on(): printd(f'+ {member_value = !s}, {ent.key = !s}')
+            ent_container.add_member(ent.key)
+            last = root.address + i * item_size
+        self.set_cursor(ent_container, budget, last)
 
-        if isinstance(member_shape, BoxRecursion):
-            member_shape = member_shape.expand_to(self)
-        else:
-            member_shape = member_shape.clone_to(self)
+    def evaluate_member(self, pool: Pool, member: KValue, index: int) -> entity.NotPrimitive:
 
-        if not isinstance(member_shape, Box | Container):
-            raise fuck_exc(AssertionError, f'{self.name} member_shape must be Box or Container but {member_shape = !s}')
+        member_shape = self.resolve_member_shape(pool, member)
 
         if vl_debug_on(): printd(f'{self.name} eval_member {member!s}')
         if vl_debug_on(): printd(f'    {self.name} {member_shape.format_string_head() = !s}')
 
-        return member_shape.evaluate_on(pool, member)
+        return self.evaluate_member_shape(pool, member_shape, member, index=Term.CExpr(str(index)))
@@ -36,66 +36,96 @@ class XArray(Container):
             return ent_existed
         if vl_debug_on(): printd(f'{self.name} {ent_container = !s}')
 
-        entry = root.eval_field('xa_head')
-        index = 0
-        if self.xa_check('xa_is_node', entry):
-            node = self.xa_convert('xa_to_node', entry)
-            shift = self.xa_node_shift(node) + utils.XA_CHUNK_SHIFT
-        else:
-            node = 'undefined'
-            shift = 0
-        if vl_debug_on(): printd(f'{self.name} __evaluate_dfs before {entry!s}, {node = !s}, {index = }, {shift = }')
-        self.__evaluate_dfs(pool, ent_container, entry, index, shift)
+        self.evaluate_members(pool, ent_container, self.start_budget(), None)
 
         pool.add_container(ent_container)
         return ent_container
 
-    def __evaluate_dfs(self, pool: Pool, ent_container: entity.Container, entry: KValue, index: int, shift: int) -> None:
-
-        if entry.value == KValue_NULL.value:
-            return
-
-        if vl_debug_on(): printd(f'{self.name} __evaluate_dfs {entry!s}, {index = }, {shift = }')
-        ent_spec = entity.Box(None, KValueVBox(pool.gen_vbox_addr()), '', OrderedDict({'default': entity.View('default', None, OrderedDict())}))
-        ent_spec.parent = ent_container.key
-        use_spec = True
-        if self.xa_check('xa_is_node', entry):
-            if shift == 0:
-                ent_spec.add_member('default', 
-                    'entry_node', entity.Text(entry, TextFormat.gen_default()))
+    def evaluate_members(self, pool: Pool, ent_container: entity.Container, budget: ContainerBudget, cursor: ContainerCursor | None) -> None:
+        if cursor:
+            # resume the walk saved on truncation, whose stack is where the last evaluation stopped
+            walker = cursor.state['walker']
+        else:
+            entry = ent_container.root.eval_field('xa_head')
+            index = 0
+            if self.xa_check('xa_is_node', entry):
+                node = self.xa_convert('xa_to_node', entry)
+                shift = self.xa_node_shift(node) + utils.XA_CHUNK_SHIFT
             else:
+                node = 'undefined'
+                shift = 0
+            if vl_debug_on(): printd(f'{self.name} walk before {entry!s}, {node = !s}, {index = }, {shift = }')
+            walker = self.walk(entry, index, shift)
+        last = cursor.addr if cursor else ent_container.root.address
+        for entry, index, is_node in budget.iterate(walker):
+            self.__evaluate_entry(pool, ent_container, entry, index, is_node)
+            last = entry.value
+        self.set_cursor(ent_container, budget, last, walker=budget.rest)
+
+    def walk(self, entry: KValue, index: int, shift: int) -> Generator[tuple[KValue, int, bool], None, None]:
+        '''depth-first traversal with an explicit stack, yielding (entry, index, is_node) for each non-NULL leaf entry,
+           where is_node means a node entry at the bottom level (shift == 0).
+           It is lazy, so that the container budget stops it (and keeps it to resume) by not iterating further.
+        '''
+        stack: list[tuple[KValue, int, int]] = [(entry, index, shift)]
+        while stack:
+            entry, index, shift = stack.pop()
+            if entry.value == KValue_NULL.value:
+                continue
+            if vl_debug_on(): printd(f'{self.name} walk {entry!s}, {index = }, {shift = }')
+            is_node = self.xa_check('xa_is_node', entry)
+            if is_node and shift != 0:
                 node = self.xa_convert('xa_to_node', entry)
                 slots = node.eval_field('slots').decompose_array()
                 if vl_debug_on(): printd(f'xarray {node = !s} => {slots = !s}')
-                for i, slot in enumerate(slots):
-                    nshift = self.xa_node_shift(node)
-                    nindex = index + (i << nshift)
-                    if vl_debug_on(): printd(f'{self.name} __evaluate_dfs before {entry!s}, {slot = !s}, {nindex = }, {nshift = }')
-                    self.__evaluate_dfs(pool, ent_container, slot, nindex, nshift)
-                use_spec = False
+                self.__prefetch_slots(node, slots)
+                nshift = self.xa_node_shift(node)
+                for i in reversed(range(len(slots))):
+                    stack.append((slots[i], index + (i << nshift), nshift))
+                continue
+            yield entry, index, is_node
+
+    def __evaluate_entry(self, pool: Pool, ent_container: entity.Container, entry: KValue, index: int, is_node: bool) -> None:
+
+        if vl_debug_on(): printd(f'{self.name} __evaluate_entry {entry!s}, {index = }, {is_node = }')
+        if is_node:
+            spec = ('entry_node', entry)
         elif self.xa_check('xa_is_value', entry):
-            ent_spec.add_member('default', 
-                'entry_value',    entity.Text(self.xa_convert('xa_to_value',    entry), TextFormat.gen_default()))
+            spec = ('entry_value', self.xa_convert('xa_to_value', entry))
         elif not self.xa_check('xa_is_internal', entry):
             ent_curr = self.evaluate_member(pool, entry, index)
             ent_container.add_member(ent_curr.key)
-            use_spec = False
+            return
         elif self.xa_check('xa_is_retry', entry):
-            ent_spec.add_member('default', 
-                'entry_internal', entity.Text(self.xa_convert('xa_to_internal', entry), TextFormat.gen_default()))
+            spec = ('entry_internal', self.xa_convert('xa_to_internal', entry))
         elif self.xa_check('xa_is_sibling', entry):
-            ent_spec.add_member('default',
-                'entry_sibling',  entity.Text(self.xa_convert('xa_to_sibling',  entry), TextFormat.gen_default()))
+            spec = ('entry_sibling', self.xa_convert('xa_to_sibling', entry))
         elif self.xa_check('xa_is_zero', entry):
-            ent_spec.add_member('default', 
-                'entry_zero',     entity.Text(self.xa_convert('xa_to_internal', entry), TextFormat.gen_default()))
+            spec = ('entry_zero', self.xa_convert('xa_to_internal', entry))
         else:
-            ent_spec.add_member('default', 
-                'entry_error',    entity.Text(entry, TextFormat.gen_default()))
+            spec = ('entry_error', entry)
 
-        if use_spec:
-            ent_container.add_member(ent_spec.key)
-            pool.add_box(ent_spec)
+        # special entries are shown as virtual boxes, which are only created when needed
+        ent_spec = entity.Box(None, KValueVBox(pool.gen_vbox_addr()), '', OrderedDict({'default': entity.View('default', None, OrderedDict())}))
+        ent_spec.parent = ent_container.key
+        ent_spec.add_member('default', spec[0], entity.Text(spec[1], TextFormat.gen_default()))
+        ent_container.add_member(ent_spec.key)
+        pool.add_box(ent_spec)
+
+    def __prefetch_slots(self, node: KValue, slots: list[KValue]) -> None:
+        '''fetch all children of an xa_node in one batch: internal node entries point to xa_nodes,
+           and normal pointer entries are the members.
+        '''
+        members: list[KValue] = []
+        children: list[tuple[int, GDBType]] = []
+        for slot in slots:
+            if slot.value == KValue_NULL.value:
+                continue
+            if slot.value & 3 == 0:
+                members.append(slot)
+            elif slot.value & 3 == 2 and slot.value > 4096:
+                children.append((slot.value - 2, node.gtype))
+        gdb_adaptor.preload_many(children + self.member_objects(members))
 
     def xa_check(self, function: str, entry: KValue) -> bool:
         value = self.xa_convert(function, entry)
@@ -110,20 +140,5 @@ class XArray(Container):
         return shift.value
 
     def evaluate_member(self, pool: Pool, member: KValue, index: int) -> entity.NotPrimitive:
-
-        if isinstance(self.member_shape, SwitchCase):
-            member_shape = self.member_shape.evaluate_on(pool, member)
-        elif isinstance(self.member_shape, BoxRecursion):
-            member_shape = self.member_shape.expand_to(self)
-        else:
-            member_shape = self.member_shape.clone_to(self)
-
-        if not isinstance(member_shape, Box | Container):
-            raise fuck_exc(AssertionError, f'{self.name} member_shape must be Box or Container but {member_shape = !s}')
-
-        if 'index' in member_shape.scope:
-            print(str(member_shape.scope))
-            raise fuck_exc(AssertionError, 'Array temp_patch variable "index" conflicted')
-        member_shape.scope['index'] = Term.CExpr(str(index))
-
-        return member_shape.evaluate_on(pool, member)
+        member_shape = self.resolve_member_shape(pool, member)
+        return self.evaluate_member_shape(pool, member_shape, member, index=Term.CExpr(str(index)))
@@ -4,9 +4,27 @@ from visualinux.dsl.model.shape import *
 from visualinux.dsl.parser.viewql_units import *
 from visualinux.snapshot import *
 from visualinux.evaluation import *
+from visualinux.runtime.gdb.adaptor import gdb_adaptor
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 
 PlotTarget = Box | Container
 
+__sync_jobs: int = SYNC_JOBS
+def get_sync_jobs() -> int:
+    return __sync_jobs
+def set_sync_jobs(jobs: int):
+    global __sync_jobs
+    __sync_jobs = jobs
+
+__incremental_sync: bool = INCREMENTAL_SYNC
+def get_incremental_sync() -> bool:
+    return __incremental_sync
+def set_incremental_sync(incremental: bool):
+    global __incremental_sync
+    __incremental_sync = incremental
+
 @dataclass
 class Diagram:
     plot_targets: list[PlotTarget]
@@ -32,34 +50,96 @@ class DiagramSet:
                 ss += f'  }}'
         return ss
 
-    def sync(self) -> Snapshot:
+    def sync(self, previous: Snapshot | None = None) -> Snapshot:
+        '''sync all diagrams into a new snapshot.
+           For an incremental sync, the previous snapshot (of the same diagram set) is given,
+           whose boxes are carried over if the bytes they have read are not changed.
+        '''
+        incremental = get_incremental_sync()
+        jobs = min(get_sync_jobs(), len(self.diagrams))
+        if jobs > 1:
+            if incremental:
+                print(f'[WARNING] parallel sync is not available for incremental sync, fall back to sequential sync')
+            elif not gdb_adaptor.backend.is_live():
+                return self.sync_parallel(jobs)
+            else:
+                print(f'[WARNING] parallel sync is only available for offline dumps, fall back to sequential sync')
         snapshot = Snapshot()
+        # boxes plotted by several diagrams are only evaluated once per snapshot
+        shared = None
+        if incremental:
+            shared = SharedCache(previous.shared if previous else None, recording=True)
+        elif len(self.diagrams) > 1:
+            shared = SharedCache()
         evaluation_result: OrderedDict[str, EvaluationCounter] = OrderedDict()
         for name, diagram in self.diagrams.items():
             try:
                 try:
                     evaluation_counter.reset()
                     # state.substates[name] = show_time_usage(name, lambda: self.sync_sub(name, targets))
-                    snapshot.add_view(self.sync_sub(name, diagram))
+                    snapshot.add_view(self.sync_sub(name, diagram, shared))
+                    if shared: shared.commit()
                     # evaluation_show(name)
                     evaluation_result[name] = evaluation_counter.clone()
                 except Exception as e:
                     raise fuck_exc(Exception, 'vl_sync() unhandled exception')
             except Exception as e:
                 print(f'subdiag {name} sync() error: ' + str(e))
+                if shared: shared.rollback()
                 snapshot.add_view(StateView(name, error=True))
         for name, result in evaluation_result.items():
             pass
+        if shared and incremental:
+            # never chain all previous snapshots through their shared caches
+            shared.previous = None
+            snapshot.shared = shared
+        return snapshot
+
+    def sync_parallel(self, jobs: int) -> Snapshot:
+        '''sync diagrams in forked worker processes, which is only safe over an offline dump,
+           since diagrams are independent of each other when the target memory never changes.
+           Workers inherit the parsed model, the opened dump and the type caches from the fork,
+           and each of them sends back the json form of one view, which is merged in the diagram order.
+        '''
+        set_sync_target(self)
+        snapshot = Snapshot()
+        try:
+            with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context('fork')) as executor:
+                futures = [(name, executor.submit(sync_in_worker, name)) for name in self.diagrams]
+                for name, future in futures:
+                    try:
+                        snapshot.add_view(SerializedView(name, future.result()))
+                    except Exception as e:
+                        print(f'subdiag {name} sync() error in worker: ' + str(e))
+                        snapshot.add_view(StateView(name, error=True))
+        finally:
+            set_sync_target(None)
         return snapshot
 
-    def sync_sub(self, name: str, diagram: Diagram):
-        view = StateView(name)
+    def sync_sub(self, name: str, diagram: Diagram, shared: SharedCache | None = None):
+        view = StateView(name, shared=shared)
         for shape in diagram.plot_targets:
             if vl_debug_on(): printd(f'diag eval shape = {shape.format_string_head()}')
             ent = shape.evaluate_on(view.pool)
             if ent.key.startswith('0x0:'):
                 continue
             view.add_plot(ent.key)
+        # later extensions (e.g. vplot --more) read the target again rather than other views
+        view.pool.shared = None
         view.do_postprocess()
         view.intp_viewql(diagram.init_viewql)
         return view
+
+# the diagram set being synced in parallel, which is inherited by forked workers
+# so that only diagram names need to be sent to them
+__sync_target: DiagramSet | None = None
+def set_sync_target(target: DiagramSet | None):
+    global __sync_target
+    __sync_target = target
+
+def sync_in_worker(name: str) -> dict:
+    if __sync_target is None:
+        raise fuck_exc(AssertionError, f'sync_in_worker({name}) without a diagram set to sync')
+    evaluation_counter.reset()
+    view = __sync_target.sync_sub(name, __sync_target.diagrams[name])
+    return view.to_json()
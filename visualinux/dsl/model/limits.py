@@ -0,0 +1,169 @@
+from visualinux import *
+from visualinux.runtime.kvalue import KValue
+from visualinux.dsl.model.symtable import SymTable, Frame
+from visualinux.evaluation import evaluation_counter
+
+from dataclasses import replace
+from itertools import chain, islice
+import time
+
+@dataclass
+class ContainerLimits:
+    '''The evaluation budget of a single container, where 0 means unlimited.
+       - max_members: number of members to materialize
+       - max_bytes:   bytes read from the target while evaluating the container
+       - time_budget: milliseconds spent on evaluating the container
+    '''
+    max_members: int = 0
+    max_bytes:   int = 0
+    time_budget: int = 0
+
+    # the names of container body variables that override the default limits in ViewCL
+    VARNAMES = ('max_members', 'max_bytes', 'time_budget')
+
+    def override(self, **limits: int) -> 'ContainerLimits':
+        return replace(self, **limits) if limits else self
+
+__container_limits = ContainerLimits(CONTAINER_MAX_MEMBERS, CONTAINER_MAX_BYTES, CONTAINER_TIME_BUDGET)
+def get_container_limits() -> ContainerLimits:
+    return __container_limits
+def set_container_limits(limits: ContainerLimits):
+    global __container_limits
+    __container_limits = limits
+
+class ContainerBudget:
+    '''The consumed budget while a container is being evaluated.
+    '''
+    # members are walked and prefetched in batches of at most this size
+    BATCH_SIZE = 256
+
+    def __init__(self, limits: ContainerLimits) -> None:
+        self.limits = limits
+        self.members = 0
+        self.bytes_start = evaluation_counter.bytes
+        self.deadline = time.monotonic() + limits.time_budget / 1000 if limits.time_budget else None
+        self.truncated = False
+        # the items left behind by iterate() on truncation, which can be kept in the cursor to resume the walk
+        self.rest: Iterator[Any] | None = None
+
+    def exhausted(self) -> bool:
+        if self.limits.max_members and self.members >= self.limits.max_members:
+            return True
+        if self.limits.max_bytes and evaluation_counter.bytes - self.bytes_start >= self.limits.max_bytes:
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        return False
+
+    def take(self) -> bool:
+        '''count a member to be evaluated, or set truncated and return False if the budget is exhausted,
+           for walks that cannot be driven by iterate(), e.g. those adding members in another order than evaluating them.
+        '''
+        if self.exhausted():
+            self.truncated = True
+            return False
+        self.members += 1
+        return True
+
+    def iterate(self, items: Iterable[Any], prefetch: Callable[[list[Any]], None] | None = None) -> Generator[Any, None, None]:
+        '''yield items until the budget is exhausted, where truncated is set only if an item is left behind,
+           and rest is then the iterator of the items left behind (including those already pulled in the batch).
+           Items are pulled lazily in batches (bounded by the remaining member count),
+           so that a runaway walk is never materialized as a whole, and each batch can be prefetched at once.
+        '''
+        iterator = iter(items)
+        while True:
+            size = self.BATCH_SIZE
+            if self.limits.max_members:
+                size = max(1, min(size, self.limits.max_members - self.members))
+            batch = list(islice(iterator, size))
+            if not batch:
+                return
+            if prefetch:
+                prefetch(batch)
+            for i, item in enumerate(batch):
+                if self.exhausted():
+                    self.truncated = True
+                    self.rest = chain(batch[i :], iterator)
+                    return
+                yield item
+                self.members += 1
+
+@dataclass
+class ContainerCursor:
+    '''Where a truncated container stops, so that it can be continued without re-syncing the whole diagram.
+       - addr:   address of the last evaluated node (or the container root if none)
+       - index:  number of evaluated members
+       - frames: frames of the container scope and its ancestors, to be re-entered on continuation
+       - state:  container-specific walking state, e.g. pending links or the paused walker
+    '''
+    addr:   int
+    index:  int
+    frames: list[tuple[SymTable, Frame]]
+    state:  dict[str, Any]
+
+    def to_json(self) -> dict:
+        return {
+            'addr':  hex(self.addr),
+            'index': self.index,
+        }
+
+@dataclass
+class ContainerCycle:
+    '''A cycle found while walking a linked container, e.g. a corrupted or concurrently-mutating list.
+       - addr:   address of the node where the walk comes back
+       - index:  member index of that node, i.e. where the last member links back to
+       - length: number of nodes in the cycle
+    '''
+    addr:   int
+    index:  int
+    length: int
+
+    def to_json(self) -> dict:
+        return {
+            'addr':   hex(self.addr),
+            'index':  self.index,
+            'length': self.length,
+        }
+
+class BrentWalker:
+    '''Walk a singly-linked chain from start with Brent's cycle detection in constant memory.
+       Nodes are yielded as they are reached until stop(node) holds; if the chain comes back to a visited node,
+       the walk stops and cycle is set, where nodes beyond cycle.index + cycle.length are repeated ones.
+    '''
+    def __init__(self, start: KValue, step: Callable[[KValue], KValue], stop: Callable[[KValue], bool]) -> None:
+        self.start = start
+        self.step = step
+        self.stop = stop
+        self.cycle: ContainerCycle | None = None
+
+    def __iter__(self) -> Generator[KValue, None, None]:
+        if self.stop(self.start):
+            return
+        yield self.start
+        tortoise, hare = self.start, self.step(self.start)
+        power = length = 1
+        while not self.stop(hare):
+            if hare.value == tortoise.value:
+                self.cycle = self.locate(length)
+                return
+            yield hare
+            if power == length:
+                tortoise = hare
+                power *= 2
+                length = 0
+            hare = self.step(hare)
+            length += 1
+
+    def locate(self, length: int) -> ContainerCycle:
+        '''find the first node of the cycle, given the cycle length.
+        '''
+        tortoise = hare = self.start
+        for _ in range(length):
+            hare = self.step(hare)
+        index = 0
+        while tortoise.value != hare.value:
+            tortoise, hare = self.step(tortoise), self.step(hare)
+            index += 1
+        if vl_debug_on(): printd(f'BrentWalker cycle at #{index} {tortoise!s}, {length = }')
+        return ContainerCycle(tortoise.value, index, length)
@@ -2,6 +2,7 @@ from visualinux import *
 from visualinux.term import *
 from visualinux.dsl.model.decorators import *
 from visualinux.dsl.model.symtable import SymTable
+from visualinux.dsl.model.limits import *
 from visualinux.runtime import entity
 from visualinux.runtime.kvalue import *
 from visualinux.snapshot import Pool
@@ -107,6 +108,7 @@ class Link(PrimitiveShape):
                 if vl_debug_on(): printd(f'=============[DEBUG] Link expand')
                 target = self.target.expand_to(self.parent_box)
                 if vl_debug_on(): printd(f'=============[DEBUG] Link expand to {target = !s}')
+                return entity.Link(self.link_type, target.evaluate_in_frame(pool, item_value).key, target.type)
             else:
                 target = self.target
                 while isinstance(target, SwitchCase):
@@ -189,8 +191,9 @@ class View:
                 members[label] = member.evaluate_on(pool, item_value)
             elif isinstance(member, Box | Container):
                 if isinstance(member, BoxRecursion):
-                    member = member.expand_to(self.parent_box)
-                ent = member.evaluate_on(pool, None)
+                    ent = member.expand_to(self.parent_box).evaluate_in_frame(pool, None)
+                else:
+                    ent = member.evaluate_on(pool, None)
                 members[label] = entity.BoxMember(ent.key)
             elif isinstance(member, ContainerConv):
                 members[label] = member.evaluate_on(pool, None)
@@ -211,6 +214,14 @@ class Box(Shape):
         self.scope  = SymTable(this=self)
         self.fuck = Box.nextid
         Box.nextid += 1
+        # for recursion expansion: the depth of this box, and expanded boxes of it keyed by their parents
+        self.recursion_depth = 0
+        self.expansions: dict[tuple[int, str, str, str], Box] = {}
+        # the view definitions this box is translated from, which are the same object for all uses of a typedef,
+        # so that boxes of the same template in different diagrams can share their evaluated entities
+        self.template: object | None = None
+        # whether this box is a stub of a recursion beyond MAX_RECURSION_DEPTH
+        self.truncated = False
 
     def __contains__(self, key: str): return self.views.__contains__(key)
     def __getitem__(self, key: str): return self.views.__getitem__(key)
@@ -255,6 +266,9 @@ class Box(Shape):
         if vl_debug_on(): printd(f'Box evaluate_on {root = !s}')
         self.scope.root_value = root
 
+        if self.truncated:
+            return self.evaluate_truncated(pool, root)
+
         if ent_existed := pool.find_box(root.json_data_key):
             if vl_debug_on(): printd(f'Box evaluate_on {root = !s} duplicated;')
             return ent_existed
@@ -265,22 +279,71 @@ class Box(Shape):
             if vl_debug_on(): printd(f'    !KValue_NULL {root = !s}')
             return entity.Box(self, root, self.label, OrderedDict({'default': entity.View('default', None, OrderedDict())}))
 
-        label = self.scope.demix_label(self.label, item_value)
-        ent = entity.Box(self, root, label, OrderedDict())
-        pool.add_box(ent)
-
-        if vl_debug_on(): printd(f'Box evaluate_on {root=!s} {self.views=!s}')
-        if isinstance(root, KValueVBox):
-            if vl_debug_on(): printd(f' --is VBox {self=!s}')
-        for view in self.views.values():
-            ent.views[view.name] = view.evaluate_on(pool, item_value)
+        shared_key = self.shared_key(pool, root, item_value)
+        if shared_key and (ent_shared := pool.find_shared(shared_key)):
+            if vl_debug_on(): printd(f'Box evaluate_on {root = !s} shared;')
+            return ent_shared
+
+        trace = SymTable.begin_trace(self.scope) if shared_key else None
+        record = gdb_adaptor.begin_record(len(pool.births)) if shared_key and pool.shared.recording else None
+        try:
+            label = self.scope.demix_label(self.label, item_value)
+            ent = entity.Box(self, root, label, OrderedDict())
+            pool.add_box(ent)
+
+            if vl_debug_on(): printd(f'Box evaluate_on {root=!s} {self.views=!s}')
+            if isinstance(root, KValueVBox):
+                if vl_debug_on(): printd(f' --is VBox {self=!s}')
+            for view in self.views.values():
+                ent.views[view.name] = view.evaluate_on(pool, item_value)
+        finally:
+            if record:
+                gdb_adaptor.end_record(record, digest=bool(trace and not trace.escaped))
+            if trace:
+                SymTable.end_trace(trace)
+
+        if shared_key and trace and not trace.escaped:
+            pool.add_shared(shared_key, ent, record if record and record.sealed else None)
 
         if vl_debug_on(): printd(f'Box evaluate_on {root = !s} OK return {ent.key = }')
         return ent
 
+    def evaluate_truncated(self, pool: Pool, root: KValue) -> entity.Box:
+        '''a stub without any view member, which is keyed apart from the box of the same object,
+           so that the pool never takes it for the fully evaluated one (and vice versa).
+        '''
+        ent = entity.Box(self, root, self.label, OrderedDict({'default': entity.View('default', None, OrderedDict())}), truncated=True)
+        if root.value == KValue_NULL.value:
+            return ent
+        if ent_existed := pool.find_box(ent.key):
+            return ent_existed
+        pool.add_box(ent)
+        return ent
+
+    def shared_key(self, pool: Pool, root: KValue, item_value: KValue | None) -> tuple | None:
+        '''the key of this box in the snapshot-scoped shared cache, or None if it cannot be shared,
+           i.e. it is virtual, or it may read the container item besides its root.
+        '''
+        if pool.shared is None or self.template is None:
+            return None
+        if item_value is not None or isinstance(root, KValueVBox):
+            return None
+        return (id(self.template), str(self.type), self.label, self.recursion_depth, root.json_data_key)
+
+    def evaluate_in_frame(self, pool: Pool, item_value: KValue | None = None) -> entity.Box:
+        '''evaluate a shared box (e.g. an expanded recursion) in a new frame,
+           so that re-entering it does not clobber the root value of outer evaluations.
+        '''
+        self.scope.push_frame()
+        try:
+            return self.evaluate_on(pool, item_value)
+        finally:
+            self.scope.pop_frame()
+
     def clone_to(self, parent: 'NotPrimitive') -> 'Box':
         if vl_debug_on(): printd(f'[DEBUG] Box {self.format_string_head()} clone_to parent={parent.format_string_head() if parent else None}')
         new_box = Box(self.name, self.label, self.root, self.type, OrderedDict(), parent)
+        new_box.template = self.template
         new_box.scope = self.scope.clone_to(new_box)
         for name, view in self.views.items():
             new_box[name] = view.clone_to(new_box)
@@ -306,6 +369,8 @@ class BoxRecursion(Box):
         self.root  = root
         self.type  = type if type else self.origin_shape.type
         self.scope = SymTable(this=None)
+        self.recursion_depth = 0
+        self.expansions = {}
 
     @property
     def name(self):
@@ -319,23 +384,42 @@ class BoxRecursion(Box):
         return '\n'.join(lines)
 
     def expand_to(self, parent_shape: 'NotPrimitive') -> Box:
+        '''expand the recursion under the parent shape.
+           The expanded box is memoized per (origin shape, parent shape), so the expansion only happens once
+           per recursion depth rather than once per evaluated object, and later evaluations reuse it in new frames.
+           Beyond MAX_RECURSION_DEPTH the expansion is a truncated stub box, see Box.evaluate_truncated().
+        '''
         if vl_debug_on(): printd(f'{self.format_string_head()} expand_to {parent_shape.format_string_head()}')
         if vl_debug_on(): printd(f'{self.origin_shape.format_string_head() = !s}')
 
-        new_box = Box(self.name, self.label, self.root, self.type, OrderedDict(), parent_shape)
-        if vl_debug_on(): printd(f'    clone scope of {self.origin_shape.format_string_head()} to {new_box.format_string_head()}')
-        new_box.scope = self.origin_shape.scope.clone_to(new_box)
-
-        for name, view in self.origin_shape.views.items():
-            if vl_debug_on(): printd(f'    clone view {name}')
-            new_box[name] = view.clone_to(new_box)
+        expansions = self.origin_shape.expansions
+        key = (id(parent_shape), self.label, str(self.root), str(self.type))
+        if (cached := expansions.get(key)) is not None and cached.parent is parent_shape:
+            return cached
 
-        # if VL_DEBUG_ON: printd(f'-- after expand,')
-        # if VL_DEBUG_ON: printd(f'   {new_box = !s},')
-        # if VL_DEBUG_ON: printd(f'   {new_box.parent = !s},')
+        new_box = Box(self.name, self.label, self.root, self.type, OrderedDict(), parent_shape)
+        new_box.recursion_depth = self.recursion_depth_of(parent_shape) + 1
+        new_box.template = self.origin_shape.template
+        if new_box.recursion_depth > MAX_RECURSION_DEPTH:
+            if vl_debug_on(): printd(f'    recursion depth exceeded ({MAX_RECURSION_DEPTH}), expand to a stub')
+            new_box['default'] = View('default', None, OrderedDict(), new_box)
+            new_box.truncated = True
+        else:
+            if vl_debug_on(): printd(f'    clone scope of {self.origin_shape.format_string_head()} to {new_box.format_string_head()}')
+            new_box.scope = self.origin_shape.scope.clone_to(new_box)
+            for name, view in self.origin_shape.views.items():
+                if vl_debug_on(): printd(f'    clone view {name}')
+                new_box[name] = view.clone_to(new_box)
 
+        expansions[key] = new_box
         return new_box
 
+    @staticmethod
+    def recursion_depth_of(shape: 'NotPrimitive | ContainerConv | SwitchCase | None') -> int:
+        while shape is not None and not isinstance(shape, Box):
+            shape = shape.parent
+        return shape.recursion_depth if shape is not None else 0
+
     def clone_to(self, parent: 'NotPrimitive') -> 'BoxRecursion':
         return BoxRecursion(self.origin_shape, self.label, self.root, self.type)
 
@@ -367,22 +451,128 @@ class Container(Shape):
     def evaluate_on(self, pool: Pool, iroot: KValue | None = None) -> entity.Container:
         evaluation_counter.objects += 1
 
-    def evaluate_member(self, pool: Pool, member: KValue) -> entity.NotPrimitive:
+    @abstractmethod
+    def evaluate_members(self, pool: Pool, ent_container: entity.Container, budget: ContainerBudget, cursor: ContainerCursor | None) -> None:
+        '''evaluate members of the container within the budget, from the beginning or from the cursor,
+           and call set_cursor() at the end, which keeps the walking state to resume from if truncated.
+        '''
+        pass
 
-        if isinstance(self.member_shape, SwitchCase):
-            member_shape = self.member_shape.evaluate_on(pool, member)
-        elif isinstance(self.member_shape, BoxRecursion):
-            member_shape = self.member_shape.expand_to(self)
-        else:
-            member_shape = self.member_shape.clone_to(self)
+    def evaluate_limits(self) -> ContainerLimits:
+        '''the default limits overridden by the reserved variables in the container body, e.g. max_members = ${1000}.
+        '''
+        limits: dict[str, int] = {}
+        for name in ContainerLimits.VARNAMES:
+            if (term := self.scope.data.get(name)) is not None:
+                if not isinstance(term, Term):
+                    raise fuck_exc(AssertionError, f'{self.name} container limit {name} must be a term but {term = !s}')
+                limits[name] = self.scope.evaluate_term(term).value
+        return get_container_limits().override(**limits)
+
+    def start_budget(self) -> ContainerBudget:
+        return ContainerBudget(self.evaluate_limits())
+
+    def set_cursor(self, ent_container: entity.Container, budget: ContainerBudget, addr: int, **state: Any) -> None:
+        if not budget.truncated:
+            ent_container.cursor = None
+            return
+        ent_container.cursor = ContainerCursor(addr, len(ent_container.members), self.scope.capture_frames(), state)
+        print(f'[WARNING] {self.name} {ent_container.key} truncated at {len(ent_container.members)} members ({budget.limits!s})')
+
+    def set_cycle(self, ent_container: entity.Container, cycle: ContainerCycle | None, base: int) -> None:
+        '''record the cycle found by a walk starting from the member #base.
+        '''
+        if cycle is None:
+            return
+        ent_container.cycle = replace(cycle, index=base + cycle.index)
+        print(f'[WARNING] {self.name} {ent_container.key} cycle detected: member #{len(ent_container.members) - 1} links back to #{base + cycle.index} ({cycle.addr:#x})')
+
+    def evaluate_more(self, pool: Pool, ent_container: entity.Container) -> int:
+        '''continue a truncated container from its cursor with a new budget, and return the number of new members.
+           The frames captured at truncation are re-entered, so that the member shapes see the same scope as before.
+        '''
+        cursor = ent_container.cursor
+        if cursor is None:
+            return 0
+        count = len(ent_container.members)
+        for scope, frame in cursor.frames:
+            scope.enter_frame(frame)
+        try:
+            self.evaluate_members(pool, ent_container, self.start_budget(), cursor)
+        finally:
+            for scope, _ in cursor.frames:
+                scope.pop_frame()
+        return len(ent_container.members) - count
+
+    def member_layout(self) -> tuple[GDBType, int] | None:
+        '''the object type of members and the offset of the node inside it,
+           or None if it cannot be statically determined (e.g. switch-case or typo with variables).
+        '''
+        member_shape = self.member_shape
+        if not isinstance(member_shape, Box) or not member_shape.type or member_shape.type.is_cexpr():
+            return None
+        if '@' in str(member_shape.type):
+            return None
+        gtype = GDBType.lookup_safe(member_shape.type.head)
+        if gtype is None or not gtype.is_pointer():
+            return None
+        offset = KValue.offsetof(member_shape.type) if member_shape.type.field_seq else 0
+        return gtype, offset
+
+    def prefetch_members(self, members: list[KValue]) -> None:
+        '''fetch the nodes and objects of a batch of members in one go before they are evaluated one by one.
+        '''
+        gdb_adaptor.preload_many(self.member_objects(members))
+
+    def member_objects(self, members: list[KValue]) -> list[tuple[int, GDBType]]:
+        layout = self.member_layout()
+        objects: list[tuple[int, GDBType]] = []
+        for member in members:
+            if not member.gtype.is_pointer() or member.value == KValue_NULL.value or member.is_final:
+                continue
+            objects.append((member.value, member.gtype))
+            if layout:
+                gtype, offset = layout
+                objects.append((member.value - offset, gtype))
+        return objects
 
-        if not isinstance(member_shape, Box | Container):
-            raise fuck_exc(AssertionError, f'{self.name} member_shape must be Box or Container but {member_shape = !s}')
+    def evaluate_member(self, pool: Pool, member: KValue) -> entity.NotPrimitive:
+
+        member_shape = self.resolve_member_shape(pool, member)
 
         if isinstance(member_shape, Box) and not member_shape.type:
             raise fuck_exc(AssertionError, f'{self.name} {member_shape.type = } should not be None')
 
-        return member_shape.evaluate_on(pool, member)
+        return self.evaluate_member_shape(pool, member_shape, member)
+
+    def resolve_member_shape(self, pool: Pool, member: KValue) -> 'Box | Container':
+        '''get the shape template to evaluate the member on.
+           The member shape is shared by all members rather than cloned per member,
+           and only switch-case and recursion need to be resolved.
+        '''
+        member_shape = self.member_shape
+        while isinstance(member_shape, SwitchCase):
+            member_shape = member_shape.evaluate_on(pool, member)
+
+        if isinstance(member_shape, BoxRecursion):
+            member_shape = member_shape.expand_to(self)
+
+        if not isinstance(member_shape, Box | Container):
+            raise fuck_exc(AssertionError, f'{self.name} member_shape must be Box or Container but {member_shape = !s}')
+        return member_shape
+
+    def evaluate_member_shape(self, pool: Pool, member_shape: 'Box | Container', member: KValue, **locals: Term) -> entity.NotPrimitive:
+        '''evaluate the shape template in a new frame, which holds the root value and locals of this member only.
+        '''
+        for name in locals:
+            if name in member_shape.scope.data:
+                print(str(member_shape.scope))
+                raise fuck_exc(AssertionError, f'{self.name} temp_patch variable "{name}" conflicted')
+        member_shape.scope.push_frame(**locals)
+        try:
+            return member_shape.evaluate_on(pool, member)
+        finally:
+            member_shape.scope.pop_frame()
 
 class ContainerConv:
 
@@ -549,7 +739,7 @@ class SwitchCase:
         if isinstance(matched_shape, BoxRecursion):
             matched_shape = matched_shape.expand_to(self.parent)
             if vl_debug_on(): printd(f'{matched_shape = }')
-        else:
+        elif matched_shape.parent is not self.parent:
             matched_shape = matched_shape.clone_to(self.parent)
         return matched_shape
 
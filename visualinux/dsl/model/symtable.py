@@ -3,6 +3,8 @@ from visualinux.term import *
 from visualinux.runtime.kvalue import *
 from visualinux.runtime.utils import *
 
+from types import CodeType
+
 if TYPE_CHECKING:
     from visualinux.dsl.model.shape import Shape, Box, Container, SwitchCase, ContainerConv, NotPrimitive
 
@@ -15,23 +17,120 @@ class UndefinedSymbolError(Exception):
 
 REGEX_PATTERN_DEMIX = r'(@[\w_]+(?:\.[\w_]+)*)'
 
+class Frame:
+    '''The per-instance evaluation state of a shape template,
+       i.e. its root value and local variables bound by the container (e.g. index),
+       so that one shape can be evaluated over many container members without cloning.
+    '''
+    __slots__ = ('root_value', 'locals')
+
+    def __init__(self, **locals: Term) -> None:
+        self.root_value: KValue | None = None
+        self.locals = locals
+
+class ScopeTrace:
+    '''Whether the evaluation of a box has read any symbol from outside of its own subtree,
+       e.g. a variable of its parent box or a local bound by the container it belongs to,
+       in which case the evaluated box depends on its context and cannot be shared with other views.
+       Global variables do not count since they are the same for all views.
+    '''
+    __slots__ = ('scope', 'escaped')
+
+    def __init__(self, scope: 'SymTable') -> None:
+        self.scope = scope
+        self.escaped = False
+
+class CExprPlan:
+    '''The pre-analyzed form of a cexpr head, so that evaluating the same cexpr on each container member
+       only binds the values of its @var references instead of parsing the source again.
+       - refs:     @var references in order of appearance, e.g. ['@node.next', '@prev']
+       - segments: literal source pieces around refs, i.e. len(segments) == len(refs) + 1
+       - code:     compiled code object if the cexpr is a call to a python helper (e.g. from runtime/linux)
+    '''
+    def __init__(self, head: str) -> None:
+        self.head = head
+        pieces = re.split(REGEX_PATTERN_DEMIX, head)
+        self.segments: list[str] = pieces[0 :: 2]
+        self.refs: list[str] = pieces[1 :: 2]
+        self.ref_fields: list[list[str]] = [ref.split('.') for ref in self.refs]
+        self.code: CodeType | None = None
+        if matched := re.match(r'([\w_]+)\(.*\)', head):
+            if callable(globals().get(matched.group(1))):
+                try:
+                    source = re.sub(REGEX_PATTERN_DEMIX, lambda match: f'data[\'{match.group()}\']', head)
+                    self.code = compile(source, f'<cexpr {head}>', 'eval')
+                except SyntaxError:
+                    self.code = None
+
+    @property
+    def is_py_call(self) -> bool:
+        return self.code is not None
+
+    def demix(self, values: list[KValue]) -> str:
+        pieces = [self.segments[0]]
+        for value, segment in zip(values, self.segments[1 :]):
+            pieces.append(str(value) if value.gtype.is_pointer() else str(value.value))
+            pieces.append(segment)
+        return ''.join(pieces)
+
+    __plan_cache: 'dict[str, CExprPlan]' = {}
+
+    @classmethod
+    def compile(cls, head: str) -> 'CExprPlan':
+        if (plan := cls.__plan_cache.get(head)) is None:
+            plan = cls.__plan_cache[head] = CExprPlan(head)
+            if vl_debug_on(): printd(f'CExprPlan.compile {head!s} => {plan.refs = !s}, {plan.is_py_call = }')
+        return plan
+
 class SymTable:
 
     def __init__(self, this: 'NotPrimitive | None' = None, **init_vardefs) -> None:
         self.this = this
         self.data: dict[str, 'Term | NotPrimitive | ContainerConv'] = {}
+        self.frames: list[Frame] = [Frame()]
         if self.this:
             self['this'] = self.this
         for key, value in init_vardefs.items():
             self[key] = value
-        self.root_value: KValue | None = None
 
     @property
     def parent(self) -> 'SymTable | None':
         return self.this.parent.scope if self.this and self.this.parent else None
 
-    def __contains__(self, key: str): return self.data.__contains__(key)
-    def __getitem__(self, key: str): return self.data.__getitem__(key)
+    @property
+    def root_value(self) -> KValue | None:
+        return self.frames[-1].root_value
+    @root_value.setter
+    def root_value(self, value: KValue | None) -> None:
+        self.frames[-1].root_value = value
+
+    def push_frame(self, **locals: Term) -> None:
+        self.frames.append(Frame(**locals))
+
+    def pop_frame(self) -> None:
+        if len(self.frames) == 1:
+            raise fuck_exc(AssertionError, 'try to pop the base frame of symtable')
+        self.frames.pop()
+
+    def enter_frame(self, frame: Frame) -> None:
+        self.frames.append(frame)
+
+    def capture_frames(self) -> list[tuple['SymTable', Frame]]:
+        '''the current frames of this scope and all its ancestors,
+           which can be re-entered later to continue an evaluation (e.g. of a truncated container).
+        '''
+        frames: list[tuple[SymTable, Frame]] = []
+        scope = self
+        while scope:
+            frames.append((scope, scope.frames[-1]))
+            scope = scope.parent
+        return frames
+
+    def __contains__(self, key: str): return key in self.frames[-1].locals or key in self.data
+    def __getitem__(self, key: str):
+        if key in (locals := self.frames[-1].locals):
+            return locals[key]
+        return self.data.__getitem__(key)
     def __setitem__(self, key: str, value: 'Term | NotPrimitive | ContainerConv'): self.data.__setitem__(key, value)
     def items(self): return self.data.items()
 
@@ -68,8 +167,41 @@ class SymTable:
             raise fuck_exc(UndefinedSymbolError, name)
 
         if vl_debug_on(): printd(f'>>>>>> found {scope[name].format_string_head()} in scope of {scope.this.format_string_head() if scope.this else 233}')
+        if SymTable.__traces:
+            self.__trace_lookup(scope, name)
         return scope
 
+    __traces: list[ScopeTrace] = []
+
+    @classmethod
+    def begin_trace(cls, scope: 'SymTable') -> ScopeTrace:
+        trace = ScopeTrace(scope)
+        cls.__traces.append(trace)
+        return trace
+
+    @classmethod
+    def end_trace(cls, trace: ScopeTrace) -> None:
+        if not cls.__traces or cls.__traces[-1] is not trace:
+            raise fuck_exc(AssertionError, 'scope traces are not ended in order')
+        cls.__traces.pop()
+
+    def __trace_lookup(self, found: 'SymTable', name: str) -> None:
+        '''mark the traced scopes that the lookup has walked through as escaped.
+           A local of the found scope is bound per container member, so the found scope itself escapes as well.
+        '''
+        walked: list[SymTable] = []
+        scope = self
+        while scope is not found:
+            walked.append(scope)
+            scope = scope.parent
+        if name in found.frames[-1].locals:
+            walked.append(found)
+        elif found.parent is None:
+            return
+        for trace in SymTable.__traces:
+            if not trace.escaped and any(trace.scope is scope for scope in walked):
+                trace.escaped = True
+
     def demix_typo(self, term: Term, item_value: KValue | None = None) -> Term:
         if not term.is_type():
             raise AssertionError(f'try demix_typo on {term = !r}')
@@ -114,12 +246,14 @@ class SymTable:
         if vl_debug_on(): printd(f'demix_label => {label=!s}')
         return label
 
-    __cexpr_eval_cache: dict[tuple[Term, Term | None], 'KValue'] = {}
+    # (demixed cexpr, cast) => (value, reads to evaluate it)
+    __cexpr_eval_cache: dict[tuple[Term, Term | None], tuple['KValue', ReadRecord | None]] = {}
     @classmethod
     def reset(cls):
+        cls.__traces.clear()
         cls.__cexpr_eval_cache.clear()
-        cls.__cexpr_eval_cache[(Term.CExpr('true'), None)]  = KValue(GDBType.basic('bool'), 1)
-        cls.__cexpr_eval_cache[(Term.CExpr('false'), None)] = KValue(GDBType.basic('bool'), 0)
+        cls.__cexpr_eval_cache[(Term.CExpr('true'), None)]  = (KValue(GDBType.basic('bool'), 1), None)
+        cls.__cexpr_eval_cache[(Term.CExpr('false'), None)] = (KValue(GDBType.basic('bool'), 0), None)
 
     def evaluate_term(self, term: Term, cast: Term | None = None, item_value: KValue | None = None) -> KValue:
 
@@ -134,34 +268,20 @@ class SymTable:
                 case TermType.Type:
                     raise fuck_exc(AssertionError, f'try to evaluate as-type {term = }')
                 case TermType.CExpr:
-                    matches: list[str] = re.findall(REGEX_PATTERN_DEMIX, term.head)
-                    local = {
-                        'data': {
-                            match: self.__demix_term(match.split('.'), item_value)
-                            for match in matches
-                        }
-                    }
-                    demixed_head = term.head
-                    for demkey, demval in local['data'].items():
-                        demixed_head = demixed_head.replace(demkey, str(demval) if demval.gtype.is_pointer() else str(demval.value))
-                    demixed = Term.CExpr(demixed_head).extend(term.field_seq)
-                    if (demixed, cast) in self.__cexpr_eval_cache:
-                        return self.__cexpr_eval_cache[(demixed, cast)]
+                    plan = CExprPlan.compile(term.head)
+                    values = [self.__demix_term(fields, item_value) for fields in plan.ref_fields]
+                    demixed = Term.CExpr(plan.demix(values)).extend(term.field_seq)
+                    if (cached := self.__cexpr_eval_cache.get((demixed, cast))) is not None:
+                        if cached[1] is not None:
+                            gdb_adaptor.replay_record(cached[1])
+                        return cached[0]
+                    # the reads are recorded with the cached value, to be replayed for the boxes hitting the cache
+                    record = gdb_adaptor.begin_record()
                     try:
-                        assert re.match(r'[\w_]+\(.*\)', term.head)
-                        if vl_debug_on(): printd(f'<demix_py_eval> {term=!s}: {matches=!s}')
-                        head_replaced = re.sub(REGEX_PATTERN_DEMIX, 
-                            lambda match: f'data[\'{match.group()}\']', term.head)
-                        if vl_debug_on(): printd(f'<demix_py_eval> {term=!s}: {head_replaced=!s}, {local=!s}')
-                        py_evaled: KValue = eval(head_replaced, globals(), local)
-                        if vl_debug_on(): printd(f'<demix_py_eval> {term=!s} => {py_evaled = !s}')
-                        if not isinstance(py_evaled, KValue):
-                            raise fuck_exc(AssertionError, f'py_eval retval is not a KValue: {py_evaled!s}')
-                        evaled = py_evaled
-                    except Exception as e:
-                        if vl_debug_on(): printd(f'<demix_py_eval> {term=!s} failed: ' + str(e))
-                        evaled = KValue.eval(demixed, cast)
-                    self.__cexpr_eval_cache[(demixed, cast)] = evaled
+                        evaled = self.__evaluate_cexpr(term, plan, values, demixed, cast)
+                    finally:
+                        gdb_adaptor.end_record(record)
+                    self.__cexpr_eval_cache[(demixed, cast)] = (evaled, record)
                     return evaled
                 case TermType.ItemVar:
                     if not item_value:
@@ -216,6 +336,22 @@ class SymTable:
         except Exception as e:
             raise fuck_exc(UndefinedSymbolError, f'failed scope.eval {term!s} ({item_value = !s}) in {self.this.format_string_head() if self.this else "??"}: {e!s}')
 
+    def __evaluate_cexpr(self, term: Term, plan: CExprPlan, values: list[KValue], demixed: Term, cast: Term | None) -> KValue:
+        if plan.code is not None:
+            try:
+                local = {'data': dict(zip(plan.refs, values))}
+                if vl_debug_on(): printd(f'<demix_py_eval> {term=!s}: {local=!s}')
+                py_evaled: KValue = eval(plan.code, globals(), local)
+                if vl_debug_on(): printd(f'<demix_py_eval> {term=!s} => {py_evaled = !s}')
+                if not isinstance(py_evaled, KValue):
+                    raise fuck_exc(AssertionError, f'py_eval retval is not a KValue: {py_evaled!s}')
+                # python helpers may read the target memory through gdb directly
+                gdb_adaptor.mark_volatile()
+                return py_evaled
+            except Exception as e:
+                if vl_debug_on(): printd(f'<demix_py_eval> {term=!s} failed: ' + str(e))
+        return KValue.eval(demixed, cast)
+
     def clone_to(self, this: 'NotPrimitive | None' = None) -> 'SymTable':
         new_scope = SymTable(this)
         for key, value in self.data.items():
@@ -93,6 +93,7 @@ class Translator:
             return rbox
 
         box = Box(name, label, root, shapedef.term, OrderedDict(), parent=parent_shape)
+        box.template = shapedef.body
         parent_shape.scope[varname] = box
 
         if shapedef.where:
@@ -9,12 +9,22 @@ class EvaluationCounter:
         self.objects = 0
         self.fields = 0
         self.bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_bytes = 0
+        self.shared_boxes = 0
+        self.carried_boxes = 0
 
     def clone(self) -> 'EvaluationCounter':
         cloned = EvaluationCounter()
         cloned.objects = self.objects
         cloned.fields = self.fields
         cloned.bytes = self.bytes
+        cloned.cache_hits = self.cache_hits
+        cloned.cache_misses = self.cache_misses
+        cloned.cache_bytes = self.cache_bytes
+        cloned.shared_boxes = self.shared_boxes
+        cloned.carried_boxes = self.carried_boxes
         return cloned
 
 evaluation_counter = EvaluationCounter()
@@ -24,3 +34,8 @@ def evaluation_show(name: str):
     print(f'{name} count_objects {evaluation_counter.objects}')
     print(f'{name} count_fields {evaluation_counter.fields}')
     print(f'{name} count_bytes {evaluation_counter.bytes}')
+    print(f'{name} count_cache_hits {evaluation_counter.cache_hits}')
+    print(f'{name} count_cache_misses {evaluation_counter.cache_misses}')
+    print(f'{name} count_cache_bytes {evaluation_counter.cache_bytes}')
+    print(f'{name} count_shared_boxes {evaluation_counter.shared_boxes}')
+    print(f'{name} count_carried_boxes {evaluation_counter.carried_boxes}')
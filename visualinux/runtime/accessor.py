@@ -0,0 +1,46 @@
+from visualinux import *
+from visualinux.runtime.gdb.type import GDBType
+
+@dataclass
+class FieldOp:
+    '''one step of a field path: move to base + offset, and then read the pointer stored there if deref.
+       gtype is the type of the resulting kvalue.
+    '''
+    offset: int
+    deref:  bool
+    gtype:  GDBType
+    size:   int
+
+class FieldPath:
+    '''The compiled accessor plan of a (GDBType, field_seq) pair,
+       so that evaluating the same field sequence on thousands of objects
+       only costs integer arithmetic and pointer reads.
+    '''
+    def __init__(self, gtype: GDBType, field_defs: list[str]) -> None:
+        self.field_defs = field_defs
+        self.ops: list[FieldOp] = []
+        for field_def in field_defs:
+            if gtype.is_scalar() or not gtype.is_pointer() or gtype.target().is_pointer():
+                raise fuck_exc(AssertionError, f'try get_field({field_def}) on a bad type {gtype!s} (in {field_defs})')
+            field_gtype, field_offset = gtype.get_field_info(field_def)
+            if field_gtype.target().is_pointer():
+                gtype = field_gtype.target()
+                self.ops.append(FieldOp(field_offset, True, gtype, field_gtype.target_size()))
+            else:
+                gtype = field_gtype
+                self.ops.append(FieldOp(field_offset, False, gtype, 0))
+
+    def __str__(self) -> str:
+        return ' -> '.join(f'{"*" if op.deref else ""}(+{op.offset:#x}: {op.gtype!s})' for op in self.ops)
+
+    # keyed by the interned type id rather than the printed name, which is shared by distinct types (e.g. "struct {...} *")
+    __plan_cache: 'dict[tuple[int, tuple[str, ...]], FieldPath]' = {}
+
+    @classmethod
+    def compile(cls, gtype: GDBType, field_defs: list[str]) -> 'FieldPath':
+        key = (gtype.id, tuple(field_defs))
+        if (plan := cls.__plan_cache.get(key)) is None:
+            plan = FieldPath(gtype, field_defs)
+            if vl_debug_on(): printd(f'FieldPath.compile {gtype!s} {field_defs} => {plan!s}')
+            cls.__plan_cache[key] = plan
+        return plan
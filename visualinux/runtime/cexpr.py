@@ -0,0 +1,522 @@
+from visualinux import *
+from visualinux.runtime.gdb import gdb
+from visualinux.runtime.gdb.adaptor import gdb_adaptor
+from visualinux.runtime.gdb.backend import current_backend
+from visualinux.runtime.gdb.type import GDBType
+
+import re
+
+# A native evaluator of the simple C expressions used in ViewCL (e.g. ${...} after demixing),
+# so that most of them are not sent to gdb.parse_and_eval() one by one.
+# Supported: integer literals, global/static symbols, enumerators, casts to scalar or pointer types,
+# arithmetic/bitwise/logical/relational operators, ?:, sizeof, &, *, ->, ., [], per_cpu() and per_cpu_ptr().
+# Everything else (e.g. string literals, macros, function calls) raises CExprUnsupported to fall back to gdb.
+
+class CExprUnsupported(Exception):
+    pass
+
+TOKEN_REGEX = re.compile(r'\s*(?:(0[xX][0-9a-fA-F]+|\d+)([uUlL]*)|([A-Za-z_]\w*)|(->|<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%&|^~!<>?:()\[\].,]))')
+
+TYPE_KEYWORDS = {
+    'struct', 'union', 'enum', 'const', 'volatile', 'signed', 'unsigned',
+    'void', 'char', 'short', 'int', 'long', 'bool', '_Bool', 'float', 'double',
+}
+
+BINARY_PRECEDENCE = {
+    '||': 1, '&&': 2, '|': 3, '^': 4, '&': 5,
+    '==': 6, '!=': 6, '<': 7, '>': 7, '<=': 7, '>=': 7,
+    '<<': 8, '>>': 8, '+': 9, '-': 9, '*': 10, '/': 10, '%': 10,
+}
+TERNARY_PRECEDENCE = 0
+
+class Token:
+    __slots__ = ('kind', 'text', 'value')
+
+    def __init__(self, kind: str, text: str, value: int = 0) -> None:
+        self.kind  = kind # 'num', 'id' or 'op'
+        self.text  = text
+        self.value = value
+
+def tokenize(expr: str) -> list[Token]:
+    tokens: list[Token] = []
+    pos, end = 0, len(expr.rstrip())
+    while pos < end:
+        matched = TOKEN_REGEX.match(expr, pos)
+        if matched is None or matched.end() == pos:
+            raise CExprUnsupported(f'unexpected character at {expr[pos :]!r}')
+        if (num := matched.group(1)) is not None:
+            tokens.append(Token('num', num + matched.group(2), int(num, 0) if not re.fullmatch(r'0\d+', num) else int(num, 8)))
+        elif (name := matched.group(3)) is not None:
+            tokens.append(Token('id', name))
+        else:
+            tokens.append(Token('op', matched.group(4)))
+        pos = matched.end()
+    return tokens
+
+# ast nodes are tuples whose first item is the node kind.
+# number literals and type names refer to token indexes, so that the same ast is reused
+# for all expressions that only differ in numbers (e.g. demixed addresses).
+
+class Parser:
+    '''Pratt parser of C expressions.
+    '''
+    def __init__(self, tokens: list[Token]) -> None:
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self, offset: int = 0) -> Token | None:
+        if self.pos + offset < len(self.tokens):
+            return self.tokens[self.pos + offset]
+        return None
+
+    def next(self) -> Token:
+        if (token := self.peek()) is None:
+            raise CExprUnsupported('unexpected end of expression')
+        self.pos += 1
+        return token
+
+    def expect(self, text: str) -> None:
+        if (token := self.next()).text != text:
+            raise CExprUnsupported(f'expect {text!r} but got {token.text!r}')
+
+    def is_op(self, text: str, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        return token is not None and token.kind == 'op' and token.text == text
+
+    def parse(self) -> tuple:
+        node = self.parse_expr(TERNARY_PRECEDENCE)
+        if self.peek() is not None:
+            raise CExprUnsupported(f'unexpected token {self.peek().text!r}') # type: ignore
+        return node
+
+    def parse_expr(self, min_prec: int) -> tuple:
+        lhs = self.parse_unary()
+        while (token := self.peek()) is not None and token.kind == 'op':
+            if token.text == '?' and min_prec <= TERNARY_PRECEDENCE:
+                self.next()
+                then = self.parse_expr(TERNARY_PRECEDENCE)
+                self.expect(':')
+                other = self.parse_expr(TERNARY_PRECEDENCE)
+                lhs = ('ternary', lhs, then, other)
+                continue
+            prec = BINARY_PRECEDENCE.get(token.text)
+            if prec is None or prec <= min_prec:
+                break
+            self.next()
+            lhs = ('binary', token.text, lhs, self.parse_expr(prec))
+        return lhs
+
+    def parse_unary(self) -> tuple:
+        token = self.next()
+        if token.kind == 'op' and token.text in ('-', '+', '!', '~', '*', '&'):
+            return ('unary', token.text, self.parse_unary())
+        if token.kind == 'id' and token.text == 'sizeof':
+            if self.is_op('(') and self.is_type_start(1):
+                self.next()
+                start, end = self.parse_typename()
+                return ('sizeof_type', start, end)
+            return ('sizeof', self.parse_unary())
+        if token.kind == 'op' and token.text == '(' and self.is_type_start(0):
+            start, end = self.parse_typename()
+            return ('cast', start, end, self.parse_unary())
+        self.pos -= 1
+        return self.parse_postfix(self.parse_primary())
+
+    def parse_primary(self) -> tuple:
+        token = self.next()
+        if token.kind == 'num':
+            return ('num', self.pos - 1)
+        if token.kind == 'id':
+            if self.is_op('('):
+                self.next()
+                args: list[tuple] = []
+                while not self.is_op(')'):
+                    args.append(self.parse_expr(TERNARY_PRECEDENCE))
+                    if not self.is_op(')'):
+                        self.expect(',')
+                self.next()
+                return ('call', token.text, tuple(args))
+            return ('sym', token.text)
+        if token.text == '(':
+            node = self.parse_expr(TERNARY_PRECEDENCE)
+            self.expect(')')
+            return node
+        raise CExprUnsupported(f'unexpected token {token.text!r}')
+
+    def parse_postfix(self, node: tuple) -> tuple:
+        while True:
+            if self.is_op('['):
+                self.next()
+                index = self.parse_expr(TERNARY_PRECEDENCE)
+                self.expect(']')
+                node = ('index', node, index)
+            elif self.is_op('->') or self.is_op('.'):
+                arrow = self.next().text == '->'
+                field = self.next()
+                if field.kind != 'id':
+                    raise CExprUnsupported(f'bad field name {field.text!r}')
+                node = ('member', node, field.text, arrow)
+            else:
+                return node
+
+    def is_type_start(self, offset: int) -> bool:
+        '''whether the token at offset (right after a "(") begins a type name.
+        '''
+        token = self.peek(offset)
+        if token is None or token.kind != 'id':
+            return False
+        if token.text in TYPE_KEYWORDS:
+            return True
+        # a typedef name must be followed by ")" or "*" in the type name of a cast
+        if not (self.is_op(')', offset + 1) or self.is_op('*', offset + 1)):
+            return False
+        return is_typedef_name(token.text)
+
+    def parse_typename(self) -> tuple[int, int]:
+        '''consume tokens of a type name up to the matching ")", and return the token range.
+        '''
+        start, depth = self.pos, 0
+        while True:
+            token = self.next()
+            if token.kind == 'op' and token.text in ('(', '['):
+                depth += 1
+            elif token.kind == 'op' and token.text in (')', ']'):
+                if depth == 0:
+                    return start, self.pos - 1
+                depth -= 1
+
+# symbols and types are resolved only once
+
+class Symbol:
+    __slots__ = ('gtype', 'address', 'value')
+
+    def __init__(self, gtype: GDBType, address: int | None = None, value: int | None = None) -> None:
+        self.gtype   = gtype
+        self.address = address
+        self.value   = value
+
+__symbol_cache: dict[str, Symbol | None] = {}
+
+def lookup_symbol(name: str) -> Symbol | None:
+    if name not in __symbol_cache:
+        __symbol_cache[name] = resolve_symbol(name)
+    return __symbol_cache[name]
+
+def resolve_symbol(name: str) -> Symbol | None:
+    sym = gdb.lookup_global_symbol(name) or gdb.lookup_static_symbol(name)
+    if sym is None:
+        return None
+    if sym.addr_class == gdb.SYMBOL_LOC_CONST:
+        return Symbol(GDBType(sym.type), value=int(sym.value()))
+    if sym.addr_class in (gdb.SYMBOL_LOC_STATIC, gdb.SYMBOL_LOC_BLOCK):
+        gval = sym.value()
+        return Symbol(GDBType(gval.type), address=int(gval.address))
+    return None
+
+__typedef_cache: dict[str, bool] = {}
+
+def is_typedef_name(name: str) -> bool:
+    if name not in __typedef_cache:
+        sym = gdb.lookup_global_symbol(name) or gdb.lookup_static_symbol(name)
+        if sym is not None:
+            __typedef_cache[name] = sym.addr_class == gdb.SYMBOL_LOC_TYPEDEF
+        else:
+            try:
+                current_backend().lookup_type(name)
+                __typedef_cache[name] = True
+            except gdb.error:
+                __typedef_cache[name] = False
+    return __typedef_cache[name]
+
+__typename_cache: dict[str, GDBType] = {}
+
+def lookup_typename(typename: str) -> GDBType:
+    '''resolve the type name in a cast, e.g. "struct task_struct *" or "unsigned long (*)[16]".
+    '''
+    if typename not in __typename_cache:
+        __typename_cache[typename] = GDBType(gdb.parse_and_eval(f'(({typename}) 0)').type)
+    return __typename_cache[typename]
+
+__sizeof_cache: dict[str, int] = {}
+
+def sizeof_typename(typename: str) -> int:
+    if typename not in __sizeof_cache:
+        __sizeof_cache[typename] = int(gdb.parse_and_eval(f'sizeof({typename})'))
+    return __sizeof_cache[typename]
+
+# evaluation
+
+class CValue:
+    '''value of a subexpression: the rvalue of scalars (lazily read if it is an lvalue), and/or the address of lvalues.
+    '''
+    __slots__ = ('gtype', 'value', 'address')
+
+    def __init__(self, gtype: GDBType, value: int | None = None, address: int | None = None) -> None:
+        self.gtype   = gtype
+        self.value   = value
+        self.address = address
+
+def is_signed(gtype: GDBType) -> bool:
+    return gtype.is_signed()
+
+def literal_type(token: Token) -> GDBType:
+    '''the type of an integer literal as in C, i.e. the first type allowed by its suffix and base that can represent it.
+    '''
+    digits = token.text.rstrip('uUlL')
+    suffix = token.text[len(digits) :].lower()
+    if 'u' in suffix:
+        candidates = ['unsigned long'] if 'l' in suffix else ['unsigned int', 'unsigned long']
+    elif 'l' in suffix:
+        candidates = ['long', 'unsigned long']
+    elif digits.startswith('0') and digits != '0':
+        candidates = ['int', 'unsigned int', 'long', 'unsigned long']
+    else:
+        candidates = ['int', 'long', 'unsigned long']
+    for typename in candidates:
+        gtype = GDBType.basic(typename)
+        bits = gtype.sizeof() * 8 - (0 if typename.startswith('unsigned') else 1)
+        if token.value < 1 << bits:
+            return gtype
+    raise CExprUnsupported(f'integer literal {token.text} is too large')
+
+def promote(gtype: GDBType) -> GDBType:
+    '''the integer promotion, e.g. char and unsigned short to int.
+    '''
+    return GDBType.basic('int') if gtype.sizeof() < 4 else gtype
+
+def common_type(ltype: GDBType, rtype: GDBType) -> GDBType:
+    '''the usual arithmetic conversions of C on integer operands, e.g. int and unsigned long to unsigned long.
+    '''
+    ltype, rtype = promote(ltype), promote(rtype)
+    if is_signed(ltype) == is_signed(rtype):
+        return ltype if ltype.sizeof() >= rtype.sizeof() else rtype
+    unsigned, signed = (rtype, ltype) if is_signed(ltype) else (ltype, rtype)
+    return unsigned if unsigned.sizeof() >= signed.sizeof() else signed
+
+def normalize(value: int, gtype: GDBType) -> int:
+    bits = gtype.sizeof() * 8
+    if bits <= 0:
+        return value
+    value &= (1 << bits) - 1
+    if is_signed(gtype) and value >> (bits - 1):
+        value -= 1 << bits
+    return value
+
+class Evaluator:
+
+    def __init__(self, tokens: list[Token]) -> None:
+        self.tokens = tokens
+
+    def typename(self, start: int, end: int) -> str:
+        return ' '.join(token.text for token in self.tokens[start : end])
+
+    def rvalue(self, cval: CValue) -> CValue:
+        '''lvalue-to-rvalue conversion, including array-to-pointer and function-to-pointer decays.
+        '''
+        if cval.value is not None:
+            return cval
+        if cval.address is None:
+            raise CExprUnsupported(f'no value of {cval.gtype!s}')
+        gtype = cval.gtype
+        if gtype.is_array():
+            return CValue(gtype.target().pointer(), cval.address)
+        if gtype.is_function():
+            return CValue(gtype.pointer(), cval.address)
+        if not gtype.is_pointer() and not gtype.is_scalar():
+            raise CExprUnsupported(f'aggregate {gtype!s} used as rvalue')
+        value = gdb_adaptor.read_scalar(cval.address, gtype.sizeof(), signed=is_signed(gtype))
+        return CValue(gtype, value, cval.address)
+
+    def integer(self, node: tuple) -> int:
+        cval = self.rvalue(self.eval(node))
+        assert cval.value is not None
+        return cval.value
+
+    def eval(self, node: tuple) -> CValue:
+        match node[0]:
+            case 'num':
+                token = self.tokens[node[1]]
+                return CValue(literal_type(token), token.value)
+            case 'sym':
+                return self.eval_symbol(node[1])
+            case 'unary':
+                return self.eval_unary(node[1], node[2])
+            case 'binary':
+                return self.eval_binary(node[1], node[2], node[3])
+            case 'ternary':
+                return self.eval(node[2]) if self.integer(node[1]) else self.eval(node[3])
+            case 'cast':
+                gtype = lookup_typename(self.typename(node[1], node[2]))
+                if not gtype.is_pointer() and not gtype.is_scalar():
+                    raise CExprUnsupported(f'cast to non-scalar type {gtype!s}')
+                return CValue(gtype, normalize(self.integer(node[3]), gtype))
+            case 'sizeof_type':
+                return CValue(GDBType.basic('unsigned long'), sizeof_typename(self.typename(node[1], node[2])))
+            case 'sizeof':
+                return CValue(GDBType.basic('unsigned long'), self.eval(node[1]).gtype.sizeof())
+            case 'index':
+                base = self.rvalue(self.eval(node[1]))
+                if not base.gtype.is_pointer():
+                    raise CExprUnsupported(f'subscript on non-pointer {base.gtype!s}')
+                assert base.value is not None
+                target = base.gtype.target()
+                return CValue(target, None, base.value + self.integer(node[2]) * target.sizeof())
+            case 'member':
+                return self.eval_member(node[1], node[2], node[3])
+            case 'call':
+                return self.eval_call(node[1], node[2])
+        raise CExprUnsupported(f'unknown node {node[0]}')
+
+    def eval_symbol(self, name: str) -> CValue:
+        if name == 'NULL':
+            return CValue(GDBType.basic('void').pointer(), 0)
+        if name in ('true', 'false'):
+            return CValue(GDBType.basic('bool'), int(name == 'true'))
+        if (sym := lookup_symbol(name)) is None:
+            raise CExprUnsupported(f'unknown symbol {name}')
+        return CValue(sym.gtype, sym.value, sym.address)
+
+    def eval_unary(self, op: str, node: tuple) -> CValue:
+        if op == '&':
+            cval = self.eval(node)
+            if cval.address is None:
+                raise CExprUnsupported(f'address of rvalue {cval.gtype!s}')
+            return CValue(cval.gtype.pointer(), cval.address)
+        cval = self.rvalue(self.eval(node))
+        assert cval.value is not None
+        if op == '*':
+            if not cval.gtype.is_pointer():
+                raise CExprUnsupported(f'dereference of non-pointer {cval.gtype!s}')
+            return CValue(cval.gtype.target(), None, cval.value)
+        if cval.gtype.is_pointer():
+            if op == '!':
+                return CValue(GDBType.basic('int'), int(cval.value == 0))
+            raise CExprUnsupported(f'unary {op} on pointer')
+        gtype = promote(cval.gtype)
+        match op:
+            case '-': value = -cval.value
+            case '+': value = cval.value
+            case '~': value = ~cval.value
+            case '!': return CValue(GDBType.basic('int'), int(cval.value == 0))
+            case _: raise CExprUnsupported(f'unary {op}')
+        return CValue(gtype, normalize(value, gtype))
+
+    def eval_binary(self, op: str, lnode: tuple, rnode: tuple) -> CValue:
+        if op == '&&':
+            return CValue(GDBType.basic('int'), int(bool(self.integer(lnode)) and bool(self.integer(rnode))))
+        if op == '||':
+            return CValue(GDBType.basic('int'), int(bool(self.integer(lnode)) or bool(self.integer(rnode))))
+        lhs = self.rvalue(self.eval(lnode))
+        rhs = self.rvalue(self.eval(rnode))
+        lval, rval = lhs.value, rhs.value
+        assert lval is not None and rval is not None
+        # pointer arithmetic
+        if lhs.gtype.is_pointer() or rhs.gtype.is_pointer():
+            if op == '+' and lhs.gtype.is_pointer() and not rhs.gtype.is_pointer():
+                return CValue(lhs.gtype, normalize(lval + rval * self.stride(lhs.gtype), lhs.gtype))
+            if op == '+' and rhs.gtype.is_pointer() and not lhs.gtype.is_pointer():
+                return CValue(rhs.gtype, normalize(rval + lval * self.stride(rhs.gtype), rhs.gtype))
+            if op == '-' and lhs.gtype.is_pointer() and not rhs.gtype.is_pointer():
+                return CValue(lhs.gtype, normalize(lval - rval * self.stride(lhs.gtype), lhs.gtype))
+            if op == '-' and lhs.gtype.is_pointer() and rhs.gtype.is_pointer():
+                return CValue(GDBType.basic('long'), (lval - rval) // self.stride(lhs.gtype))
+            if op not in ('==', '!=', '<', '>', '<=', '>='):
+                raise CExprUnsupported(f'binary {op} on pointers')
+        elif op in ('<<', '>>'):
+            # the type of a shift is the promoted left operand
+            gtype = promote(lhs.gtype)
+            lval = normalize(lval, gtype)
+            return CValue(gtype, normalize(lval << rval if op == '<<' else lval >> rval, gtype))
+        else:
+            gtype = common_type(lhs.gtype, rhs.gtype)
+            lval, rval = normalize(lval, gtype), normalize(rval, gtype)
+        match op:
+            case '==': return CValue(GDBType.basic('int'), int(lval == rval))
+            case '!=': return CValue(GDBType.basic('int'), int(lval != rval))
+            case '<':  return CValue(GDBType.basic('int'), int(lval <  rval))
+            case '>':  return CValue(GDBType.basic('int'), int(lval >  rval))
+            case '<=': return CValue(GDBType.basic('int'), int(lval <= rval))
+            case '>=': return CValue(GDBType.basic('int'), int(lval >= rval))
+        match op:
+            case '+':  value = lval + rval
+            case '-':  value = lval - rval
+            case '*':  value = lval * rval
+            case '/':  value = self.div(lval, rval)
+            case '%':  value = lval - rval * self.div(lval, rval)
+            case '&':  value = lval & rval
+            case '|':  value = lval | rval
+            case '^':  value = lval ^ rval
+            case _: raise CExprUnsupported(f'binary {op}')
+        return CValue(gtype, normalize(value, gtype))
+
+    def div(self, lval: int, rval: int) -> int:
+        '''integer division truncated toward zero as in C, which must not go through float for 64-bit values.
+        '''
+        if rval == 0:
+            raise CExprUnsupported('division by zero')
+        quotient = abs(lval) // abs(rval)
+        return quotient if (lval < 0) == (rval < 0) else -quotient
+
+    def stride(self, gtype: GDBType) -> int:
+        target = gtype.target()
+        return 1 if target.is_function() or target.name == 'void' else target.sizeof()
+
+    def eval_member(self, node: tuple, field: str, arrow: bool) -> CValue:
+        base = self.eval(node)
+        if arrow:
+            base = self.rvalue(base)
+            if not base.gtype.is_pointer():
+                raise CExprUnsupported(f'-> on non-pointer {base.gtype!s}')
+            ptr_gtype, address = base.gtype, base.value
+        else:
+            if base.address is None:
+                raise CExprUnsupported(f'. on rvalue {base.gtype!s}')
+            ptr_gtype, address = base.gtype.pointer(), base.address
+        assert address is not None
+        field_gtype, offset = ptr_gtype.get_field_info(field)
+        return CValue(field_gtype.target(), None, address + offset)
+
+    def eval_call(self, name: str, args: tuple) -> CValue:
+        match name, len(args):
+            case 'per_cpu', 2:
+                var = self.eval(args[0])
+                if var.address is None:
+                    raise CExprUnsupported('per_cpu() on rvalue')
+                return CValue(var.gtype, None, (var.address + self.per_cpu_offset(args[1])) % (1 << 64))
+            case 'per_cpu_ptr', 2:
+                ptr = self.rvalue(self.eval(args[0]))
+                assert ptr.value is not None
+                if ptr.value == 0:
+                    return ptr
+                return CValue(ptr.gtype, normalize(ptr.value + self.per_cpu_offset(args[1]), ptr.gtype))
+        raise CExprUnsupported(f'call of {name}()')
+
+    def per_cpu_offset(self, node: tuple) -> int:
+        if (sym := lookup_symbol('__per_cpu_offset')) is None or sym.address is None:
+            raise CExprUnsupported('__per_cpu_offset not found')
+        size = sym.gtype.target().sizeof()
+        return gdb_adaptor.read_scalar(sym.address + self.integer(node) * size, size, signed=False)
+
+__ast_cache: dict[tuple[str, ...], tuple] = {}
+
+def cexpr_evaluate(expr: str) -> tuple[GDBType, int] | None:
+    '''evaluate the C expression natively, or return None if it is not supported.
+       Similar to gdb_adaptor.eval(), the result of an aggregate lvalue is its address.
+    '''
+    try:
+        tokens = tokenize(expr)
+        key = tuple('#' if token.kind == 'num' else token.text for token in tokens)
+        if (ast := __ast_cache.get(key)) is None:
+            ast = __ast_cache[key] = Parser(tokens).parse()
+        evaluator = Evaluator(tokens)
+        cval = evaluator.eval(ast)
+        if cval.gtype.is_pointer() or cval.gtype.is_scalar():
+            cval = evaluator.rvalue(cval)
+            assert cval.value is not None
+            return cval.gtype, cval.value
+        if cval.address is None:
+            raise CExprUnsupported(f'aggregate rvalue {cval.gtype!s}')
+        return cval.gtype.pointer(), cval.address
+    except Exception as e:
+        if vl_debug_on(): printd(f'cexpr_evaluate({expr}) fallback to gdb: {e!s}')
+        return None
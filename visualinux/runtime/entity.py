@@ -6,8 +6,10 @@ from visualinux.runtime.text import *
 
 if TYPE_CHECKING:
     from visualinux.dsl.model import shape
+    from visualinux.dsl.model.limits import ContainerCursor, ContainerCycle
 
 class JSONRepr(metaclass=ABCMeta):
+    __slots__ = ()
 
     def __str__(self) -> str:
         return self.to_json().__str__()
@@ -20,16 +22,20 @@ class JSONRepr(metaclass=ABCMeta):
         pass
 
 class RuntimeShape(JSONRepr):
+    __slots__ = ('model', )
 
     def __init__(self, model: 'shape.Shape | shape.ContainerConv | None') -> None:
         self.model = model
 
 class RuntimePrimitive(RuntimeShape):
+    __slots__ = ()
+
     @property
     def key(self) -> str:
         raise fuck_exc(AssertionError, 'should not get key of entity.Primitive')
 
 class Text(RuntimePrimitive):
+    __slots__ = ('value', 'typo')
 
     def __init__(self, value: KValue, typo: TextFormat) -> None:
         # robust handler of gvalues
@@ -52,6 +58,7 @@ class Text(RuntimePrimitive):
         }
 
 class Flag(Text):
+    __slots__ = ()
 
     def __init__(self, value: KValue, typo: TextFormat) -> None:
         super().__init__(value, typo)
@@ -61,6 +68,7 @@ class Flag(Text):
         return FlagHandler.handle(self.typo.desc.split(':')[1], self.value.value)
 
 class EMOJI(Text):
+    __slots__ = ()
 
     def __init__(self, value: KValue, typo: TextFormat) -> None:
         super().__init__(value, typo)
@@ -70,6 +78,7 @@ class EMOJI(Text):
         return EMOJIHandler.handle(self.typo.desc.split(':')[1], self.value.value)
 
 class Link(RuntimePrimitive):
+    __slots__ = ('link_type', 'target_key', 'target_type')
 
     def __init__(self, link_type: LinkType, target_key: str | None, target_type: Term | None) -> None:
         self.link_type = link_type
@@ -87,6 +96,7 @@ class Link(RuntimePrimitive):
         }
 
 class BoxMember(JSONRepr):
+    __slots__ = ('object_key', )
 
     def __init__(self, object_key: str) -> None:
         if object_key.startswith('0x0:'):
@@ -106,7 +116,7 @@ class BoxMember(JSONRepr):
 
 ViewMember = RuntimePrimitive | BoxMember
 
-@dataclass
+@dataclass(slots=True)
 class View(JSONRepr):
 
     name: str
@@ -119,16 +129,22 @@ class View(JSONRepr):
             'members': OrderedDict((label, member.to_json()) for label, member in self.members.items()),
         }
 
+# the key suffix of truncated boxes, which are keyed apart from the fully evaluated boxes of the same objects
+TRUNCATED_KEY_SUFFIX = '$truncated'
+
 class Box(RuntimeShape):
+    __slots__ = ('root', 'key', 'label', 'views', 'parent', 'truncated')
 
-    def __init__(self, model: 'shape.Box | None', root: KValue, label: str, views: OrderedDict[str, View]) -> None:
+    def __init__(self, model: 'shape.Box | None', root: KValue, label: str, views: OrderedDict[str, View], truncated: bool = False) -> None:
         super().__init__(model)
         self.model: 'shape.Box'
         self.root = root
-        self.key = root.json_data_key
+        self.key = root.json_data_key + TRUNCATED_KEY_SUFFIX if truncated else root.json_data_key
         self.label = label
         self.views = views
         self.parent: str | None = None
+        # whether the members are left unevaluated, e.g. beyond MAX_RECURSION_DEPTH
+        self.truncated = truncated
 
     @property
     def addr(self) -> int:
@@ -163,6 +179,12 @@ class Box(RuntimeShape):
             raise fuck_exc(AssertionError, f'entity member {member = } is not a BoxMember')
         return member.object_key
 
+    def clone(self) -> 'Box':
+        '''a copy for another pool, whose parent is left to be set by the postprocess of that pool.
+        '''
+        views = OrderedDict((name, View(view.name, view.parent, OrderedDict(view.members))) for name, view in self.views.items())
+        return Box(self.model, self.root, self.label, views, self.truncated)
+
     def to_json(self) -> dict:
         return {
             'key':    self.key,
@@ -170,15 +192,20 @@ class Box(RuntimeShape):
             'addr':   hex(self.addr),
             'label':  self.label,
             'absts':  OrderedDict((name, view.to_json()) for name, view in self.views.items()),
-            'parent': self.parent
+            'parent': self.parent,
+            'truncated': self.truncated,
         }
 
-@dataclass
+@dataclass(slots=True)
 class ContainerMember(JSONRepr):
 
     key:   str | None
     links: dict[str, Link]
 
+    def link(self, **links: str | None) -> None:
+        for label, target in links.items():
+            self.links[label] = Link(LinkType.DIRECT, target, None)
+
     def to_json(self) -> dict:
         return {
             'key':   self.key,
@@ -186,6 +213,7 @@ class ContainerMember(JSONRepr):
         }
 
 class Container(RuntimeShape):
+    __slots__ = ('root', 'key', 'label', 'members', 'parent', 'cursor', 'cycle')
 
     def __init__(self, model: 'shape.Container', root: KValue, label: str) -> None:
         '''entity.Container must be constructed in shape.Container.evaluate_on()
@@ -197,6 +225,10 @@ class Container(RuntimeShape):
         self.label = label
         self.members: list[ContainerMember] = []
         self.parent: str | None = None
+        # where the evaluation stops if the container is truncated by its limits
+        self.cursor: 'ContainerCursor | None' = None
+        # where the walk comes back if a cycle is found in a linked container
+        self.cycle: 'ContainerCycle | None' = None
 
     @property
     def addr(self) -> int:
@@ -206,14 +238,16 @@ class Container(RuntimeShape):
     def type(self) -> str:
         return '[' + self.model.name + ']'
 
-    def add_member(self, key: str | None, **links: str | None) -> None:
+    def add_member(self, key: str | None, **links: str | None) -> ContainerMember:
         if key and key.startswith('0x0:'):
             key = None
         for label, target in links.items():
             if isinstance(target, str) and target.startswith('0x0:'):
                 links[label] = None
         xlinks = {label: Link(LinkType.DIRECT, target, None) for label, target in links.items()}
-        self.members.append(ContainerMember(key, xlinks))
+        member = ContainerMember(key, xlinks)
+        self.members.append(member)
+        return member
 
     def add_link_to_member(self, key: str | None, **links: str | None) -> None:
         for label, target in links.items():
@@ -224,6 +258,15 @@ class Container(RuntimeShape):
             if member.key == key:
                 member.links |= xlinks
 
+    def clone(self) -> 'Container':
+        '''a copy for another pool, whose parent is left to be set by the postprocess of that pool.
+           The cursor is not copied since continuing it extends the pool it was evaluated in.
+        '''
+        ent = Container(self.model, self.root, self.label)
+        ent.members = [ContainerMember(member.key, dict(member.links)) for member in self.members]
+        ent.cycle = self.cycle
+        return ent
+
     def to_json(self) -> dict:
         return {
             'key':     self.key,
@@ -231,10 +274,14 @@ class Container(RuntimeShape):
             'addr':    hex(self.addr),
             'label':   self.label,
             'members': [member.to_json() for member in self.members],
-            'parent':  self.parent
+            'parent':  self.parent,
+            'truncated': self.cursor is not None,
+            'cursor':  self.cursor.to_json() if self.cursor else None,
+            'cycle':   self.cycle.to_json() if self.cycle else None,
         }
 
 class ContainerConv(JSONRepr):
+    __slots__ = ('model', 'source', 'key', 'label', 'members', 'parent')
 
     def __init__(self, model: 'shape.ContainerConv', source: Box | Container, label: str) -> None:
         self.model = model
@@ -261,6 +308,13 @@ class ContainerConv(JSONRepr):
                 links[label] = None
         self.members.append(ContainerMember(key, {}))
 
+    def clone(self, source: Box | Container) -> 'ContainerConv':
+        '''a copy for another pool, converted from the source entity of that pool.
+        '''
+        ent = ContainerConv(self.model, source, self.label)
+        ent.members = [ContainerMember(member.key, {}) for member in self.members]
+        return ent
+
     def to_json(self) -> dict:
         return {
             'source':  self.source.key,
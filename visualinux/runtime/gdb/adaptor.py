@@ -1,36 +1,116 @@
 from visualinux import *
 from visualinux.runtime.gdb import gdb
 from visualinux.runtime.gdb.wrappers import *
+from visualinux.runtime.gdb.memcache import PageCache, coalesce_ranges
+from visualinux.runtime.gdb.backend import MemoryBackend, current_backend, switch_backend
 
 from visualinux.evaluation import evaluation_counter
 
+import bisect
+import hashlib
+import struct
+
+# objects larger than this (e.g. huge arrays embedded in a struct) are not preloaded as a whole
+PRELOAD_MAX_SIZE = 0x10000
+
+SCALAR_FORMATS = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}
+
+# upper bound of bytes to read for a NUL-terminated string
+CSTRING_MAX_SIZE = 0x1000
+
+class ReadRecord:
+    '''The target memory read while evaluating something (e.g. a box and everything evaluated under it),
+       so that an incremental sync can tell whether its result is still valid by re-reading only these bytes.
+       - ranges:   (addr, size) read through the adaptor, coalesced when the record ends
+       - volatile: whether anything is read by gdb itself (e.g. gdb.parse_and_eval), i.e. ranges are incomplete
+       - external: whether the result refers to anything evaluated before the record begins
+       - birth:    the number of entities in the pool when the record begins
+       - digest:   hash of the bytes in ranges, computed when the record ends
+    '''
+    __slots__ = ('ranges', 'volatile', 'external', 'birth', 'digest')
+
+    def __init__(self, birth: int = 0) -> None:
+        self.ranges: list[tuple[int, int]] = []
+        self.volatile = False
+        self.external = False
+        self.birth = birth
+        self.digest: bytes | None = None
+
+    @property
+    def sealed(self) -> bool:
+        return not self.volatile and not self.external and self.digest is not None
+
 class GDBAdaptor:
 
     def __init__(self) -> None:
         self.cache: dict[str, gdb.Value] = {}
         self.cache_enabled = True
+        self.memcache = PageCache()
+        # per-sync byte cache of preloaded object spans, sorted by their start addresses
+        self.span_addrs: list[int] = []
+        self.span_bytes: dict[int, bytes] = {}
+        # expressions evaluated by gdb whose values are read from the target memory
+        self.volatile_exprs: set[str] = set()
+        # nested records of the reads, where the innermost one is the last
+        self.records: list[ReadRecord] = []
+        self.__endian: str | None = None
 
     def reset(self) -> None:
         self.cache.clear()
+        self.memcache.invalidate()
+        self.span_addrs.clear()
+        self.span_bytes.clear()
+        self.records.clear()
+
+    @property
+    def backend(self) -> MemoryBackend:
+        return current_backend()
+
+    def set_backend(self, backend: MemoryBackend) -> None:
+        '''switch where the target memory comes from, e.g. from the live gdb target to an offline dump.
+        '''
+        switch_backend(backend)
+        self.__endian = None
+        self.reset()
 
     def disable_cache(self) -> None:
         '''cache should be disabled when we're hacking and modifying the kernel memory (mainly for vdiff tracing)
         '''
         self.cache_enabled = False
+        self.memcache.invalidate()
+        self.span_addrs.clear()
+        self.span_bytes.clear()
 
     def enable_cache(self) -> None:
         '''enable cache after hacking is done
         '''
         self.cache_enabled = True
 
+    @property
+    def endian(self) -> str:
+        if self.__endian is None:
+            try:
+                self.__endian = '>' if 'big' in gdb.execute('show endian', to_string=True) else '<'
+            except gdb.error:
+                self.__endian = '<'
+        return self.__endian
+
+    @property
+    def byteorder(self) -> str:
+        return 'little' if self.endian == '<' else 'big'
+
     def eval(self, expr: str) -> GDBValue:
         if not self.cache_enabled or expr not in self.cache:
             if vl_debug_on(): printd(f'gdb.parse_and_eval({expr})')
-            gdb_val = gdb.parse_and_eval(expr)
+            gdb_val = self.backend.parse_and_eval(expr)
             if not gdb_val.type.is_scalar and not gdb_val.type.code == gdb.TYPE_CODE_PTR:
                 gdb_val = gdb_val.address
+            else:
+                self.volatile_exprs.add(expr)
             if vl_debug_on(): printd(f'gdb.parse_and_eval({expr}) => {gdb_val.format_string()}')
             self.cache[expr] = gdb_val
+        if self.records and expr in self.volatile_exprs:
+            self.mark_volatile()
         gval = GDBValue(self.cache[expr])
         # if not gval.is_pointer():
         #     gval = gval.address_of()
@@ -40,23 +120,204 @@ class GDBAdaptor:
         return gval
 
     def preload(self, addr: int, gtype: GDBType) -> None:
-        pass
-        # if vl_debug_on(): printd(f'preload({addr:#x}, {typename})')
-        # self.dumpset.preload(addr, gtype.target_size())
+        '''read the whole object pointed by (gtype)addr in one round trip,
+           so that the following field dereferences can be decoded locally.
+        '''
+        if not self.cache_enabled or addr == 0 or not self.backend.is_live():
+            return
+        size = gtype.target_size()
+        if size <= 0 or size > PRELOAD_MAX_SIZE:
+            return
+        if self.find_span(addr, size) is not None:
+            return
+        if vl_debug_on(): printd(f'preload({addr:#x}, {gtype!s}) {size = }')
+        data = self.memcache.read(addr, size)
+        if data is None:
+            return
+        if addr not in self.span_bytes:
+            bisect.insort(self.span_addrs, addr)
+        self.span_bytes[addr] = data
+
+    def preload_many(self, objects: list[tuple[int, GDBType]]) -> None:
+        '''preload a batch of (addr, gtype) objects with the minimal number of round trips.
+        '''
+        if not self.cache_enabled or not self.backend.is_live():
+            return
+        spans: list[tuple[int, int]] = []
+        for addr, gtype in objects:
+            size = gtype.target_size()
+            if addr == 0 or size <= 0 or size > PRELOAD_MAX_SIZE:
+                continue
+            if self.find_span(addr, size) is None:
+                spans.append((addr, size))
+        if not spans:
+            return
+        if vl_debug_on(): printd(f'preload_many {len(spans)} objects')
+        for (addr, size), data in zip(spans, self.read_ranges(spans)):
+            if len(data) != size:
+                continue
+            if addr not in self.span_bytes:
+                bisect.insort(self.span_addrs, addr)
+            self.span_bytes[addr] = data
+
+    def read_many(self, ranges: list[tuple[int, int]]) -> list[bytes]:
+        '''read multiple (addr, size) ranges, coalescing overlapping or adjacent ones
+           so that the minimal number of read_memory() calls is issued.
+           An unreadable range results in empty bytes.
+        '''
+        if self.records:
+            self.records[-1].ranges.extend(ranges)
+        return self.read_ranges(ranges)
+
+    def read_ranges(self, ranges: list[tuple[int, int]]) -> list[bytes]:
+        '''the same as read_many() but not recorded, e.g. for prefetching.
+        '''
+        if self.cache_enabled:
+            self.memcache.fetch(ranges)
+            return [self.memcache.read(addr, size) or b'' for addr, size in ranges]
+        blocks: list[tuple[int, bytes]] = []
+        for start, end in coalesce_ranges(ranges):
+            try:
+                blocks.append((start, self.backend.read_memory(start, end - start)))
+            except gdb.MemoryError:
+                pass
+        starts = [start for start, _ in blocks]
+        results: list[bytes] = []
+        for addr, size in ranges:
+            i = bisect.bisect_right(starts, addr) - 1
+            if i >= 0 and addr + size <= starts[i] + len(blocks[i][1]):
+                results.append(blocks[i][1][addr - starts[i] : addr - starts[i] + size])
+            else:
+                results.append(b'')
+        return results
+
+    def find_span(self, addr: int, size: int) -> tuple[bytes, int] | None:
+        '''return the preloaded buffer covering the range addr ~ addr + size, with the offset of addr in it.
+        '''
+        i = bisect.bisect_right(self.span_addrs, addr) - 1
+        if i < 0:
+            return None
+        start = self.span_addrs[i]
+        data = self.span_bytes[start]
+        if addr + size > start + len(data):
+            return None
+        return data, addr - start
+
+    def find_cached(self, addr: int, size: int) -> tuple[bytes | memoryview, int] | None:
+        '''look up the preloaded spans first, then the zero-copy view of offline backends,
+           and finally go through the page cache.
+        '''
+        if (span := self.find_span(addr, size)) is not None:
+            return span
+        if (view := self.backend.view(addr, size)) is not None:
+            return view, 0
+        if (data := self.memcache.read(addr, size)) is not None:
+            return data, 0
+        return None
+
+    def begin_record(self, birth: int = 0) -> ReadRecord:
+        record = ReadRecord(birth)
+        self.records.append(record)
+        return record
+
+    def end_record(self, record: ReadRecord, digest: bool = False) -> None:
+        '''end the innermost record, whose reads are merged into the enclosing one as well.
+           The digest of the bytes read is only computed on demand, since it re-reads them (from the cache).
+        '''
+        if not self.records or self.records[-1] is not record:
+            raise fuck_exc(AssertionError, 'read records are not ended in order')
+        self.records.pop()
+        record.ranges = [(start, end - start) for start, end in coalesce_ranges(record.ranges)]
+        if self.records:
+            self.replay_record(record)
+        if digest and not record.volatile and not record.external:
+            record.digest = self.digest(record.ranges)
+
+    def replay_record(self, record: ReadRecord) -> None:
+        '''merge a record into the innermost one, as if its reads happened again (e.g. served by some cache).
+        '''
+        if self.records:
+            self.records[-1].ranges.extend(record.ranges)
+            self.records[-1].volatile |= record.volatile
+
+    def mark_volatile(self) -> None:
+        for record in self.records:
+            record.volatile = True
+
+    def digest(self, ranges: list[tuple[int, int]]) -> bytes | None:
+        '''hash the current bytes of the ranges in bulk, or None if any of them is not readable.
+        '''
+        hasher = hashlib.blake2b(digest_size=16)
+        for (addr, size), data in zip(ranges, self.read_ranges(ranges)):
+            if len(data) != size:
+                return None
+            hasher.update(data)
+        return hasher.digest()
 
     def read_scalar(self, addr: int, size: int, signed: bool = True) -> int:
         evaluation_counter.bytes += size
+        if self.records:
+            self.records[-1].ranges.append((addr, size))
         sign = '' if signed else 'u'
         if not self.cache_enabled:
             gval = gdb.parse_and_eval(f'*(({sign}int{size * 8}_t *){addr:#x})')
             return int(gval)
+        if (view := self.backend.view(addr, size)) is not None:
+            return int.from_bytes(view, self.byteorder, signed=signed)
+        if size in SCALAR_FORMATS and (span := self.find_cached(addr, size)) is not None:
+            data, offset = span
+            fmt = SCALAR_FORMATS[size] if signed else SCALAR_FORMATS[size].upper()
+            return struct.unpack_from(self.endian + fmt, data, offset)[0]
+        if not self.backend.is_live():
+            raise gdb.MemoryError(f'Cannot access memory at address {addr:#x}')
         if vl_debug_on(): printd(f'gdump.read_scalar {addr=:#x} {sign}int{size * 8}_t')
         gval = gdb.Value(addr).cast(gdb.lookup_type(f'{sign}int{size * 8}_t').pointer()).dereference()
         return int(gval)
 
     def read_string(self, addr: int, size: int) -> str:
         evaluation_counter.bytes += size
+        if self.records:
+            self.records[-1].ranges.append((addr, size))
         if vl_debug_on(): printd(f'read_string {addr = :#x}, {size = }')
+        if self.cache_enabled and (span := self.find_cached(addr, size)) is not None:
+            data, offset = span
+            raw = bytes(data[offset : offset + size])
+            if (end := raw.find(b'\0')) != -1:
+                raw = raw[: end]
+            return raw.decode('utf-8', errors='backslashreplace')
+        if not self.backend.is_live():
+            raise gdb.MemoryError(f'Cannot access memory at address {addr:#x}')
+        gval = gdb.Value(addr).cast(gdb.lookup_type(f'char').pointer())
+        return gval.format_string(raw=True, symbols=False, address=False, format='s')[1 : -1]
+
+    def read_cstring(self, addr: int) -> str:
+        '''read a NUL-terminated string (e.g. for char *), at most CSTRING_MAX_SIZE bytes.
+        '''
+        if vl_debug_on(): printd(f'read_cstring {addr = :#x}')
+        chunks: list[bytes] = []
+        total = 0
+        while self.cache_enabled and total < CSTRING_MAX_SIZE:
+            # never cross the page boundary in one read, as the next page may be unmapped
+            size = min(MEMCACHE_PAGE_SIZE - (addr + total) % MEMCACHE_PAGE_SIZE, CSTRING_MAX_SIZE - total)
+            if (span := self.find_cached(addr + total, size)) is None:
+                break
+            data, offset = span
+            raw = bytes(data[offset : offset + size])
+            if (end := raw.find(b'\0')) != -1:
+                chunks.append(raw[: end])
+                if self.records:
+                    self.records[-1].ranges.append((addr, total + end + 1))
+                return b''.join(chunks).decode('utf-8', errors='backslashreplace')
+            chunks.append(raw)
+            total += size
+        if chunks:
+            if self.records:
+                self.records[-1].ranges.append((addr, total))
+            return b''.join(chunks).decode('utf-8', errors='backslashreplace')
+        if self.records:
+            self.mark_volatile()
+        if not self.backend.is_live():
+            raise gdb.MemoryError(f'Cannot access memory at address {addr:#x}')
         gval = gdb.Value(addr).cast(gdb.lookup_type(f'char').pointer())
         return gval.format_string(raw=True, symbols=False, address=False, format='s')[1 : -1]
 
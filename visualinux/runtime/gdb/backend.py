@@ -0,0 +1,184 @@
+from visualinux import *
+from visualinux.runtime.gdb import gdb
+
+import mmap
+import struct
+
+class MemoryBackend(metaclass=ABCMeta):
+    '''Where the target memory comes from.
+       Types and symbols always come from the DWARF info loaded in gdb (i.e. vmlinux),
+       while the memory can be read from a live target or from an offline dump.
+    '''
+    name: str = ''
+
+    @abstractmethod
+    def read_memory(self, addr: int, size: int) -> bytes:
+        '''read size bytes at the virtual address addr; raise gdb.MemoryError if it is not readable.
+        '''
+        pass
+
+    def view(self, addr: int, size: int) -> memoryview | None:
+        '''zero-copy access to size bytes at addr if the backend supports it, otherwise None.
+        '''
+        return None
+
+    def lookup_type(self, typename: str) -> gdb.Type:
+        return gdb.lookup_type(typename)
+
+    def parse_and_eval(self, expr: str) -> gdb.Value:
+        return gdb.parse_and_eval(expr)
+
+    def is_live(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        pass
+
+class GDBBackend(MemoryBackend):
+    '''The default backend: the inferior attached to gdb (e.g. qemu gdbstub or kgdb).
+    '''
+    name = 'gdb'
+
+    def read_memory(self, addr: int, size: int) -> bytes:
+        return bytes(gdb.selected_inferior().read_memory(addr, size))
+
+@dataclass
+class ELFSegment:
+    vaddr:  int
+    paddr:  int
+    offset: int
+    filesz: int
+    memsz:  int
+
+class DumpBackend(MemoryBackend):
+    '''Base of offline backends, where gdb is only used as the DWARF provider of vmlinux.
+       Note that gdb itself will read the static image of vmlinux when evaluating memory inside an expression,
+       so values of scalar lvalues returned from parse_and_eval() are re-read from the dump.
+    '''
+    def parse_and_eval(self, expr: str) -> gdb.Value:
+        gval = gdb.parse_and_eval(expr)
+        if gval.type.strip_typedefs().is_scalar and gval.address is not None:
+            data = self.read_memory(int(gval.address), gval.type.sizeof)
+            gval = gdb.Value(data, gval.type)
+        return gval
+
+    def is_live(self) -> bool:
+        return False
+
+class ELFCoreBackend(DumpBackend):
+    '''Read memory from an ELF core file whose PT_LOAD segments are described by virtual addresses
+       (e.g. vmcore, or qemu dump-guest-memory with paging).
+    '''
+    name = 'elfcore'
+
+    PT_LOAD = 1
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.mv = memoryview(self.mm)
+        self.segments = self.parse_segments()
+        if not self.segments:
+            raise fuck_exc(AssertionError, f'no PT_LOAD segment found in {path!s}')
+
+    def parse_segments(self) -> list[ELFSegment]:
+        ident = self.mm[: 16]
+        if ident[: 4] != b'\x7fELF':
+            raise fuck_exc(AssertionError, f'not an ELF file: {self.path!s}')
+        if ident[4] != 2:
+            raise fuck_exc(AssertionError, f'only ELF64 core files are supported: {self.path!s}')
+        endian = '<' if ident[5] == 1 else '>'
+        e_phoff, = struct.unpack_from(endian + 'Q', self.mm, 0x20)
+        e_phentsize, e_phnum = struct.unpack_from(endian + 'HH', self.mm, 0x36)
+        segments: list[ELFSegment] = []
+        for i in range(e_phnum):
+            p_type, _, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, _ = \
+                struct.unpack_from(endian + 'IIQQQQQQ', self.mm, e_phoff + i * e_phentsize)
+            if p_type == self.PT_LOAD:
+                segments.append(ELFSegment(p_vaddr, p_paddr, p_offset, p_filesz, p_memsz))
+        segments.sort(key=lambda seg: seg.vaddr)
+        return segments
+
+    @classmethod
+    def is_virtual_core(cls, path: Path) -> bool:
+        with open(path, 'rb') as f:
+            header = f.read(0x40)
+            if header[: 4] != b'\x7fELF' or header[4] != 2:
+                return False
+            endian = '<' if header[5] == 1 else '>'
+            e_phoff, = struct.unpack_from(endian + 'Q', header, 0x20)
+            e_phentsize, e_phnum = struct.unpack_from(endian + 'HH', header, 0x36)
+            f.seek(e_phoff)
+            phdrs = f.read(e_phentsize * e_phnum)
+        for i in range(e_phnum):
+            p_type, _, _, p_vaddr, _, _, _, _ = struct.unpack_from(endian + 'IIQQQQQQ', phdrs, i * e_phentsize)
+            if p_type == cls.PT_LOAD and p_vaddr != 0:
+                return True
+        return False
+
+    def find_segment(self, addr: int) -> ELFSegment | None:
+        for seg in self.segments:
+            if seg.vaddr <= addr < seg.vaddr + seg.memsz:
+                return seg
+        return None
+
+    def view(self, addr: int, size: int) -> memoryview | None:
+        seg = self.find_segment(addr)
+        if seg is None or addr + size > seg.vaddr + seg.filesz:
+            return None
+        offset = seg.offset + addr - seg.vaddr
+        return self.mv[offset : offset + size]
+
+    def read_memory(self, addr: int, size: int) -> bytes:
+        chunks: list[bytes] = []
+        while size > 0:
+            seg = self.find_segment(addr)
+            if seg is None:
+                raise gdb.MemoryError(f'Cannot access memory at address {addr:#x}')
+            delta = addr - seg.vaddr
+            length = min(size, seg.memsz - delta)
+            # the tail beyond filesz is not present in the file, which is zero-filled by definition
+            infile = max(0, min(length, seg.filesz - delta))
+            chunks.append(self.mv[seg.offset + delta : seg.offset + delta + infile])
+            if infile < length:
+                chunks.append(bytes(length - infile))
+            addr += length
+            size -= length
+        return b''.join(chunks)
+
+    def close(self) -> None:
+        close_mapping(self.mv, self.mm)
+        self.file.close()
+
+def close_mapping(mv: memoryview, mm: mmap.mmap) -> None:
+    try:
+        mv.release()
+        mm.close()
+    except BufferError:
+        # some views are still alive, so leave the mapping to gc
+        pass
+
+__backend: MemoryBackend = GDBBackend()
+
+def current_backend() -> MemoryBackend:
+    return __backend
+
+def switch_backend(backend: MemoryBackend) -> None:
+    global __backend
+    if backend is not __backend:
+        __backend.close()
+    __backend = backend
+
+def open_backend(path: str | None) -> MemoryBackend:
+    '''open the offline dump at path, or fall back to the live gdb target if path is None.
+       ELF cores with virtual PT_LOAD segments are read directly, while physical dumps
+       (raw pmemsave files or dump-guest-memory without paging) need address translation.
+    '''
+    if path is None:
+        return GDBBackend()
+    dump_path = Path(path).absolute()
+    if ELFCoreBackend.is_virtual_core(dump_path):
+        return ELFCoreBackend(dump_path)
+    from visualinux.runtime.linux.dump import RawDumpBackend
+    return RawDumpBackend(dump_path)
@@ -0,0 +1,162 @@
+from visualinux import *
+from visualinux.runtime.gdb import gdb
+
+import json
+import hashlib
+
+LAYOUT_CACHE_DIR = TMP_DIR / 'typecache'
+
+def is_resolvable(name: str) -> bool:
+    '''whether resolve_gdb_type() can parse the type name back in a later session,
+       which is not the case for anonymous types (e.g. "struct {...}"), flexible arrays (e.g. "char []")
+       and types with declarator parentheses (e.g. "char (*)[16]" or function pointers).
+    '''
+    return '{' not in name and '(' not in name and '[]' not in name
+
+@dataclass
+class TypeLayout:
+    size:   int
+    code:   int
+    scalar: bool
+    target: str | None = None
+    length: int | None = None
+    signed: bool = False
+
+class LayoutCache:
+    '''Persistent table of resolved DWARF type layouts, keyed by the build-id of vmlinux,
+       so that later gdb sessions can warm-start without querying gdb type by type.
+       - types:   type name => size, code, scalar, target type name, array length, signedness
+       - fields:  (type name, field def) => (field type name, offset)
+       - lookups: typename used in ViewCL => resolved type name
+    Only the entries whose type names are resolvable are kept, since a type warm-started from the cache
+    is resolved from its name when its gdb type is really needed.
+    Names shared by distinct types (e.g. same-named structs from different objfiles) are ambiguous,
+    so that the entries referring to them are neither used nor saved.
+    '''
+    VERSION = 3
+
+    def __init__(self) -> None:
+        self.types:   dict[str, TypeLayout] = {}
+        self.fields:  dict[tuple[str, str], tuple[str, int]] = {}
+        self.lookups: dict[str, str] = {}
+        self.ambiguous: set[str] = set()
+        self.path: Path | None = None
+        self.loaded = False
+        self.dirty  = False
+
+    def ensure_loaded(self) -> None:
+        if self.loaded:
+            return
+        self.loaded = True
+        try:
+            self.path = LAYOUT_CACHE_DIR / f'{self.get_build_id()}.json'
+        except Exception as e:
+            print(f'[WARNING] layout cache disabled: failed to identify vmlinux: {e!s}')
+            return
+        if not self.path.is_file():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+            if data.get('version') != self.VERSION or data.get('gdb') != gdb.VERSION:
+                return
+            for name, layout in data['types'].items():
+                self.types.setdefault(name, TypeLayout(**layout))
+            for key, (typename, offset) in data['fields'].items():
+                self.fields.setdefault(tuple(key.split('\0', 1)), (typename, offset)) # type: ignore
+            for typename, resolved in data['lookups'].items():
+                self.lookups.setdefault(typename, resolved)
+            if vl_debug_on(): printd(f'layout cache loaded from {self.path!s}: {len(self.types)} types, {len(self.fields)} fields')
+        except Exception as e:
+            print(f'[WARNING] failed to load layout cache {self.path!s}: {e!s}')
+
+    def save(self) -> None:
+        if not self.dirty or self.path is None:
+            return
+        dropped = self.get_dropped()
+        data = {
+            'version': self.VERSION,
+            'gdb': gdb.VERSION,
+            'types': {name: layout.__dict__ for name, layout in self.types.items() if name not in dropped},
+            'fields': {
+                '\0'.join(key): value for key, value in self.fields.items()
+                if key[0] not in dropped and value[0] not in dropped
+            },
+            'lookups': {typename: resolved for typename, resolved in self.lookups.items() if resolved not in dropped},
+        }
+        try:
+            LAYOUT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(data))
+            tmp_path.replace(self.path)
+            self.dirty = False
+        except Exception as e:
+            print(f'[WARNING] failed to save layout cache {self.path!s}: {e!s}')
+
+    def get_dropped(self) -> set[str]:
+        '''the ambiguous type names and the names of types derived from them (e.g. pointers).
+        '''
+        dropped = set(self.ambiguous)
+        while derived := {name for name, layout in self.types.items() if name not in dropped and layout.target in dropped}:
+            dropped |= derived
+        return dropped
+
+    @staticmethod
+    def get_build_id() -> str:
+        objfiles = gdb.objfiles()
+        if not objfiles:
+            raise fuck_exc(AssertionError, 'no objfile loaded in gdb')
+        objfile = next((obj for obj in objfiles if obj.filename.endswith('vmlinux')), objfiles[0])
+        if build_id := getattr(objfile, 'build_id', None):
+            return build_id
+        # kernels built without build-id: identify by the file itself
+        stat = Path(objfile.filename).stat()
+        return hashlib.sha1(f'{objfile.filename}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()
+
+    def is_persistable(self, name: str) -> bool:
+        return is_resolvable(name) and name not in self.ambiguous
+
+    def set_ambiguous(self, name: str) -> None:
+        if name not in self.ambiguous:
+            if vl_debug_on(): printd(f'layout cache: ambiguous type name {name}')
+            self.ambiguous.add(name)
+            self.dirty = True
+
+    def get_type(self, name: str) -> TypeLayout | None:
+        self.ensure_loaded()
+        if name in self.ambiguous:
+            return None
+        return self.types.get(name)
+
+    def set_type(self, name: str, layout: TypeLayout) -> None:
+        if not self.is_persistable(name) or (layout.target is not None and not self.is_persistable(layout.target)):
+            return
+        if self.types.get(name) != layout:
+            self.types[name] = layout
+            self.dirty = True
+
+    def get_field(self, typename: str, field_def: str) -> tuple[str, int] | None:
+        self.ensure_loaded()
+        if typename in self.ambiguous:
+            return None
+        return self.fields.get((typename, field_def))
+
+    def set_field(self, typename: str, field_def: str, field_typename: str, offset: int) -> None:
+        if not self.is_persistable(typename) or not self.is_persistable(field_typename):
+            return
+        self.fields[(typename, field_def)] = (field_typename, offset)
+        self.dirty = True
+
+    def get_lookup(self, typename: str) -> str | None:
+        self.ensure_loaded()
+        if (resolved := self.lookups.get(typename)) in self.ambiguous:
+            return None
+        return resolved
+
+    def set_lookup(self, typename: str, resolved: str) -> None:
+        if not self.is_persistable(resolved):
+            return
+        if self.lookups.get(typename) != resolved:
+            self.lookups[typename] = resolved
+            self.dirty = True
+
+layout_cache = LayoutCache()
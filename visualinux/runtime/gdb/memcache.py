@@ -0,0 +1,114 @@
+from visualinux import *
+from visualinux.runtime.gdb import gdb
+from visualinux.runtime.gdb.backend import current_backend
+
+from visualinux.evaluation import evaluation_counter
+
+class PageCache:
+    '''A bounded LRU cache of target memory in aligned pages.
+       Kernel objects of the same type are often clustered in slab pages,
+       so a page fetched for one object usually serves its neighbours as well.
+    '''
+    def __init__(self, page_size: int = MEMCACHE_PAGE_SIZE, max_pages: int = MEMCACHE_MAX_PAGES) -> None:
+        if page_size <= 0 or page_size & (page_size - 1):
+            raise fuck_exc(AssertionError, f'memcache page size should be a power of 2: {page_size = }')
+        self.page_size  = page_size
+        self.page_shift = page_size.bit_length() - 1
+        self.max_pages  = max_pages
+        self.pages: OrderedDict[int, bytes | None] = OrderedDict()
+
+    def invalidate(self) -> None:
+        self.pages.clear()
+
+    def get_page(self, pgno: int) -> bytes | None:
+        '''return the content of the pgno-th page, or None if it is not readable.
+        '''
+        if pgno in self.pages:
+            self.pages.move_to_end(pgno)
+            evaluation_counter.cache_hits += 1
+            return self.pages[pgno]
+        evaluation_counter.cache_misses += 1
+        if vl_debug_on(): printd(f'memcache: fetch page {pgno << self.page_shift:#x}')
+        try:
+            data = current_backend().read_memory(pgno << self.page_shift, self.page_size)
+            evaluation_counter.cache_bytes += self.page_size
+        except gdb.MemoryError:
+            data = None
+        self.pages[pgno] = data
+        if len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+        return data
+
+    def read(self, addr: int, size: int) -> bytes | None:
+        '''read addr ~ addr + size through the cache, or return None if any page in the range is not readable.
+        '''
+        if size <= 0:
+            return b''
+        first = addr >> self.page_shift
+        last = (addr + size - 1) >> self.page_shift
+        offset = addr - (first << self.page_shift)
+        if first == last:
+            page = self.get_page(first)
+            if page is None:
+                return None
+            return page[offset : offset + size]
+        chunks: list[bytes] = []
+        for pgno in range(first, last + 1):
+            page = self.get_page(pgno)
+            if page is None:
+                return None
+            chunks.append(page)
+        return b''.join(chunks)[offset : offset + size]
+
+    def fetch(self, ranges: Iterable[tuple[int, int]]) -> None:
+        '''make sure all pages touched by the given (addr, size) ranges are cached,
+           reading each run of consecutive missing pages in one round trip.
+        '''
+        missing: set[int] = set()
+        for addr, size in ranges:
+            if size <= 0:
+                continue
+            for pgno in range(addr >> self.page_shift, ((addr + size - 1) >> self.page_shift) + 1):
+                if pgno not in self.pages:
+                    missing.add(pgno)
+        if len(missing) > self.max_pages:
+            return
+        for first, count in coalesce_pages(sorted(missing)):
+            if vl_debug_on(): printd(f'memcache: fetch {count} pages from {first << self.page_shift:#x}')
+            try:
+                data = current_backend().read_memory(first << self.page_shift, count << self.page_shift)
+            except gdb.MemoryError:
+                # some page in the run is not readable; find it out page by page
+                for pgno in range(first, first + count):
+                    self.get_page(pgno)
+                continue
+            evaluation_counter.cache_misses += count
+            evaluation_counter.cache_bytes += len(data)
+            for i in range(count):
+                self.pages[first + i] = data[i << self.page_shift : (i + 1) << self.page_shift]
+            while len(self.pages) > self.max_pages:
+                self.pages.popitem(last=False)
+
+def coalesce_pages(pgnos: list[int]) -> list[tuple[int, int]]:
+    '''group sorted page numbers into (first, count) runs of consecutive pages.
+    '''
+    runs: list[tuple[int, int]] = []
+    for pgno in pgnos:
+        if runs and runs[-1][0] + runs[-1][1] == pgno:
+            runs[-1] = (runs[-1][0], runs[-1][1] + 1)
+        else:
+            runs.append((pgno, 1))
+    return runs
+
+def coalesce_ranges(ranges: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    '''merge overlapping or adjacent (addr, size) ranges into sorted (start, end) intervals.
+    '''
+    merged: list[tuple[int, int]] = []
+    for addr, size in sorted(ranges):
+        if size <= 0:
+            continue
+        if merged and addr <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], addr + size))
+        else:
+            merged.append((addr, addr + size))
+    return merged
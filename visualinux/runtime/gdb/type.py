@@ -1,23 +1,89 @@
 from visualinux import *
 from visualinux.runtime.gdb import gdb
+from visualinux.runtime.gdb.backend import current_backend
+from visualinux.runtime.gdb.layout import TypeLayout, layout_cache
 
 import re
 
 class GDBType:
+    '''GDBType instances are interned in a canonical registry keyed by the identity of gdb types (see intern_key()),
+       so that constructing a GDBType for an already-seen gdb type costs only a dict lookup.
+       A GDBType is either built from a gdb type, or from a layout from the persistent cache,
+       in which case the gdb type is resolved lazily only when really needed.
+    '''
+    __slots__ = ('__inner', 'name', 'tag', 'code', 'id', '__sizeof', '__target_size', '__is_scalar',
+                 '__layout', '__target', '__pointer')
 
-    def __init__(self, inner: gdb.Type) -> None:
+    __registry: 'dict[tuple, GDBType]' = {}
+    # the first interned type of each name, for the types referred by name (e.g. from the layout cache)
+    __by_name: 'dict[str, GDBType]' = {}
+
+    def __new__(cls, inner: gdb.Type | None, name: str = '', layout: TypeLayout | None = None) -> 'GDBType':
+        if inner is None:
+            key: tuple = ('layout', name)
+        else:
+            key = intern_key(inner)
+            name = str(inner)
+        if (gtype := cls.__registry.get(key)) is not None:
+            return gtype
+        if inner is not None and (gtype := cls.__by_name.get(name)) is not None:
+            # a type built from the layout cache is the same type if the layout agrees
+            if gtype.__inner is None and gtype.sizeof() == inner.sizeof and gtype.code == inner.code:
+                gtype.__inner = inner
+                cls.__registry[key] = gtype
+                return gtype
+            layout_cache.set_ambiguous(name)
+        gtype = super().__new__(cls)
+        gtype.__setup(inner, name, layout)
+        cls.__registry[key] = gtype
+        cls.__by_name.setdefault(name, gtype)
+        return gtype
+
+    def __setup(self, inner: gdb.Type | None, name: str, layout: TypeLayout | None) -> None:
         self.__inner = inner
-        self.name = str(inner)
-        self.tag = ''
+        self.name = name
+        self.id = len(self.__registry)
+        if inner is not None:
+            code = inner.code
+            target = str(inner.target()) if code in (gdb.TYPE_CODE_PTR, gdb.TYPE_CODE_ARRAY) else None
+            length = self.__range_length(inner) if code == gdb.TYPE_CODE_ARRAY else None
+            layout = TypeLayout(inner.sizeof, code, bool(inner.is_scalar), target, length, is_signed_type(inner))
+            layout_cache.set_type(name, layout)
+        assert layout is not None
+        self.__layout = layout
+        self.code = layout.code
+        self.__sizeof = layout.size
+        self.__pointer: GDBType | None = None
+        self.__target: GDBType | None = None
+        # the target of a type from gdb is resolved by gdb in target(), since its name may not be resolvable
+        if inner is None and layout.target is not None:
+            self.__target = GDBType.from_name(layout.target)
         if self.is_pointer():
             self.tag = self.target().tag
         elif self.is_array():
             self.tag = self.name
         else:
             self.tag = self.name.split(' ')[-1]
-        self.__sizeof = self.inner.sizeof
         self.__target_size = self.target().sizeof() if self.is_pointer() else self.sizeof()
-        self.__is_scalar = self.target().is_scalar() if self.is_pointer() else self.inner.is_scalar
+        self.__is_scalar = self.target().is_scalar() if self.is_pointer() else layout.scalar
+
+    @staticmethod
+    def __range_length(inner: gdb.Type) -> int | None:
+        try:
+            return inner.range()[1] + 1
+        except gdb.error:
+            return None
+
+    @classmethod
+    def from_name(cls, name: str) -> 'GDBType':
+        '''get the interned GDBType by name, or build it from the persistent layout cache if possible,
+           otherwise resolve it via gdb.
+        '''
+        if (gtype := cls.__by_name.get(name)) is not None:
+            return gtype
+        if layout := layout_cache.get_type(name):
+            return GDBType(None, name, layout)
+        return GDBType(resolve_gdb_type(name))
 
     def __str__(self) -> str:
         return self.name
@@ -27,11 +93,17 @@ class GDBType:
 
     def __eq__(self, other) -> bool:
         if isinstance(other, GDBType):
-            return self.inner == other.inner
+            return self is other
         return False
 
+    def __hash__(self) -> int:
+        return self.id
+
     @property
     def inner(self) -> gdb.Type:
+        if self.__inner is None:
+            self.__inner = resolve_gdb_type(self.name)
+            GDBType.__registry.setdefault(intern_key(self.__inner), self)
         return self.__inner
 
     def sizeof(self) -> int:
@@ -40,7 +112,7 @@ class GDBType:
     def target_size(self) -> int:
         return self.__target_size
 
-    __gtype_cache: 'dict[tuple[str, str], tuple[GDBType, int]]' = {}
+    __gtype_cache: 'dict[tuple[int, str], tuple[GDBType, int]]' = {}
 
     def get_field_info(self, field_def: str) -> 'tuple[GDBType, int]':
         if (index := field_def.find('[')) == -1:
@@ -49,8 +121,12 @@ class GDBType:
         else:
             fieldname = field_def[: index]
             fieldindex = int(field_def[index + 1 : -1])
-        if (self.name, field_def) in self.__gtype_cache:
-            return self.__gtype_cache[(self.name, field_def)]
+        if (self.id, field_def) in self.__gtype_cache:
+            return self.__gtype_cache[(self.id, field_def)]
+        if cached := layout_cache.get_field(self.name, field_def):
+            gtype, offset = GDBType.from_name(cached[0]), cached[1]
+            self.__gtype_cache[(self.id, field_def)] = gtype, offset
+            return gtype, offset
         try:
             if vl_debug_on(): printd(f'get_field_info({field_def = } => {fieldname = }, {fieldindex = }) for {self.inner!s}')
             base = gdb.Value(0).cast(self.inner)[fieldname].address
@@ -64,7 +140,8 @@ class GDBType:
                 gtype = gtype.target().target().pointer()
                 offset += gtype.target_size() * fieldindex
                 if vl_debug_on(): printd(f'    {fieldindex = } => {gtype = }, {offset = }')
-            self.__gtype_cache[(self.name, field_def)] = gtype, offset
+            self.__gtype_cache[(self.id, field_def)] = gtype, offset
+            layout_cache.set_field(self.name, field_def, gtype.name, offset)
             return gtype, offset
         except Exception as e:
             raise fuck_exc(e.__class__, f'get_field_info({field_def = }) failed, ' + str(e))
@@ -75,24 +152,29 @@ class GDBType:
         #     return self.target().is_scalar()
         # return self.inner.is_scalar
 
+    def is_signed(self) -> bool:
+        return self.__layout.signed
+
     def is_pointer(self) -> bool:
-        return self.inner.code == gdb.TYPE_CODE_PTR
+        return self.code == gdb.TYPE_CODE_PTR
 
     def is_array(self) -> bool:
-        return self.inner.code == gdb.TYPE_CODE_ARRAY
+        return self.code == gdb.TYPE_CODE_ARRAY
 
     def is_struct(self) -> bool:
-        return self.inner.code == gdb.TYPE_CODE_STRUCT
+        return self.code == gdb.TYPE_CODE_STRUCT
 
     def is_union(self) -> bool:
-        return self.inner.code == gdb.TYPE_CODE_UNION
+        return self.code == gdb.TYPE_CODE_UNION
 
     def is_function(self) -> bool:
-        return self.inner.code == gdb.TYPE_CODE_FUNC
+        return self.code == gdb.TYPE_CODE_FUNC
 
     def array_length(self) -> int:
         if not self.is_array():
             raise fuck_exc(AssertionError, f'try array_length() on non-array ktype {self!s}')
+        if self.__layout.length is not None:
+            return self.__layout.length
         try:
             matched = re.search(r'\[(\d+)\]', self.name)
             assert matched
@@ -101,17 +183,20 @@ class GDBType:
             raise fuck_exc(e.__class__, str(e))
 
     def pointer(self) -> 'GDBType':
-        return GDBType(self.inner.pointer())
-
-    __target_cache: dict[str, 'GDBType'] = {}
+        if self.__pointer is None:
+            if self.__inner is None and layout_cache.get_type(self.name + ' *'):
+                self.__pointer = GDBType.from_name(self.name + ' *')
+            else:
+                self.__pointer = GDBType(self.inner.pointer())
+        return self.__pointer
 
     def target(self) -> 'GDBType':
-        try:
-            if self.name not in self.__target_cache:
-                self.__target_cache[self.name] = GDBType(self.inner.target())
-            return self.__target_cache[self.name]
-        except Exception as e:
-            raise fuck_exc(e.__class__, str(e))
+        if self.__target is None:
+            try:
+                self.__target = GDBType(self.inner.target())
+            except Exception as e:
+                raise fuck_exc(e.__class__, str(e))
+        return self.__target
 
     __type_lookup_cache: dict[str, 'GDBType'] = {}
 
@@ -134,27 +219,33 @@ class GDBType:
 
     @classmethod
     def __lookup(cls, typename: str) -> 'GDBType':
+        if typename not in cls.__type_lookup_cache and (resolved := layout_cache.get_lookup(typename)):
+            cls.__type_lookup_cache[typename] = GDBType.from_name(resolved)
         if typename not in cls.__type_lookup_cache:
-            try: gdbtype = gdb.lookup_type(f'struct {typename}').pointer()
+            try: gdbtype = current_backend().lookup_type(f'struct {typename}').pointer()
             except: pass
-            try: gdbtype = gdb.lookup_type(typename).pointer()
+            try: gdbtype = current_backend().lookup_type(typename).pointer()
             except: pass
-            try: gdbtype = gdb.lookup_type(f'enum {typename}')
+            try: gdbtype = current_backend().lookup_type(f'enum {typename}')
             except: pass
-            try: gdbtype = gdb.lookup_type(f'union {typename}')
+            try: gdbtype = current_backend().lookup_type(f'union {typename}')
             except: pass
             assert gdbtype
             cls.__type_lookup_cache[typename] = GDBType(gdbtype)
+            layout_cache.set_lookup(typename, cls.__type_lookup_cache[typename].name)
         return cls.__type_lookup_cache[typename]
 
     @classmethod
     def basic(cls, typename: str) -> 'GDBType':
+        if typename not in cls.__type_lookup_cache and (resolved := layout_cache.get_lookup(f'basic:{typename}')):
+            cls.__type_lookup_cache[typename] = GDBType.from_name(resolved)
         if typename not in cls.__type_lookup_cache:
             try:
-                gdbtype = gdb.lookup_type(typename)
+                gdbtype = current_backend().lookup_type(typename)
             except Exception as e:
                 raise fuck_exc(AssertionError, f'GDBType.basic({typename}) failed: ' + str(e))
             cls.__type_lookup_cache[typename] = GDBType(gdbtype)
+            layout_cache.set_lookup(f'basic:{typename}', cls.__type_lookup_cache[typename].name)
         return cls.__type_lookup_cache[typename]
 
     @classmethod
@@ -170,20 +261,79 @@ class GDBType:
         for size in [8, 16, 32, 64]:
             for sign in ['s', 'u']:
                 _sign = 'u' if sign == 'u' else ''
-                try:
-                    gdbtype = gdb.lookup_type(f'{_sign}int{size}_t')
-                except:
+                if resolved := layout_cache.get_lookup(f'basic:{_sign}int{size}_t'):
+                    gtype = GDBType.from_name(resolved)
+                else:
                     try:
-                        gdbtype = gdb.lookup_type(f'{sign}{size}')
-                    except Exception as e:
-                        raise fuck_exc(AssertionError, f'GDBType.preload_basic({size=}) failed: ' + str(e))
-                gtype = GDBType(gdbtype)
+                        gdbtype = current_backend().lookup_type(f'{_sign}int{size}_t')
+                    except:
+                        try:
+                            gdbtype = current_backend().lookup_type(f'{sign}{size}')
+                        except Exception as e:
+                            raise fuck_exc(AssertionError, f'GDBType.preload_basic({size=}) failed: ' + str(e))
+                    gtype = GDBType(gdbtype)
+                    layout_cache.set_lookup(f'basic:{_sign}int{size}_t', gtype.name)
                 cls.__type_lookup_cache[f'{_sign}int{size}_t'] = gtype
                 cls.__type_lookup_cache[f'{sign}{size}'] = gtype
         #
         for typename in ['uintptr_t']:
             cls.basic(typename)
 
+def is_signed_type(inner: gdb.Type) -> bool:
+    '''whether an integer type is signed, decided on its base type with typedefs and cv-qualifiers stripped,
+       since the printed name does not tell, e.g. "volatile unsigned long" or "size_t".
+    '''
+    base = inner.strip_typedefs().unqualified()
+    if base.code not in (gdb.TYPE_CODE_INT, gdb.TYPE_CODE_CHAR, gdb.TYPE_CODE_ENUM):
+        return False
+    try:
+        # gdb >= 12
+        return bool(base.is_signed)
+    except (AttributeError, ValueError):
+        pass
+    if base.code == gdb.TYPE_CODE_ENUM:
+        return any(field.enumval < 0 for field in base.fields())
+    return not str(base).startswith('unsigned')
+
+def intern_key(inner: gdb.Type) -> tuple:
+    '''the identity of a gdb type for interning. The printed name is not enough, since it is shared by
+       distinct types, e.g. anonymous "struct {...}" and same-named types of different sizes from different objfiles.
+       - pointers and arrays are identified by their targets;
+       - structs, unions and enums are also identified by their objfiles;
+       - anonymous types are also identified by their field layouts.
+    '''
+    name, code = str(inner), inner.code
+    if code in (gdb.TYPE_CODE_PTR, gdb.TYPE_CODE_ARRAY):
+        return (name, inner.sizeof, intern_key(inner.target()))
+    key: tuple = (name, inner.sizeof)
+    if code in (gdb.TYPE_CODE_STRUCT, gdb.TYPE_CODE_UNION, gdb.TYPE_CODE_ENUM):
+        objfile = getattr(inner, 'objfile', None)
+        key += (objfile.filename if objfile is not None else None,)
+    if '{...}' in name:
+        key += tuple((
+            field.name,
+            getattr(field, 'bitpos', getattr(field, 'enumval', None)),
+            intern_key(field.type) if field.type is not None else None,
+        ) for field in inner.fields())
+    return key
+
+def resolve_gdb_type(name: str) -> gdb.Type:
+    '''resolve a gdb type from its printed name, e.g. "struct task_struct *" or "unsigned long [4]".
+    '''
+    try:
+        name = name.strip()
+        if name.endswith('*'):
+            return resolve_gdb_type(name[: -1]).pointer()
+        if matched := re.fullmatch(r'(.*?)\s*((?:\[\d+\])+)', name):
+            gdbtype = resolve_gdb_type(matched.group(1))
+            for length in reversed(re.findall(r'\[(\d+)\]', matched.group(2))):
+                gdbtype = gdbtype.array(int(length) - 1)
+            return gdbtype
+        return current_backend().lookup_type(name)
+    except gdb.error:
+        # e.g. function pointers; let gdb parse the type expression
+        return gdb.parse_and_eval(f'(({name} *)0)').type.target()
+
 GDBType.preload_basic()
 
 ptr_size: int = GDBType.basic('unsigned long').sizeof() * 8
@@ -2,6 +2,8 @@ from visualinux import *
 from visualinux.term import *
 from visualinux.runtime.gdb.adaptor import *
 from visualinux.runtime.gdb.type import *
+from visualinux.runtime.accessor import FieldPath
+from visualinux.runtime.cexpr import cexpr_evaluate
 from visualinux.dsl.model.decorators import *
 
 from visualinux.evaluation import evaluation_counter
@@ -9,6 +11,7 @@ from visualinux.evaluation import evaluation_counter
 import re
 
 class KValue:
+    __slots__ = ('gtype', 'value', 'is_final', 'final_text')
 
     def __init__(self, gtype: GDBType, value: int) -> None:
         self.gtype      = gtype
@@ -36,7 +39,7 @@ class KValue:
         return self.__str__()
 
     def __hash__(self) -> int:
-        return hash((self.gtype.name, str(self.value), str(self.final_text)))
+        return hash((self.gtype.id, self.value, self.final_text))
 
     def __eq__(self, other: object) -> bool:
         if isinstance(other, KValue):
@@ -55,13 +58,35 @@ class KValue:
     def json_data_key(self) -> str:
         return f'{self.value:#x}:{self.gtype.tag}'
 
-    __dereference_cache: dict['KValue', 'KValue'] = {}
+    # (type id, address) => (generation, dereferenced kvalue), in the LRU order if bounded
+    __dereference_cache: 'OrderedDict[tuple[int, int], tuple[int, KValue]]' = OrderedDict()
+    __dereference_generation: int = 0
+
     @classmethod
     def reset(cls):
-        cls.__dereference_cache.clear()
+        '''invalidate the dereference cache for a new sync by bumping the generation,
+           and only drop the entries when they are unbounded.
+        '''
+        cls.__dereference_generation += 1
+        if DEREF_CACHE_SIZE <= 0:
+            cls.__dereference_cache.clear()
+
+    @classmethod
+    def __dereference_cache_put(cls, key: tuple[int, int], kobj: 'KValue') -> None:
+        '''evict the least recently used entry when bounded, rather than dropping them all,
+           since a large walk would otherwise miss on everything right after the cache is full.
+        '''
+        cache = cls.__dereference_cache
+        cache[key] = (cls.__dereference_generation, kobj)
+        if DEREF_CACHE_SIZE > 0:
+            cache.move_to_end(key)
+            if len(cache) > DEREF_CACHE_SIZE:
+                cache.popitem(last=False)
 
     @classmethod
     def gdb_eval(cls, expr: str) -> 'KValue':
+        if NATIVE_CEXPR and (evaled := cexpr_evaluate(expr)) is not None:
+            return KValue(*evaled)
         gval = gdb_adaptor.eval(expr)
         return KValue(gval.type, int(gval))
 
@@ -76,16 +101,6 @@ class KValue:
         except Exception as e:
             raise fuck_exc(e.__class__, f'{term = !s}, {cast = !s}, ' + str(e))
 
-    def __get_field(self, field_def: str) -> 'KValue':
-        if self.gtype.is_scalar() or not self.gtype.is_pointer() or self.gtype.target().is_pointer():
-            raise fuck_exc(AssertionError, f'try get_field({field_def}) on a bad kvalue = {self!s}')
-        if self.value == KValue_NULL.value:
-            raise fuck_exc(AssertionError, f'try get_field({field_def}) on a nullptr kvalue = {self!s}')
-        field_gtype, field_offset = self.gtype.get_field_info(field_def)
-        kobj = KValue(field_gtype, self.address + field_offset)
-        if vl_debug_on(): printd(f'get_field {self!s}[{field_def}] = {kobj!s}')
-        return kobj
-
     def eval_field(self, field_def: str) -> 'KValue':
         return self.eval_fields([field_def])
 
@@ -97,24 +112,33 @@ class KValue:
             return self
         if not field_defs:
             return self
+        if self.value == KValue_NULL.value:
+            raise fuck_exc(AssertionError, f'try get_field({field_defs[0]}) on a nullptr kvalue = {self!s}')
+        plan = FieldPath.compile(self.gtype, field_defs)
         gdb_adaptor.preload(self.address, self.gtype)
-        kobj = self
-        for field_def in field_defs:
-            kobj = kobj.__get_field(field_def)
-            if vl_debug_on(): printd(f'    eval_fields {field_def} => {kobj!s}')
-            if kobj.gtype.target().is_pointer():# and not kobj.gtype.target().is_scalar():
-                kobj = kobj.dereference()
-                if vl_debug_on(): printd(f'    eval_fields {field_def} dereferenced => {kobj!s}')
-            if kobj.gtype.is_pointer() and kobj.value == KValue_NULL.value:
-                return kobj
+        value = self.value
+        for op in plan.ops:
+            value += op.offset
+            if op.deref:
+                value = gdb_adaptor.read_scalar(value, op.size, signed=False)
+                if value == KValue_NULL.value:
+                    return KValue(op.gtype, value)
+        kobj = KValue(plan.ops[-1].gtype, value)
         if vl_debug_on(): printd(f'{self!s} eval_fields {field_defs} ok {kobj = !s}')
         return kobj
 
     def dereference(self) -> 'KValue':
         if self.final_text:
             return self
-        if gdb_adaptor.cache_enabled and self in self.__dereference_cache:
-            return self.__dereference_cache[self]
+        if cache_enabled := gdb_adaptor.cache_enabled:
+            key = (self.gtype.id, self.value)
+            cached = self.__dereference_cache.get(key)
+            if cached is not None and cached[0] == self.__dereference_generation:
+                if DEREF_CACHE_SIZE > 0:
+                    self.__dereference_cache.move_to_end(key)
+                if gdb_adaptor.records:
+                    gdb_adaptor.records[-1].ranges.append((self.value, self.gtype.target().sizeof()))
+                return cached[1]
         try:
             assert self.gtype.is_pointer()
             if self.gtype.target().is_function():
@@ -124,8 +148,7 @@ class KValue:
                 text = gdb_adaptor.read_string(self.address, self.gtype.target().sizeof())
                 return KValue.FinalStr(text)
             if self.gtype.name.endswith('char *'):
-                fuck = gdb.Value(self.address).cast(self.gtype.inner)
-                text = fuck.format_string(raw=True, symbols=False, address=False, format='s')[1 : -1]
+                text = gdb_adaptor.read_cstring(self.address)
                 evaluation_counter.bytes += len(text)
                 return KValue.FinalStr(text)
             signed = self.gtype.target().is_scalar() and not self.gtype.target().is_pointer() and not self.gtype.target().name.startswith('u')
@@ -134,7 +157,8 @@ class KValue:
             addr = gdb_adaptor.read_scalar(self.address, self.gtype.target().sizeof(), signed=signed)
             kobj = KValue(self.gtype.target(), addr)
             if vl_debug_on(): printd(f'dereference {self!s} => {kobj!s}')
-            self.__dereference_cache[self] = kobj
+            if cache_enabled:
+                self.__dereference_cache_put(key, kobj)
             return kobj
         except Exception as e:
             raise fuck_exc(e.__class__, f'dereference {self!s} failed: ' + str(e))
@@ -147,6 +171,7 @@ class KValue:
             printd(f'  {self.gtype.target().array_length() = !s}')
             printd(f'  {self.gtype.target().target() = !s}')
         item_gtype = self.gtype.target().target()
+        gdb_adaptor.preload(self.address, self.gtype)
         arr: list[KValue] = []
         for i in range(length):
             kobj = KValue(item_gtype.pointer(), self.address + i * item_gtype.sizeof())
@@ -246,6 +271,7 @@ KValue_Undefined = KValue(GDBType.basic('void').pointer(), 0)
 KValue_NULL = KValue(GDBType.basic('void').pointer(), 0)
 
 class KValueVBox(KValue):
+    __slots__ = ()
 
     def __init__(self, addr: int) -> None:
         super().__init__(GDBType.basic('void').pointer(), addr)
@@ -255,6 +281,7 @@ class KValueVBox(KValue):
         return f'VBox#{self.value}'
 
 class PyListOfKValues(KValue):
+    __slots__ = ('py_value', )
 
     def __init__(self, py_value: list[KValue]) -> None:
         super().__init__(GDBType.basic('void').pointer(), -998244353)
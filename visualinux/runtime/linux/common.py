@@ -54,6 +54,9 @@ if LINUX_GDB_DIR not in sys.path:
 import linux.cpus
 
 def current_cpu() -> KValue:
+    if not gdb_adaptor.backend.is_live():
+        # there is no running thread in an offline dump, so just use the boot cpu
+        return KValue.FinalInt(GDBType.basic('int'), 0)
     value = linux.cpus.get_current_cpu()
     return KValue.FinalInt(GDBType.basic('int'), value)
 
@@ -74,7 +77,7 @@ def per_cpu_ptr(ptr: KValue, cpu: KValue | int) -> KValue:
 def per_cpu_offset(cpu: KValue | int) -> int:
     if isinstance(cpu, KValue):
         cpu = cpu.value
-    gval = gdb.parse_and_eval(f'__per_cpu_offset[{cpu}]')
+    gval = gdb_adaptor.eval(f'__per_cpu_offset[{cpu}]')
     return int(gval)
 
 ### specific per-cpu access for kgdb cases
@@ -82,6 +85,8 @@ def per_cpu_offset(cpu: KValue | int) -> int:
 def per_cpu_current_task(cpu: KValue | int) -> KValue:
     '''(*per_cpu_ptr(&(var), cpu))
     '''
+    if not gdb_adaptor.backend.is_live():
+        return per_cpu_current_task_offline(cpu)
     try:        # linux-6.x
         cpu_val = cpu.value if isinstance(cpu, KValue) else cpu
         ptr = linux.cpus.get_current_task(cpu_val).address
@@ -91,3 +96,15 @@ def per_cpu_current_task(cpu: KValue | int) -> KValue:
         except: # kgdb
             ptr = gdb.parse_and_eval(f'kgdb_info[{cpu!s}].task')
     return KValue(GDBType.lookup('task_struct'), int(ptr))
+
+def per_cpu_current_task_offline(cpu: KValue | int) -> KValue:
+    '''gdb cannot evaluate per-cpu variables against an offline dump, so read the per-cpu slot by ourselves.
+    '''
+    for var in ['pcpu_hot.current_task', 'current_task']:
+        try:
+            slot = int(gdb_adaptor.eval(f'&{var}'))
+        except gdb.error:
+            continue
+        ptr = gdb_adaptor.read_scalar((slot + per_cpu_offset(cpu)) % (2**ptr_size), ptr_size // 8, signed=False)
+        return KValue(GDBType.lookup('task_struct'), ptr)
+    raise fuck_exc(AssertionError, f'per_cpu_current_task({cpu!s}): current_task not found')
@@ -0,0 +1,168 @@
+from visualinux import *
+from visualinux.runtime.gdb import gdb
+from visualinux.runtime.gdb.backend import DumpBackend, ELFSegment, close_mapping
+
+import mmap
+import re
+import struct
+
+# This script is not generic and only supports x86_64 with 4-level paging
+
+START_KERNEL_MAP = 0xffffffff80000000
+
+PAGE_SHIFT = 12
+PAGE_SIZE  = 1 << PAGE_SHIFT
+
+_PAGE_PRESENT = 1 << 0
+_PAGE_PSE     = 1 << 7
+PTE_PFN_MASK  = ((1 << 52) - 1) & ~(PAGE_SIZE - 1)
+
+class RawDumpBackend(DumpBackend):
+    '''Read memory from a physical memory dump: either a raw pmemsave file (offset == physical address),
+       or a qemu dump-guest-memory ELF file without paging (PT_LOAD segments are described by p_paddr).
+       Virtual addresses are translated to file offsets via the direct map, the kernel text mapping,
+       or a walk of the kernel page table (e.g. for vmalloc and vmemmap), whose results are cached per page.
+    '''
+    name = 'rawdump'
+
+    def __init__(self, path: Path, phys_base: int | None = None) -> None:
+        self.path = path
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.mv = memoryview(self.mm)
+        self.vmcoreinfo: dict[str, str] = {}
+        self.segments = self.parse_segments()
+        self.phys_end = max(seg.paddr + seg.filesz for seg in self.segments)
+        # vpn => file offset of the page, or None if not mapped
+        self.tlb: dict[int, int | None] = {}
+        self.phys_base = phys_base if phys_base is not None else self.detect_phys_base()
+        self.page_offset_base = self.read_symbol_u64('page_offset_base')
+        self.pgd = self.text_virt2phys(self.symbol_address('init_top_pgt'))
+        if vl_debug_on(): printd(f'RawDumpBackend {path!s} {self.phys_base = :#x}, {self.page_offset_base = :#x}, {self.pgd = :#x}')
+
+    # dump file layout
+
+    def parse_segments(self) -> list[ELFSegment]:
+        if self.mm[: 4] != b'\x7fELF':
+            return [ELFSegment(0, 0, 0, len(self.mm), len(self.mm))]
+        endian = '<' if self.mm[5] == 1 else '>'
+        e_phoff, = struct.unpack_from(endian + 'Q', self.mm, 0x20)
+        e_phentsize, e_phnum = struct.unpack_from(endian + 'HH', self.mm, 0x36)
+        segments: list[ELFSegment] = []
+        for i in range(e_phnum):
+            p_type, _, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, _ = \
+                struct.unpack_from(endian + 'IIQQQQQQ', self.mm, e_phoff + i * e_phentsize)
+            if p_type == 1: # PT_LOAD
+                segments.append(ELFSegment(p_vaddr, p_paddr, p_offset, p_filesz, p_memsz))
+            elif p_type == 4: # PT_NOTE
+                self.parse_vmcoreinfo(bytes(self.mm[p_offset : p_offset + p_filesz]))
+        segments.sort(key=lambda seg: seg.paddr)
+        return segments
+
+    def parse_vmcoreinfo(self, notes: bytes) -> None:
+        if (start := notes.find(b'VMCOREINFO\0')) == -1:
+            return
+        text = notes[start + len(b'VMCOREINFO\0') :].split(b'\0', 1)[0].decode(errors='ignore')
+        for line in text.splitlines():
+            if '=' in line:
+                key, value = line.split('=', 1)
+                self.vmcoreinfo[key] = value
+
+    def phys2offset(self, paddr: int) -> int | None:
+        for seg in self.segments:
+            if seg.paddr <= paddr < seg.paddr + seg.filesz:
+                return seg.offset + paddr - seg.paddr
+        return None
+
+    def read_phys_u64(self, paddr: int) -> int:
+        if (offset := self.phys2offset(paddr)) is None:
+            raise gdb.MemoryError(f'Cannot access physical memory at address {paddr:#x}')
+        return int.from_bytes(self.mv[offset : offset + 8], 'little')
+
+    # kernel symbols
+
+    def symbol_address(self, name: str) -> int:
+        return int(gdb.parse_and_eval(f'&{name}'))
+
+    def text_virt2phys(self, vaddr: int) -> int:
+        return vaddr - START_KERNEL_MAP + self.phys_base
+
+    def read_symbol_u64(self, name: str) -> int:
+        return self.read_phys_u64(self.text_virt2phys(self.symbol_address(name)))
+
+    def detect_phys_base(self) -> int:
+        if matched := re.match(r'-?\d+', self.vmcoreinfo.get('NUMBER(phys_base)', '')):
+            return int(matched.group())
+        # without vmcoreinfo, phys_base should be consistent with the value stored in itself
+        vaddr = self.symbol_address('phys_base')
+        for guess in [0, 0x1000000]:
+            self.phys_base = guess
+            try:
+                if self.read_symbol_u64('phys_base') == guess:
+                    return guess
+            except gdb.MemoryError:
+                pass
+        print(f'[WARNING] RawDumpBackend: failed to detect phys_base of {self.path!s} ({vaddr = :#x}), assume 0')
+        return 0
+
+    # address translation
+
+    def virt2offset(self, vaddr: int) -> int | None:
+        '''translate a kernel virtual address to the file offset, with per-page cache.
+        '''
+        vpn = vaddr >> PAGE_SHIFT
+        if vpn not in self.tlb:
+            paddr = self.virt2phys(vpn << PAGE_SHIFT)
+            self.tlb[vpn] = None if paddr is None else self.phys2offset(paddr)
+        base = self.tlb[vpn]
+        if base is None:
+            return None
+        return base + (vaddr & (PAGE_SIZE - 1))
+
+    def virt2phys(self, vaddr: int) -> int | None:
+        if vaddr >= START_KERNEL_MAP:
+            return self.text_virt2phys(vaddr)
+        if self.page_offset_base <= vaddr < self.page_offset_base + self.phys_end:
+            return vaddr - self.page_offset_base
+        try:
+            return self.walk_page_table(vaddr)
+        except gdb.MemoryError:
+            return None
+
+    def walk_page_table(self, vaddr: int) -> int | None:
+        '''walk the kernel page table (init_top_pgt) which also covers the direct map, vmalloc and vmemmap.
+           1G and 2M huge pages are supported.
+        '''
+        table = self.pgd
+        for level, shift in enumerate([39, 30, 21, 12]):
+            entry = self.read_phys_u64(table + ((vaddr >> shift) & 0x1ff) * 8)
+            if not entry & _PAGE_PRESENT:
+                return None
+            if level in (1, 2) and entry & _PAGE_PSE:
+                return (entry & PTE_PFN_MASK & ~((1 << shift) - 1)) + (vaddr & ((1 << shift) - 1))
+            table = entry & PTE_PFN_MASK
+        return table + (vaddr & (PAGE_SIZE - 1))
+
+    # memory backend interface
+
+    def view(self, addr: int, size: int) -> memoryview | None:
+        if (addr ^ (addr + size - 1)) >> PAGE_SHIFT:
+            return None
+        if (offset := self.virt2offset(addr)) is None:
+            return None
+        return self.mv[offset : offset + size]
+
+    def read_memory(self, addr: int, size: int) -> bytes:
+        chunks: list[bytes] = []
+        while size > 0:
+            length = min(size, PAGE_SIZE - (addr & (PAGE_SIZE - 1)))
+            if (offset := self.virt2offset(addr)) is None:
+                raise gdb.MemoryError(f'Cannot access memory at address {addr:#x}')
+            chunks.append(self.mv[offset : offset + length])
+            addr += length
+            size -= length
+        return b''.join(chunks)
+
+    def close(self) -> None:
+        close_mapping(self.mv, self.mm)
+        self.file.close()
@@ -193,3 +193,32 @@ def __mt_slot_is_safe(pivots: list[int], index: int, last_ma_max: int) -> bool:
 
 def __mt_decompose_pivots(pivots: KValue) -> list[int]:
     return [pivot.dereference().value for pivot in pivots.decompose_array()]
+
+def mt_read_array(array: KValue) -> list[int]:
+    '''read all elements of an unsigned long (or pointer) array in a single memory access.
+    '''
+    gtype = array.gtype.target()
+    length, size = gtype.array_length(), gtype.target().sizeof()
+    data = gdb_adaptor.read_many([(array.address, length * size)])[0]
+    if len(data) < length * size:
+        raise gdb.MemoryError(f'Cannot access memory at address {array.address:#x}')
+    return [int.from_bytes(data[i * size : (i + 1) * size], gdb_adaptor.byteorder) for i in range(length)]
+
+def mt_node_entries(entry: KValue, ma_min: int, ma_max: int) -> tuple[bool, list[tuple[int, int, int]]]:
+    '''read the slots and pivots of an encoded maple node once,
+       and return (is_leaf, [(slot, ma_min, ma_max), ...]) for each non-NULL safe slot.
+    '''
+    type = mte_node_type(entry).value
+    node = mte_to_node(entry)
+    if type == maple_type.maple_dense.value:
+        slots = mt_read_array(node.eval_field('slot'))
+        return True, [(slot, ma_min + i, ma_min + i) for i, slot in enumerate(slots) if slot != 0]
+    layout = 'ma64' if type == maple_type.maple_arange_64.value else 'mr64'
+    slots  = mt_read_array(node.eval_fields([layout, 'slot']))
+    pivots = mt_read_array(node.eval_fields([layout, 'pivot']))
+    entries: list[tuple[int, int, int]] = []
+    for i, slot in enumerate(slots):
+        if slot == 0 or not __mt_slot_is_safe(pivots, i, ma_max):
+            continue
+        entries.append((slot, __ma_calc_min(pivots, i, ma_min), __ma_calc_max(pivots, i, ma_max)))
+    return type < maple_type.maple_range_64.value, entries
@@ -0,0 +1,258 @@
+# The diff of two snapshots, computed on their json form, so that it is also usable headlessly,
+# e.g. for regression checks over the view json files exported by vplot --export.
+# It only depends on the standard library for that reason (see scripts/snapshot-diff.py).
+#
+# A diff document is a dict of views (only the views existed in both snapshots) where each view diff is:
+#     {
+#         'added':      [keys of shapes only in dst],
+#         'removed':    [keys of shapes only in src],
+#         'boxes':      {key: {abst name: [labels of members whose values are changed]}},
+#         'containers': {key: {'ordered': bool, 'ops': [[op, count], ...], 'relinked': [[dst index, [labels]], ...]}},
+#     }
+# Only the boxes and containers that exist in both views and are changed are listed.
+# Box members are compared after abst inheritance is flattened, and a label only in src or dst is not listed,
+# since it is told by the member sets themselves.
+# Container members are aligned by an edit script of runs, where op is '=' (a member of src matched with one of dst),
+# '-' (a member only in src) or '+' (a member only in dst):
+#   - ordered containers (e.g. List) are aligned by the LCS of unique member keys, and the members between two matched ones
+#     are matched by position from either end while their keys are equal, which also matches None and duplicated keys;
+#     matched pairs are in the order of both;
+#   - unordered containers (UnorderedSet) are aligned by multiset difference, where the k-th occurrences of a key are matched,
+#     matched pairs are in the order of dst, and followed by the members only in src.
+# Relinked members are the matched ones whose links are changed, indexed by their positions in dst.
+#
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, TYPE_CHECKING
+import json
+
+if TYPE_CHECKING:
+    from visualinux.snapshot.snapshots import Snapshot
+
+def diff_snapshots(src: 'Snapshot', dst: 'Snapshot') -> dict[str, dict]:
+    src_views = {view.name: view.to_json() for view in src.views}
+    return {view.name: diff_views(src_views[view.name], view.to_json()) for view in dst.views if view.name in src_views}
+
+def diff_files(src: Path, dst: Path) -> dict[str, dict]:
+    '''the diff of exported views, where src and dst are both view json files or both export directories.
+    '''
+    if src.is_dir() and dst.is_dir():
+        names = sorted(path.name for path in src.glob('*.json') if (dst / path.name).exists())
+        return {Path(name).stem: diff_views(load_json(src / name), load_json(dst / name)) for name in names}
+    return {load_json(dst)['name']: diff_views(load_json(src), load_json(dst))}
+
+def diff_views(src: dict, dst: dict) -> dict[str, Any]:
+    src_boxes, dst_boxes = src['pool']['boxes'], dst['pool']['boxes']
+    src_containers, dst_containers = src['pool']['containers'], dst['pool']['containers']
+    diff: dict[str, Any] = {
+        'added':      [key for section in (dst_boxes, dst_containers) for key in section if not has_shape(src, key)],
+        'removed':    [key for section in (src_boxes, src_containers) for key in section if not has_shape(dst, key)],
+        'boxes':      {},
+        'containers': {},
+    }
+    for key, box in dst_boxes.items():
+        if key in src_boxes and src_boxes[key] != box:
+            if box_diff := diff_box(src_boxes[key], box):
+                diff['boxes'][key] = box_diff
+    for key, container in dst_containers.items():
+        if key in src_containers and src_containers[key]['members'] != container['members']:
+            diff['containers'][key] = diff_container(src_containers[key], container)
+    return diff
+
+def is_empty(diff: dict[str, dict]) -> bool:
+    '''whether a diff document tells no difference, e.g. to assert that a replayed dump yields the same plots.
+    '''
+    return not any(any(view_diff.values()) for view_diff in diff.values())
+
+def summarize(diff: dict[str, dict]) -> str:
+    return ', '.join(
+        f'{name}: +{len(view_diff["added"])} -{len(view_diff["removed"])} '
+        f'~{len(view_diff["boxes"])} boxes ~{len(view_diff["containers"])} containers'
+        for name, view_diff in diff.items()
+    )
+
+def has_shape(view: dict, key: str) -> bool:
+    return key in view['pool']['boxes'] or key in view['pool']['containers']
+
+def load_json(path: Path) -> dict:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+#
+# boxes
+#
+
+def diff_box(src: dict, dst: dict) -> dict[str, list[str]]:
+    diff: dict[str, list[str]] = {}
+    for name in dst['absts']:
+        if name not in src['absts']:
+            continue
+        src_members, dst_members = flatten_abst(src, name), flatten_abst(dst, name)
+        changed = [label for label, member in dst_members.items() if label in src_members and not same_member(src_members[label], member)]
+        if changed:
+            diff[name] = changed
+    return diff
+
+def flatten_abst(box: dict, name: str) -> dict[str, dict]:
+    '''members of an abst with those inherited from its parents, where the inheriting ones take precedence.
+    '''
+    chain: list[dict] = []
+    while name is not None:
+        abst = box['absts'][name]
+        chain.append(abst['members'])
+        name = abst['parent']
+    members: dict[str, dict] = {}
+    for abst_members in reversed(chain):
+        members.update(abst_members)
+    return members
+
+def same_member(src: dict, dst: dict) -> bool:
+    if src['class'] != dst['class']:
+        return False
+    match dst['class']:
+        case 'text': return src['value']  == dst['value']
+        case 'link': return src['target'] == dst['target']
+        case 'box':  return src['object'] == dst['object']
+    return src == dst
+
+#
+# containers
+#
+
+def diff_container(src: dict, dst: dict) -> dict[str, Any]:
+    src_members, dst_members = src['members'], dst['members']
+    ordered = not is_unordered(dst)
+    src_keys = [member['key'] for member in src_members]
+    dst_keys = [member['key'] for member in dst_members]
+    if ordered:
+        pairs = lcs_pairs(src_keys, dst_keys)
+        ops = ordered_ops(pairs, len(src_keys), len(dst_keys))
+    else:
+        pairs = set_pairs(src_keys, dst_keys)
+        ops = unordered_ops(pairs, len(src_keys), len(dst_keys))
+    relinked: list[list] = []
+    for i, j in pairs:
+        src_links, dst_links = src_members[i]['links'], dst_members[j]['links']
+        if src_links != dst_links:
+            labels = [label for label, link in dst_links.items() if label in src_links and src_links[label]['target'] != link['target']]
+            if labels:
+                relinked.append([j, labels])
+    return {
+        'ordered':  ordered,
+        'ops':      ops,
+        'relinked': relinked,
+    }
+
+def is_unordered(container: dict) -> bool:
+    return '[UnorderedSet]' in container.get('type', container['key'])
+
+def unique_positions(keys: list[str | None]) -> dict[str, int]:
+    '''positions of the keys occurring exactly once, which are the only ones to anchor the alignment.
+    '''
+    positions: dict[str, int] = {}
+    duplicated: set[str] = set()
+    for index, key in enumerate(keys):
+        if key is None or key in duplicated:
+            continue
+        if key in positions:
+            del positions[key]
+            duplicated.add(key)
+        else:
+            positions[key] = index
+    return positions
+
+def lcs_pairs(src_keys: list[str | None], dst_keys: list[str | None]) -> list[tuple[int, int]]:
+    '''the common subsequence of two key lists as (src index, dst index) pairs, anchored by the LCS of unique keys,
+       where each gap between two anchors (or an anchor and either end) is matched by position
+       from its start and then from its end while the keys are equal, e.g. runs of None or duplicated keys.
+    '''
+    pairs: list[tuple[int, int]] = []
+    i = j = 0
+    for ai, aj in anchor_pairs(src_keys, dst_keys) + [(len(src_keys), len(dst_keys))]:
+        pairs.extend(gap_pairs(src_keys, dst_keys, i, ai, j, aj))
+        if (ai, aj) != (len(src_keys), len(dst_keys)):
+            pairs.append((ai, aj))
+        i, j = ai + 1, aj + 1
+    return pairs
+
+def gap_pairs(src_keys: list[str | None], dst_keys: list[str | None], i: int, i_end: int, j: int, j_end: int) -> list[tuple[int, int]]:
+    head: list[tuple[int, int]] = []
+    while i < i_end and j < j_end and src_keys[i] == dst_keys[j]:
+        head.append((i, j))
+        i, j = i + 1, j + 1
+    tail: list[tuple[int, int]] = []
+    while i < i_end and j < j_end and src_keys[i_end - 1] == dst_keys[j_end - 1]:
+        i_end, j_end = i_end - 1, j_end - 1
+        tail.append((i_end, j_end))
+    return head + tail[::-1]
+
+def anchor_pairs(src_keys: list[str | None], dst_keys: list[str | None]) -> list[tuple[int, int]]:
+    '''the longest common subsequence of the keys occurring exactly once in both lists as (src index, dst index) pairs,
+       computed as the longest increasing subsequence of src positions in dst order (in O(n log n)).
+    '''
+    src_positions = unique_positions(src_keys)
+    dst_positions = unique_positions(dst_keys)
+    sequence = [(src_positions[key], j) for key, j in dst_positions.items() if key in src_positions]
+    sequence.sort(key=lambda pair: pair[1])
+    # tails[k] is the smallest src position that ends an increasing subsequence of length k + 1
+    tails: list[int] = []
+    tail_indexes: list[int] = []
+    predecessors: list[int] = []
+    for index, (i, _) in enumerate(sequence):
+        k = bisect_left(tails, i)
+        if k == len(tails):
+            tails.append(i)
+            tail_indexes.append(index)
+        else:
+            tails[k] = i
+            tail_indexes[k] = index
+        predecessors.append(tail_indexes[k - 1] if k else -1)
+    pairs: list[tuple[int, int]] = []
+    index = tail_indexes[-1] if tail_indexes else -1
+    while index >= 0:
+        pairs.append(sequence[index])
+        index = predecessors[index]
+    pairs.reverse()
+    return pairs
+
+def set_pairs(src_keys: list[str | None], dst_keys: list[str | None]) -> list[tuple[int, int]]:
+    '''pairs of equal keys in the order of dst, where the k-th occurrences of a key in src and dst are paired.
+    '''
+    src_positions: dict[str | None, list[int]] = {}
+    for i, key in enumerate(src_keys):
+        src_positions.setdefault(key, []).append(i)
+    taken: dict[str | None, int] = {}
+    pairs: list[tuple[int, int]] = []
+    for j, key in enumerate(dst_keys):
+        k = taken.get(key, 0)
+        if k < len(src_positions.get(key, [])):
+            pairs.append((src_positions[key][k], j))
+            taken[key] = k + 1
+    return pairs
+
+def ordered_ops(pairs: list[tuple[int, int]], src_count: int, dst_count: int) -> list[list]:
+    ops: list[list] = []
+    i = j = 0
+    for pi, pj in pairs + [(src_count, dst_count)]:
+        push_op(ops, '-', pi - i)
+        push_op(ops, '+', pj - j)
+        if (pi, pj) != (src_count, dst_count):
+            push_op(ops, '=', 1)
+        i, j = pi + 1, pj + 1
+    return ops
+
+def unordered_ops(pairs: list[tuple[int, int]], src_count: int, dst_count: int) -> list[list]:
+    ops: list[list] = []
+    matched = {j for _, j in pairs}
+    for j in range(dst_count):
+        push_op(ops, '=' if j in matched else '+', 1)
+    push_op(ops, '-', src_count - len(pairs))
+    return ops
+
+def push_op(ops: list[list], op: str, count: int) -> None:
+    if count <= 0:
+        return
+    if ops and ops[-1][0] == op:
+        ops[-1][1] += count
+    else:
+        ops.append([op, count])
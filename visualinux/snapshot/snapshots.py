@@ -1,8 +1,17 @@
 from visualinux import *
-from visualinux.snapshot.state import StateView
+from visualinux.snapshot.state import StateView, SerializedView, SharedCache
 from visualinux.runtime.utils import get_current_pc
 from dataclasses import dataclass
 from datetime import datetime
+import hashlib
+import json
+
+__delta_push = DELTA_PUSH
+def get_delta_push() -> bool:
+    return __delta_push
+def set_delta_push(enabled: bool):
+    global __delta_push
+    __delta_push = enabled
 
 @dataclass
 class Plot:
@@ -13,11 +22,16 @@ class Snapshot:
 
     def __init__(self) -> None:
         self.key = '<undefined>'
-        self.views: list[StateView] = []
+        self.views: list[StateView | SerializedView] = []
         self.pc = get_current_pc()
         self.timestamp = datetime.now().timestamp()
+        # evaluated boxes with their reads, kept for the next incremental sync
+        self.shared: SharedCache | None = None
+        # view name => pool section => entity key => digest of its json, kept as the base of the next delta push,
+        # which is set only once the snapshot is pushed by PATCH successfully, i.e. the visualizer keeps it as a patch base
+        self.digests: dict[str, dict[str, dict[str, bytes]]] | None = None
 
-    def add_view(self, view: StateView):
+    def add_view(self, view: StateView | SerializedView):
         self.views.append(view)
 
     def to_json(self) -> dict:
@@ -39,6 +53,8 @@ class SnapshotManager:
 
     def __init__(self):
         self.data: dict[str, Snapshot] = {}
+        # digest of the ViewCL code => key of the latest snapshot synced from it
+        self.diagrams: dict[str, str] = {}
 
     def set(self, sn_key: str, snapshot: Snapshot):
         self.data[sn_key] = snapshot
@@ -47,3 +63,92 @@ class SnapshotManager:
 
     def get(self, sn_key: str) -> Snapshot | None:
         return self.data.get(sn_key)
+
+    def latest(self) -> Snapshot | None:
+        return next(reversed(self.data.values()), None)
+
+    def delta(self, snapshot: Snapshot, code: str) -> tuple[dict, Callable[[], None]]:
+        '''the PATCH command of a snapshot relative to the previous snapshot of the same diagram (i.e. the same code),
+           where only the added and modified entities are shipped, and the removed ones are listed by key.
+           Without a previous snapshot, the base is null and every entity is added.
+           It is returned with a callback to be called once the command is sent successfully,
+           which makes the snapshot the base of the next delta of the diagram.
+        '''
+        diagram = hashlib.blake2b(code.encode(), digest_size=16).hexdigest()
+        base = self.data.get(self.diagrams.get(diagram, ''))
+        command, commit_digests = self.delta_against(snapshot, base)
+        def commit() -> None:
+            commit_digests()
+            self.diagrams[diagram] = snapshot.key
+        return command, commit
+
+    def delta_against(self, snapshot: Snapshot, base: Snapshot | None) -> tuple[dict, Callable[[], None]]:
+        '''the PATCH command of a snapshot relative to the base snapshot, which may be the snapshot itself
+           (e.g. after its truncated containers are extended), and is ignored if it was not pushed by PATCH.
+           Entities are digested one by one as their json is encoded, and only the json of the changed ones is kept.
+           It is returned with a callback to be called once the command is sent successfully,
+           which keeps the digests in the snapshot for the next delta against it.
+        '''
+        base_digests = base.digests if base else None
+        if base_digests is None:
+            base = None
+        snapshot_digests: dict[str, dict[str, dict[str, bytes]]] = {}
+        views: dict[str, dict] = {}
+        added = modified = removed = 0
+        for view in snapshot.views:
+            view_base = base_digests.get(view.name, {}) if base_digests else {}
+            data = view.to_json() if isinstance(view, SerializedView) else None
+            view_delta: dict[str, Any] = {
+                'name':       view.name,
+                'plot':       data['plot'] if data else view.plot,
+                'init_attrs': data['init_attrs'] if data else view.db_attrs.to_json(),
+                'stat':       data['stat'] if data else int(view.error),
+                'removed':    {},
+            }
+            digests = snapshot_digests[view.name] = {}
+            for section in ('boxes', 'containers'):
+                changed: dict[str, dict] = {}
+                base_section = view_base.get(section, {})
+                section_digests = digests[section] = {}
+                for key, ent_data in iter_section(view, section, data):
+                    digest = section_digests[key] = entity_digest(ent_data)
+                    if key not in base_section:
+                        added += 1
+                    elif base_section[key] != digest:
+                        modified += 1
+                    else:
+                        continue
+                    changed[key] = ent_data
+                view_delta[section] = changed
+                gone = [key for key in base_section if key not in section_digests]
+                view_delta['removed'][section] = gone
+                removed += len(gone)
+            views[view.name] = view_delta
+        print(f'delta of snapshot {snapshot.key} against {base.key if base else None}: +{added} ~{modified} -{removed}')
+        command = {
+            'command':   'PATCH',
+            'snKey':     snapshot.key,
+            'baseSnKey': base.key if base else None,
+            'patch': {
+                'key':       snapshot.key,
+                'views':     views,
+                'pc':        str(snapshot.pc),
+                'timestamp': snapshot.timestamp,
+            },
+        }
+        def commit() -> None:
+            snapshot.digests = snapshot_digests
+        return command, commit
+
+def iter_section(view: StateView | SerializedView, section: str, data: dict | None) -> Iterable[tuple[str, dict]]:
+    '''the entities of a pool section (boxes or containers) as (key, json), converted one at a time,
+       where data is the json of a serialized view.
+    '''
+    if data is not None:
+        return data['pool'][section].items()
+    entities = view.pool.boxes if section == 'boxes' else view.pool.containers
+    return ((key, ent.to_json()) for key, ent in entities.items())
+
+__encoder = json.JSONEncoder(separators=(',', ':'))
+def entity_digest(data: dict) -> bytes:
+    return hashlib.blake2b(__encoder.encode(data).encode(), digest_size=16).digest()
@@ -2,23 +2,39 @@ from visualinux import *
 from visualinux.runtime import entity
 from visualinux.dsl.parser.viewql_units import ViewQLCode
 from visualinux.snapshot.attrs_manager import ViewAttrsManager
+from visualinux.runtime.gdb.adaptor import gdb_adaptor, ReadRecord
+from visualinux.evaluation import evaluation_counter
 
 class Pool:
 
-    def __init__(self) -> None:
+    def __init__(self, shared: 'SharedCache | None' = None) -> None:
         self.boxes: dict[str, entity.Box] = {}
         self.containers: dict[str, entity.Container | entity.ContainerConv] = {}
+        self.shared = shared
+        # the order in which entities are added, to tell whether an entity is evaluated before a read record begins
+        self.births: dict[str, int] = {}
         self.__next_vbox_addr: int = 0
 
     def add_box(self, ent: entity.Box) -> None:
         self.__add_check(ent)
         if vl_debug_on(): printd(f'pool.add_box({ent.key})')
         self.boxes[ent.key] = ent
+        self.births[ent.key] = len(self.births)
 
     def add_container(self, ent: entity.Container | entity.ContainerConv) -> None:
         self.__add_check(ent)
         if vl_debug_on(): printd(f'pool.add_container({ent.key})')
         self.containers[ent.key] = ent
+        self.births[ent.key] = len(self.births)
+
+    def __touch(self, key: str) -> None:
+        '''an existing entity is referred again, which is external to the read records begun after it is added.
+        '''
+        if (birth := self.births.get(key)) is None:
+            return
+        for record in gdb_adaptor.records:
+            if record.birth > birth:
+                record.external = True
 
     def __add_check(self, ent: entity.NotPrimitive) -> None:
         if ent.key in self.boxes:
@@ -41,6 +57,7 @@ class Pool:
         if key in self.containers:
             raise fuck_exc(AssertionError, f'try to find_box {key = } but found in {self.containers = !s}')
         if key in self.boxes:
+            if gdb_adaptor.records: self.__touch(key)
             return self.boxes[key]
         return None
 
@@ -53,6 +70,7 @@ class Pool:
             ent = self.containers[key]
             if not isinstance(ent, entity.Container):
                 raise fuck_exc(AssertionError, f'find_container {key = } but not an ent.Container: {ent = !s}')
+            if gdb_adaptor.records: self.__touch(key)
             return ent
         return None
 
@@ -63,9 +81,95 @@ class Pool:
             ent = self.containers[key]
             if not isinstance(ent, entity.ContainerConv):
                 raise fuck_exc(AssertionError, f'find_container {key = } but not an ent.ContainerConv: {ent = !s}')
+            if gdb_adaptor.records: self.__touch(key)
             return ent
         return None
 
+    def find_shared(self, shared_key: tuple) -> entity.Box | None:
+        '''find the box evaluated by another view of the same snapshot and import it into this pool,
+           or otherwise carry it over from the previous snapshot if the bytes it has read are not changed.
+        '''
+        if self.shared is None:
+            return None
+        if (entry := self.shared.find(shared_key)) is not None:
+            if entry.pool is self or (ent := self.import_from(entry.pool, entry.key)) is None:
+                self.shared.forbid(shared_key)
+                return None
+            if vl_debug_on(): printd(f'pool.find_shared({entry.key}) imported')
+            evaluation_counter.shared_boxes += 1
+        elif (entry := self.shared.find_previous(shared_key)) is not None and entry.is_unchanged():
+            if (ent := self.import_from(entry.pool, entry.key)) is None:
+                return None
+            if vl_debug_on(): printd(f'pool.find_shared({entry.key}) carried over')
+            evaluation_counter.carried_boxes += 1
+            self.shared.add(shared_key, self, ent.key, entry.record)
+        else:
+            return None
+        # the reads of the imported box are also the reads of the boxes enclosing it
+        if entry.record is not None:
+            gdb_adaptor.replay_record(entry.record)
+        elif gdb_adaptor.records:
+            gdb_adaptor.mark_volatile()
+        return ent
+
+    def add_shared(self, shared_key: tuple, ent: entity.Box, record: ReadRecord | None = None) -> None:
+        if self.shared is not None:
+            self.shared.add(shared_key, self, ent.key, record)
+
+    def import_from(self, source: 'Pool', key: str) -> entity.Box | None:
+        '''clone the box of key and all entities reachable from it in the source pool into this pool,
+           where entities already existing in this pool are kept as they are.
+           Nothing is imported (and None is returned) if any of them is not shareable,
+           i.e. it is virtual (whose key is renamed per view) or truncated (whose cursor extends the source pool).
+        '''
+        closure: list[entity.NotPrimitive] = []
+        visited: set[str] = set()
+        stack: list[str | None] = [key]
+        while stack:
+            ekey = stack.pop()
+            if ekey is None or ekey in visited:
+                continue
+            visited.add(ekey)
+            if ekey in self.boxes or ekey in self.containers:
+                if gdb_adaptor.records: self.__touch(ekey)
+                continue
+            ent = source.find(ekey)
+            if ent is None or ent.addr < 0:
+                return None
+            if isinstance(ent, entity.Container) and ent.cursor is not None:
+                return None
+            closure.append(ent)
+            stack.extend(self.__referred_keys(ent))
+        for ent in closure:
+            if isinstance(ent, entity.Box):
+                self.add_box(ent.clone())
+            elif isinstance(ent, entity.Container):
+                self.add_container(ent.clone())
+        for ent in closure:
+            if isinstance(ent, entity.ContainerConv):
+                ent_source = self.find(ent.source.key)
+                assert isinstance(ent_source, entity.Box | entity.Container)
+                self.add_container(ent.clone(ent_source))
+        return self.boxes[key]
+
+    @staticmethod
+    def __referred_keys(ent: entity.NotPrimitive) -> list[str | None]:
+        if isinstance(ent, entity.Box):
+            keys: list[str | None] = []
+            for view in ent.views.values():
+                for member in view.members.values():
+                    if isinstance(member, entity.Link):
+                        keys.append(member.target_key)
+                    elif isinstance(member, entity.BoxMember):
+                        keys.append(member.object_key)
+            return keys
+        keys = [member.key for member in ent.members]
+        if isinstance(ent, entity.ContainerConv):
+            keys.append(ent.source.key)
+        else:
+            keys.extend(link.target_key for member in ent.members for link in member.links.values())
+        return keys
+
     def gen_vbox_addr(self) -> int:
         '''Generate a fake, unique root address for VBox whose root is None.
         '''
@@ -80,14 +184,67 @@ class Pool:
                 dict((key, ent.to_json()) for key, ent in self.containers.items())
         }
 
+@dataclass
+class SharedEntry:
+    '''A box in the shared cache, i.e. where it is evaluated and what it has read from the target.
+       The record is None if the reads are unknown (e.g. not recorded for a non-incremental sync).
+    '''
+    pool:   Pool
+    key:    str
+    record: ReadRecord | None
+
+    def is_unchanged(self) -> bool:
+        '''re-read the recorded bytes in bulk and compare them with the recorded digest.
+        '''
+        if self.record is None or not self.record.sealed:
+            return False
+        return gdb_adaptor.digest(self.record.ranges) == self.record.digest
+
+class SharedCache:
+    '''Evaluated boxes shared by all views of one snapshot, keyed by (shape template, root),
+       so that an object plotted by several diagrams is read from the target only once.
+       Each entry keeps the pool where the box is evaluated, whose reachable entities are cloned on hit.
+       Entries added while syncing a view are only committed if the view is synced successfully.
+       For an incremental sync, the shared cache of the previous snapshot is consulted as well,
+       where a box is carried over if the bytes it has read are not changed.
+    '''
+    def __init__(self, previous: 'SharedCache | None' = None, recording: bool = False) -> None:
+        self.entries: dict[tuple, SharedEntry | None] = {}
+        self.pending: list[tuple] = []
+        self.previous = previous
+        self.recording = recording
+
+    def find(self, shared_key: tuple) -> SharedEntry | None:
+        return self.entries.get(shared_key)
+
+    def find_previous(self, shared_key: tuple) -> SharedEntry | None:
+        return self.previous.entries.get(shared_key) if self.previous else None
+
+    def add(self, shared_key: tuple, pool: Pool, key: str, record: ReadRecord | None = None) -> None:
+        if shared_key not in self.entries:
+            self.entries[shared_key] = SharedEntry(pool, key, record)
+            self.pending.append(shared_key)
+
+    def forbid(self, shared_key: tuple) -> None:
+        self.entries[shared_key] = None
+
+    def commit(self) -> None:
+        self.pending.clear()
+
+    def rollback(self) -> None:
+        for shared_key in self.pending:
+            self.entries.pop(shared_key, None)
+        self.pending.clear()
+
 class StateView:
 
-    def __init__(self, name: str, error: bool = True) -> None:
+    def __init__(self, name: str, error: bool = True, shared: SharedCache | None = None) -> None:
         self.name = name
-        self.pool = Pool()
+        self.pool = Pool(shared)
         self.plot: list[str] = []
         self.error = error
         self.db_attrs = ViewAttrsManager()
+        self.init_viewql = ViewQLCode([])
 
     def add_plot(self, key: str) -> None:
         self.plot.append(key)
@@ -225,7 +382,16 @@ class StateView:
         for container in self.pool.containers.values():
             self.db_attrs.insert_container(container)
 
+    def redo_postprocess(self) -> None:
+        '''postprocess again after the pool is extended (e.g. a truncated container is continued),
+           where the attrs manager is rebuilt and the init viewql is re-applied.
+        '''
+        self.db_attrs = ViewAttrsManager()
+        self.do_postprocess()
+        self.intp_viewql(self.init_viewql)
+
     def intp_viewql(self, viewql: ViewQLCode) -> None:
+        self.init_viewql = viewql
         try:
             self.db_attrs.intp_viewql(viewql)
         except Exception as e:
@@ -239,3 +405,14 @@ class StateView:
             'init_attrs': self.db_attrs.to_json(),
             'stat': int(self.error),
         }
+
+class SerializedView:
+    '''A view synced in a worker process, which is kept in the json form returned by the worker.
+       Unlike StateView, it cannot be extended (e.g. by vplot --more) since its shapes stay in the worker.
+    '''
+    def __init__(self, name: str, data: dict) -> None:
+        self.name = name
+        self.data = data
+
+    def to_json(self) -> dict:
+        return self.data
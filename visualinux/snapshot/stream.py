@@ -0,0 +1,70 @@
+from visualinux import *
+from visualinux.snapshot.state import StateView, SerializedView
+from visualinux.snapshot.snapshots import Snapshot
+
+import json
+
+# fragments are joined into chunks of about this size before being written out
+STREAM_CHUNK_SIZE = 0x10000
+
+__encoder = json.JSONEncoder(separators=(',', ':'))
+def dumps(obj: Any) -> str:
+    return __encoder.encode(obj)
+
+def iter_snapshot(snapshot: Snapshot) -> Generator[str, None, None]:
+    '''The json text of snapshot.to_json() in fragments, where at most one entity is converted to dict at a time,
+       so that a huge snapshot is never held in memory as a whole dict (nor as a whole string).
+    '''
+    yield '{"key":' + dumps(snapshot.key) + ',"views":{'
+    for i, view in enumerate(snapshot.views):
+        yield (',' if i else '') + dumps(view.name) + ':'
+        yield from iter_view(view)
+    yield '},"pc":' + dumps(str(snapshot.pc)) + ',"timestamp":' + dumps(snapshot.timestamp) + '}'
+
+def iter_view(view: StateView | SerializedView) -> Generator[str, None, None]:
+    if isinstance(view, SerializedView):
+        yield dumps(view.to_json())
+        return
+    yield '{"name":' + dumps(view.name) + ',"pool":{"boxes":{'
+    for i, (key, ent) in enumerate(view.pool.boxes.items()):
+        yield (',' if i else '') + dumps(key) + ':' + dumps(ent.to_json())
+    yield '},"containers":{'
+    for i, (key, ent) in enumerate(view.pool.containers.items()):
+        yield (',' if i else '') + dumps(key) + ':' + dumps(ent.to_json())
+    yield '}},"plot":' + dumps(view.plot)
+    yield ',"init_attrs":' + dumps(view.db_attrs.to_json())
+    yield ',"stat":' + dumps(int(view.error)) + '}'
+
+def iter_command(command: dict[str, Any], snapshot: Snapshot) -> Generator[str, None, None]:
+    '''the json text of a visualizer command with the snapshot streamed as its "snapshot" field.
+    '''
+    fields = [dumps(key) + ':' + dumps(value) for key, value in command.items()]
+    yield '{' + ''.join(field + ',' for field in fields) + '"snapshot":'
+    yield from iter_snapshot(snapshot)
+    yield '}'
+
+def chunked(fragments: Iterable[str], chunk_size: int = STREAM_CHUNK_SIZE) -> Generator[bytes, None, None]:
+    '''join text fragments into utf-8 chunks of about chunk_size bytes, e.g. for a chunked http request body.
+    '''
+    buffer: list[bytes] = []
+    size = 0
+    for fragment in fragments:
+        data = fragment.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer.clear()
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+def write_stream(path: Path, fragments: Iterable[str]) -> int:
+    '''write text fragments to a file chunk by chunk, and return the number of bytes written.
+    '''
+    written = 0
+    with open(path, 'wb') as f:
+        for chunk in chunked(fragments):
+            f.write(chunk)
+            written += len(chunk)
+    return written
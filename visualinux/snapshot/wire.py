@@ -0,0 +1,269 @@
+from visualinux import *
+from visualinux.runtime import entity
+from visualinux.snapshot.state import StateView, SerializedView
+from visualinux.snapshot.snapshots import Snapshot
+
+import re
+import struct
+
+# the binary snapshot format (cbor-v1) for the NEW command, decoded by visualizer/src/visual/wire.ts.
+# The document is a CBOR array [version, strings, command, snKey, snapshot], where every repeated string
+# (type tags, labels, view names, text values...) is an index into the string table,
+# and entity keys are indexes into the per-view key table, whose hex addresses are stored as integers.
+# Entities are stored column by column; see encode_view() for the layout.
+# A view synced in a worker process is kept as is, i.e. a plain CBOR map of its json form.
+# The format version is written in the document, and is the encoding name negotiated on /vcmd (see WIRE_ENCODING).
+WIRE_FORMAT = 'cbor-v1'
+WIRE_CONTENT_TYPE = 'application/cbor'
+
+# only canonical hex addresses, so that the key is restored exactly from the integer
+REGEX_ADDR_KEY = re.compile(r'0x(0|[1-9a-f][0-9a-f]*):(.*)')
+
+class CBORWriter:
+    '''A minimal CBOR (RFC 8949) encoder of json-like values into a growing buffer.
+    '''
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def head(self, major: int, n: int) -> None:
+        if n < 24:
+            self.buffer.append(major << 5 | n)
+        elif n < 0x100:
+            self.buffer += struct.pack('>BB', major << 5 | 24, n)
+        elif n < 0x10000:
+            self.buffer += struct.pack('>BH', major << 5 | 25, n)
+        elif n < 0x100000000:
+            self.buffer += struct.pack('>BI', major << 5 | 26, n)
+        else:
+            self.buffer += struct.pack('>BQ', major << 5 | 27, n)
+
+    def int(self, n: int) -> None:
+        if n >= 0:
+            self.head(0, n)
+        else:
+            self.head(1, -1 - n)
+
+    def text(self, s: str) -> None:
+        data = s.encode()
+        self.head(3, len(data))
+        self.buffer += data
+
+    def array(self, length: int) -> None:
+        self.head(4, length)
+
+    def map(self, length: int) -> None:
+        self.head(5, length)
+
+    def null(self) -> None:
+        self.buffer.append(0xf6)
+
+    def float(self, x: float) -> None:
+        self.buffer += struct.pack('>Bd', 0xfb, x)
+
+    def value(self, obj: Any) -> None:
+        if obj is None:
+            self.null()
+        elif isinstance(obj, bool):
+            self.buffer.append(0xf5 if obj else 0xf4)
+        elif isinstance(obj, int):
+            self.int(obj)
+        elif isinstance(obj, float):
+            self.float(obj)
+        elif isinstance(obj, str):
+            self.text(obj)
+        elif isinstance(obj, list | tuple):
+            self.array(len(obj))
+            for item in obj:
+                self.value(item)
+        elif isinstance(obj, dict):
+            self.map(len(obj))
+            for key, item in obj.items():
+                self.text(str(key))
+                self.value(item)
+        else:
+            raise fuck_exc(TypeError, f'cbor: unsupported value {obj!r}')
+
+class WireEncoder:
+    '''Encode a snapshot command into the cbor-v1 format.
+    '''
+    def __init__(self) -> None:
+        self.out = CBORWriter()
+        self.strings: dict[str, int] = {}
+        # keys of the view being encoded => their indexes in its key table
+        self.keys: dict[str, int] = {}
+
+    def sid(self, s: str | None) -> None:
+        '''write an interned string as its index in the string table, or null.
+        '''
+        if s is None:
+            self.out.null()
+        else:
+            self.out.int(self.strings.setdefault(s, len(self.strings)))
+
+    def ref(self, key: str | None) -> None:
+        '''write an entity key as its index in the key table of the view, or null.
+        '''
+        if key is None:
+            self.out.null()
+        else:
+            self.out.int(self.keys.setdefault(key, len(self.keys)))
+
+    def encode(self, command: str, snapshot: Snapshot) -> bytes:
+        body = self.out
+        body.array(4)
+        self.sid(snapshot.key)
+        self.sid(str(snapshot.pc))
+        body.float(snapshot.timestamp)
+        body.array(len(snapshot.views))
+        for view in snapshot.views:
+            self.encode_view(view)
+        # the string table is only known after the body is encoded
+        doc = CBORWriter()
+        doc.array(5)
+        doc.text(WIRE_FORMAT)
+        doc.array(len(self.strings))
+        for s in self.strings:
+            doc.text(s)
+        doc.text(command)
+        doc.text(snapshot.key)
+        return bytes(doc.buffer + body.buffer)
+
+    def encode_view(self, view: StateView | SerializedView) -> None:
+        '''view := [name, stat, plot, boxes, containers, init_attrs, keys]
+           boxes := [types, addrs, labels, parents, absts, truncated], one column per field
+           absts[i] := [[name, parent, labels, kinds, args, refs] for each view of the box],
+               where kinds are 0 (text: args = type, refs = value), 1 (link: args = type, refs = target) and 2 (box: refs = object)
+           containers := [types, addrs, labels, parents, sources, members, cursors, cycles],
+               where source is null for a plain container, and only a container conv has one
+           members[i] := [[key, links | null] for each member], links := [labels, types, targets]
+           keys := [addrs, types] of the key table, where addr is null if the key is not an address key
+        '''
+        out = self.out
+        if isinstance(view, SerializedView):
+            out.value(view.to_json())
+            return
+        self.keys = {}
+        boxes = list(view.pool.boxes.values())
+        containers = list(view.pool.containers.values())
+        for ent in boxes:
+            self.keys[ent.key] = len(self.keys)
+        for ent in containers:
+            self.keys[ent.key] = len(self.keys)
+        out.array(7)
+        self.sid(view.name)
+        out.int(int(view.error))
+        out.array(len(view.plot))
+        for key in view.plot:
+            self.ref(key)
+        self.encode_boxes(boxes)
+        self.encode_containers(containers)
+        out.value(view.db_attrs.to_json())
+        # the key table, including the keys only referred but not in the pool
+        out.array(2)
+        out.array(len(self.keys))
+        matches = [REGEX_ADDR_KEY.fullmatch(key) for key in self.keys]
+        for matched in matches:
+            out.int(int(matched.group(1), 16)) if matched else out.null()
+        out.array(len(self.keys))
+        for key, matched in zip(self.keys, matches):
+            self.sid(matched.group(2) if matched else key)
+
+    def encode_boxes(self, boxes: list[entity.Box]) -> None:
+        out = self.out
+        out.array(6)
+        out.array(len(boxes))
+        for ent in boxes:
+            self.sid(ent.type)
+        out.array(len(boxes))
+        for ent in boxes:
+            out.int(ent.addr)
+        out.array(len(boxes))
+        for ent in boxes:
+            self.sid(ent.label)
+        out.array(len(boxes))
+        for ent in boxes:
+            self.ref(ent.parent)
+        out.array(len(boxes))
+        for ent in boxes:
+            out.array(len(ent.views))
+            for name, view in ent.views.items():
+                members = view.members
+                out.array(6)
+                self.sid(name)
+                self.sid(view.parent)
+                out.array(len(members))
+                for label in members:
+                    self.sid(label)
+                out.array(len(members))
+                for member in members.values():
+                    out.int(0 if isinstance(member, entity.Text) else 1 if isinstance(member, entity.Link) else 2)
+                out.array(len(members))
+                for member in members.values():
+                    if isinstance(member, entity.Text):
+                        self.sid(member.value.gtype.tag)
+                    elif isinstance(member, entity.Link):
+                        self.sid(member.link_type.name)
+                    else:
+                        out.null()
+                out.array(len(members))
+                for member in members.values():
+                    if isinstance(member, entity.Text):
+                        self.sid(member.real_value)
+                    elif isinstance(member, entity.Link):
+                        self.ref(member.target_key)
+                    elif isinstance(member, entity.BoxMember):
+                        self.ref(member.object_key)
+                    else:
+                        raise fuck_exc(AssertionError, f'wire: unknown member {member!s} of box {ent.key}')
+        out.array(len(boxes))
+        for ent in boxes:
+            out.value(ent.truncated)
+
+    def encode_containers(self, containers: list[entity.Container | entity.ContainerConv]) -> None:
+        out = self.out
+        out.array(8)
+        out.array(len(containers))
+        for ent in containers:
+            self.sid(ent.type if isinstance(ent, entity.Container) else None)
+        out.array(len(containers))
+        for ent in containers:
+            out.int(ent.addr)
+        out.array(len(containers))
+        for ent in containers:
+            self.sid(ent.label)
+        out.array(len(containers))
+        for ent in containers:
+            self.ref(ent.parent)
+        out.array(len(containers))
+        for ent in containers:
+            self.ref(ent.source.key) if isinstance(ent, entity.ContainerConv) else out.null()
+        out.array(len(containers))
+        for ent in containers:
+            out.array(len(ent.members))
+            for member in ent.members:
+                out.array(2)
+                self.ref(member.key)
+                if not member.links:
+                    out.null()
+                    continue
+                out.array(3)
+                out.array(len(member.links))
+                for label in member.links:
+                    self.sid(label)
+                out.array(len(member.links))
+                for link in member.links.values():
+                    self.sid(link.link_type.name)
+                out.array(len(member.links))
+                for link in member.links.values():
+                    self.ref(link.target_key)
+        out.array(len(containers))
+        for ent in containers:
+            cursor = ent.cursor if isinstance(ent, entity.Container) else None
+            out.value([cursor.addr, cursor.index] if cursor else None)
+        out.array(len(containers))
+        for ent in containers:
+            cycle = ent.cycle if isinstance(ent, entity.Container) else None
+            out.value([cycle.addr, cycle.index, cycle.length] if cycle else None)
+
+def encode_snapshot(command: str, snapshot: Snapshot) -> bytes:
+    return WireEncoder().encode(command, snapshot)
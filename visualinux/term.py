@@ -19,6 +19,7 @@ class TermType(Enum):
         return ''
 
 class Term:
+    __slots__ = ('category', 'head', 'field_seq', '__fmt_str')
 
     def __init__(self, category: TermType, head: str, field_seq: list[str]) -> None:
         self.category  = category
@@ -81,6 +82,8 @@ class Term:
         return Term(TermType.ItemVar, text, [])
 
 class TermAsShape(Term):
+    __slots__ = ()
+
     @classmethod
     def Variable(cls, text: str) -> 'TermAsShape':
         return TermAsShape(TermType.Variable, text, [])
@@ -0,0 +1,246 @@
+from visualinux import *
+
+import atexit
+import gzip
+import json
+import queue
+import threading
+import time
+import zlib
+import requests
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# bodies smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = 0x400
+# seconds to wait for the pending commands to be sent before gdb exits
+FLUSH_TIMEOUT = 10
+
+Body = bytes | Iterable[bytes]
+
+class TransportMetrics:
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.commands = 0
+        self.failures = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.serialize_ms = 0.0
+        self.compress_ms = 0.0
+        self.send_ms = 0.0
+
+    def show(self, name: str = 'transport') -> None:
+        print(f'{name} count_commands {self.commands}')
+        print(f'{name} count_failures {self.failures}')
+        print(f'{name} count_raw_bytes {self.raw_bytes}')
+        print(f'{name} count_sent_bytes {self.sent_bytes}')
+        print(f'{name} time_serialize_ms {int(self.serialize_ms)}')
+        print(f'{name} time_compress_ms {int(self.compress_ms)}')
+        print(f'{name} time_send_ms {int(self.send_ms)}')
+
+@dataclass
+class Request:
+    '''A command to be posted to the visualizer, whose body is serialized in the caller thread,
+       since serializing entities may touch gdb, which must never be done in the sender thread.
+    '''
+    name: str
+    body: Body
+    headers: dict[str, str]
+    serialize_ms: float = 0.0
+    # called (in the sender thread if async) once the visualizer accepts the command
+    on_sent: Callable[[], None] | None = None
+
+class Transport:
+    '''The connection to the visualizer /vcmd endpoint.
+       - a persistent session, so that back-to-back commands reuse one keep-alive connection;
+       - request bodies compressed if the visualizer accepts it (gzip, or zstd if zstandard is installed);
+       - a background sender thread with a bounded queue (if queue_size > 0), so that gdb is not blocked
+         while the visualizer ingests a large snapshot. Commands are always sent in the order of submission.
+         Streamed bodies are sent in the caller thread unless queue_streams, since serializing them may touch gdb,
+         and joining them to be queued would keep whole bodies in memory.
+    '''
+    def __init__(self, url: str, compression: str = TRANSPORT_COMPRESSION, queue_size: int = TRANSPORT_QUEUE_SIZE,
+                 queue_streams: bool = TRANSPORT_QUEUE_STREAMS, timeout: float = TRANSPORT_TIMEOUT) -> None:
+        self.url = url
+        self.compression = compression
+        self.queue_streams = queue_streams
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({'Accept': 'text/plain'})
+        # the session is used by both the sender thread and the probe in the caller thread
+        self.lock = threading.Lock()
+        # (content encodings, body encodings) advertised by the visualizer, unknown until the first response
+        self.advertised: tuple[set[str], set[str]] | None = None
+        self.metrics = TransportMetrics()
+        self.queue: queue.Queue[Request] | None = None
+        self.thread: threading.Thread | None = None
+        if queue_size > 0:
+            self.queue = queue.Queue(maxsize=queue_size)
+            self.thread = threading.Thread(target=self.__run, name='visualinux-transport', daemon=True)
+            self.thread.start()
+            atexit.register(self.flush, FLUSH_TIMEOUT)
+
+    @property
+    def is_async(self) -> bool:
+        return self.queue is not None
+
+    def accepts(self, encoding: str) -> bool:
+        '''whether the visualizer accepts the body encoding (e.g. cbor-v1), which is probed once by OPTIONS
+           and then kept up to date with the advertisement in each response.
+        '''
+        return encoding in self.__get_advertised()[1]
+
+    def submit(self, name: str, body: Body, headers: dict[str, str] | None = None, serialize_ms: float = 0.0,
+               on_sent: Callable[[], None] | None = None) -> None:
+        '''post a command to the visualizer, in the sender thread if async.
+           An iterable body is streamed by chunked transfer in this thread, after the pending commands are sent,
+           or joined here and queued if queue_streams.
+        '''
+        headers = {'Content-type': 'application/json'} | (headers or {})
+        if self.queue is None:
+            self.__send(Request(name, body, headers, serialize_ms, on_sent))
+            return
+        if not isinstance(body, bytes) and not self.queue_streams:
+            self.flush()
+            self.__send(Request(name, body, headers, serialize_ms, on_sent))
+            return
+        if not isinstance(body, bytes):
+            tstart = time.time()
+            body = b''.join(body)
+            serialize_ms += (time.time() - tstart) * 1000
+        # block if the queue is full, so that a slow visualizer throttles gdb instead of exhausting the memory
+        self.queue.put(Request(name, body, headers, serialize_ms, on_sent))
+
+    def submit_json(self, name: str, json_data: dict, on_sent: Callable[[], None] | None = None) -> None:
+        tstart = time.time()
+        body = json.dumps(json_data).encode()
+        self.submit(name, body, serialize_ms=(time.time() - tstart) * 1000, on_sent=on_sent)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        '''wait until all submitted commands are sent, and return False on timeout.
+        '''
+        if self.queue is None:
+            return True
+        if timeout is None:
+            self.queue.join()
+            return True
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                print(f'[WARNING] transport: {self.queue.unfinished_tasks} commands are not sent to visualizer')
+                return False
+            time.sleep(0.01)
+        return True
+
+    def __run(self) -> None:
+        assert self.queue is not None
+        while True:
+            request = self.queue.get()
+            try:
+                self.__send(request)
+            finally:
+                self.queue.task_done()
+
+    def __send(self, request: Request) -> None:
+        headers = dict(request.headers)
+        body, raw_bytes, compress_ms = self.__compress(request.body, headers)
+        tstart = time.time()
+        try:
+            with self.lock:
+                response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+            self.__update_advertised(response)
+            # the prompt may have been returned to gdb, so keep silent unless something goes wrong
+            if not response.ok:
+                print(f'[WARNING] POST {request.name} to visualizer {response}')
+            elif vl_debug_on():
+                printd(f'POST {request.name} to visualizer {response}')
+        except Exception as e:
+            self.metrics.failures += 1
+            print(f'[ERROR] Failed to POST data to visualizer; please check the connection.')
+            print(f'- {e!s}')
+            print(f'- url = {self.url}')
+            return
+        if response.ok and request.on_sent:
+            request.on_sent()
+        send_ms = (time.time() - tstart) * 1000
+        metrics = self.metrics
+        metrics.commands += 1
+        metrics.serialize_ms += request.serialize_ms
+        metrics.compress_ms += compress_ms
+        metrics.send_ms += send_ms
+        if isinstance(body, bytes):
+            metrics.raw_bytes += raw_bytes
+            metrics.sent_bytes += len(body)
+        if vl_perf_on():
+            size = f'{raw_bytes} => {len(body)} bytes' if isinstance(body, bytes) else 'streamed'
+            print(f'send {request.name}: serialize {int(request.serialize_ms)} ms, compress {int(compress_ms)} ms, send {int(send_ms)} ms ({size})')
+
+    def __compress(self, body: Body, headers: dict[str, str]) -> tuple[Body, int, float]:
+        '''compress the body with the configured encoding if accepted by the visualizer,
+           and return (body, raw size, milliseconds spent), where a streamed body is compressed while being sent.
+        '''
+        if not isinstance(body, bytes):
+            encoding = self.__choose_compression(None)
+            if encoding is None:
+                return body, 0, 0.0
+            headers['Content-Encoding'] = encoding
+            return compress_stream(body, encoding), 0, 0.0
+        encoding = self.__choose_compression(len(body))
+        if encoding is None:
+            return body, len(body), 0.0
+        tstart = time.time()
+        compressed = compress(body, encoding)
+        headers['Content-Encoding'] = encoding
+        return compressed, len(body), (time.time() - tstart) * 1000
+
+    def __choose_compression(self, size: int | None) -> str | None:
+        if self.compression == 'none' or (size is not None and size < COMPRESS_MIN_SIZE):
+            return None
+        if self.compression == 'zstd' and zstandard is None:
+            if vl_debug_on(): printd(f'transport: zstandard is not installed, fallback to gzip')
+            encoding = 'gzip'
+        else:
+            encoding = self.compression
+        return encoding if encoding in self.__get_advertised()[0] else None
+
+    def __get_advertised(self) -> tuple[set[str], set[str]]:
+        if self.advertised is None:
+            try:
+                with self.lock:
+                    response = self.session.options(self.url, timeout=5)
+                self.__update_advertised(response)
+            except Exception as e:
+                if vl_debug_on(): printd(f'transport: probe failed: {e!s}')
+                return set(), {'json'}
+        assert self.advertised is not None
+        return self.advertised
+
+    def __update_advertised(self, response: requests.Response) -> None:
+        def parse(header: str, default: str) -> set[str]:
+            return {item.strip() for item in response.headers.get(header, default).split(',')}
+        self.advertised = (parse('X-Visualinux-Content-Encodings', ''), parse('X-Visualinux-Encodings', 'json'))
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=TRANSPORT_COMPRESS_LEVEL)
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor().compress(data)
+    raise fuck_exc(ValueError, f'transport: unsupported compression {encoding}')
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Generator[bytes, None, None]:
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(TRANSPORT_COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    elif encoding == 'zstd' and zstandard is not None:
+        compressor = zstandard.ZstdCompressor().compressobj()
+    else:
+        raise fuck_exc(ValueError, f'transport: unsupported compression {encoding}')
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
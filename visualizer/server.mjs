@@ -4,6 +4,7 @@ import express from 'express';
 import bodyParser from 'body-parser';
 import { createServer } from 'vite';
 import fs from 'fs';
+import zlib from 'zlib';
 import { exec } from 'child_process';
 
 import './loadenv.mjs';
@@ -13,6 +14,31 @@ const __rootdir = path.dirname(path.dirname(__filename));
 
 const app = express();
 
+// request bodies compressed by gzip are inflated by body-parser itself,
+// while zstd needs a node with zstd support in zlib, and is decompressed here before body-parser.
+const CONTENT_ENCODINGS = ['gzip', ...(zlib.zstdDecompressSync ? ['zstd'] : [])];
+
+app.use((req, res, next) => {
+    if (req.get('Content-Encoding') !== 'zstd' || !zlib.zstdDecompressSync) {
+        next();
+        return;
+    }
+    const chunks = [];
+    req.on('data', chunk => chunks.push(chunk));
+    req.on('error', next);
+    req.on('end', () => {
+        try {
+            const data = zlib.zstdDecompressSync(Buffer.concat(chunks));
+            // mark the body as parsed, so that the body parsers skip it
+            req._body = true;
+            req.body = req.is('json') ? JSON.parse(data.toString()) : data;
+            next();
+        } catch (error) {
+            next(error);
+        }
+    });
+});
+
 // Configure body parser before other middleware
 app.use(bodyParser.json({ limit: '100mb' }));
 app.use(bodyParser.urlencoded({ limit: '100mb', extended: true }));
@@ -34,10 +60,36 @@ app.use(vite.middlewares);
 const MAX_SSE_CLIENTS = 99;
 let sseClients = [];
 
-app.post('/vcmd', express.json(), (req, res) => {
-    const data = JSON.stringify(req.body);
+// binary snapshot encodings accepted by /vcmd besides json, advertised to the sender in each response.
+// A binary command is forwarded to SSE clients as base64 and decoded in the browser (see src/visual/wire.ts).
+const WIRE_ENCODINGS = ['json', 'cbor-v1'];
+const WIRE_CONTENT_TYPE = 'application/cbor';
+
+const advertiseEncodings = (res) => res.set({
+    'X-Visualinux-Encodings': WIRE_ENCODINGS.join(','),
+    'X-Visualinux-Content-Encodings': CONTENT_ENCODINGS.join(','),
+});
+
+app.options('/vcmd', (req, res) => {
+    advertiseEncodings(res).sendStatus(204);
+});
+
+app.post('/vcmd', express.raw({ type: WIRE_CONTENT_TYPE, limit: '100mb' }), express.json(), (req, res) => {
+    advertiseEncodings(res);
+    let data;
+    if (req.is(WIRE_CONTENT_TYPE)) {
+        const encoding = req.get('X-Visualinux-Encoding');
+        if (!WIRE_ENCODINGS.includes(encoding)) {
+            res.status(415).send(`Unsupported encoding ${encoding} for /vcmd`);
+            return;
+        }
+        data = JSON.stringify({ encoding, payload: req.body.toString('base64') });
+        console.log(`/vcmd received data (${encoding}, ${req.body.length} bytes)`);
+    } else {
+        data = JSON.stringify(req.body);
+        console.log('/vcmd received data');
+    }
     const event = `data: ${data}\n\n`;
-    console.log('/vcmd received data');
     sseClients.forEach(client => {
         client.write(event);
     });
@@ -1,6 +1,7 @@
 import { useContext, useEffect, useState } from "react";
 import { GlobalStateContext } from "@app/context/Context";
 import MainPane from "@app/panes";
+import { isWireMessage, decodeWireMessage } from "@app/visual/wire";
 
 export default function Main() {
     const { stateDispatch } = useContext(GlobalStateContext);
@@ -9,7 +10,10 @@ export default function Main() {
         setAvoidHydrationError(true);
         const eventSource = new EventSource('/sse');
         eventSource.addEventListener('message', function(event) {
-            const data = JSON.parse(event.data);
+            let data = JSON.parse(event.data);
+            if (isWireMessage(data)) {
+                data = decodeWireMessage(data);
+            }
             console.log('sse receive:', data);
             if (Array.isArray(data)) {
                 data.forEach(item => stateDispatch(item));
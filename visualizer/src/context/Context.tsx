@@ -1,7 +1,7 @@
 import { createContext, useReducer } from "react";
 import Snapshots from "./Snapshots";
 import Panels, { DisplayOption, SplitDirection } from "./Panels";
-import { Snapshot, ViewAttrs } from "@app/visual/types";
+import { Snapshot, SnapshotPatch, SnapshotDiff, ViewAttrs } from "@app/visual/types";
 import { addLogTo, LogEntry, LogType } from "@app/utils";
 
 class GlobalState {
@@ -41,7 +41,8 @@ const initialState = GlobalState.create();
 
 export type GlobalStateAction =
 | { command: 'NEW',    snKey: string, snapshot: Snapshot, pc: string, timestamp: string }
-| { command: 'DIFF',   snKeySrc: string, snKeyDst: string, trackedAddrs: number[] }
+| { command: 'PATCH',  snKey: string, baseSnKey: string | null, patch: SnapshotPatch }
+| { command: 'DIFF',   snKeySrc: string, snKeyDst: string, trackedAddrs: number[], diff?: SnapshotDiff | null }
 | { command: 'SPLIT',  pKey: number, direction: SplitDirection }
 | { command: 'PICK',   pKey: number, objectKey: string }
 | { command: 'USE',    pKey: number, snKey: string }
@@ -87,9 +88,13 @@ function globalStateDispatcher(state: GlobalState, action: GlobalStateAction) {
             console.log(`NEW ${action.snKey} ${action.snapshot.pc} ${action.snapshot.timestamp}`);
             state.snapshots.new(action.snKey, action.snapshot);
             return state.refresh();
+        case 'PATCH':
+            console.log(`PATCH ${action.snKey} ${action.baseSnKey} ${action.patch.pc} ${action.patch.timestamp}`);
+            state.snapshots.patch(action.snKey, action.baseSnKey, action.patch);
+            return state.refresh();
         case 'DIFF':
             console.log(`DIFF ${action.snKeySrc} ${action.snKeyDst} ${action.trackedAddrs.length}`);
-            state.snapshots.diff(action.snKeySrc, action.snKeyDst, action.trackedAddrs);
+            state.snapshots.diff(action.snKeySrc, action.snKeyDst, action.trackedAddrs, action.diff ?? null);
             return state.refresh();
         case 'SPLIT':
             console.log(`SPLIT ${action.pKey} ${action.direction}`);
@@ -1,15 +1,21 @@
 import { calcSnapshotDiff } from "@app/visual/diff";
-import { Snapshot } from "@app/visual/types";
+import { Snapshot, SnapshotPatch, SnapshotDiff, StateView } from "@app/visual/types";
 import { preprocess } from "@app/visual/preprocess";
 
+// max number of raw snapshots kept as the bases of PATCH commands
+const MAX_PATCH_BASES = 16;
+
 // we use the word "snapshot" instead of "state" to avoid confusion with the React concept of "state"
 // this is actually the state diff mentioned in our paper/docs
 export default class Snapshots {
     data: Snapshot[]
     dataIndex: Map<string, number>
+    // snapshots received by PATCH before preprocessing (which modifies shapes in place), in the order of arrival
+    patchBases: Map<string, Snapshot>
     constructor(data: Snapshot[] = []) {
         this.data = data;
         this.dataIndex = new Map();
+        this.patchBases = new Map();
     }
     //
     // context APIs
@@ -24,12 +30,49 @@ export default class Snapshots {
             return obj;
         }, {});
         snapshot.views = orderedViews;
-        // store
-        this.data.push(snapshot);
-        this.dataIndex.set(snKey, this.data.length - 1);
+        // store, where a snapshot sent again under its key (e.g. extended by vplot --more) replaces the stale one
+        const index = this.dataIndex.get(snKey);
+        if (index !== undefined) {
+            this.data[index] = snapshot;
+        } else {
+            this.data.push(snapshot);
+            this.dataIndex.set(snKey, this.data.length - 1);
+        }
         console.log('new snapshot OK', snKey, snapshot);
     }
-    diff(snKeySrc: string, snKeyDst: string, trackedAddrs: number[]) {
+    patch(snKey: string, baseSnKey: string | null, patch: SnapshotPatch) {
+        let base: Snapshot | undefined = undefined;
+        if (baseSnKey !== null) {
+            base = this.patchBases.get(baseSnKey);
+            if (base === undefined) {
+                throw new Error(`snapshots.patch(): base snapshot ${baseSnKey} of ${snKey} not found, please re-plot without --delta`);
+            }
+        }
+        // shapes of the raw snapshots are shared rather than copied, since they are never modified
+        const raw: Snapshot = { key: patch.key, views: {}, pc: patch.pc, timestamp: patch.timestamp };
+        for (const [name, viewPatch] of Object.entries(patch.views)) {
+            const pool = {
+                boxes:      { ...base?.views[name]?.pool.boxes },
+                containers: { ...base?.views[name]?.pool.containers },
+            };
+            for (const key of viewPatch.removed.boxes) {
+                delete pool.boxes[key];
+            }
+            for (const key of viewPatch.removed.containers) {
+                delete pool.containers[key];
+            }
+            Object.assign(pool.boxes, viewPatch.boxes);
+            Object.assign(pool.containers, viewPatch.containers);
+            raw.views[name] = new StateView(name, pool, viewPatch.plot, viewPatch.init_attrs, viewPatch.stat);
+        }
+        this.patchBases.delete(snKey);
+        this.patchBases.set(snKey, raw);
+        if (this.patchBases.size > MAX_PATCH_BASES) {
+            this.patchBases.delete(this.patchBases.keys().next().value!);
+        }
+        this.new(snKey, structuredClone(raw));
+    }
+    diff(snKeySrc: string, snKeyDst: string, trackedAddrs: number[], diff: SnapshotDiff | null = null) {
         const diffKey = `diff-${snKeySrc}-${snKeyDst}`;
         if (this.has(diffKey)) {
             return this.get(diffKey);
@@ -38,7 +81,7 @@ export default class Snapshots {
         const snDst = this.get(snKeyDst);
         if (snSrc === null) return snDst;
         if (snDst === null) return snSrc;
-        const snDiff = calcSnapshotDiff(diffKey, snSrc, snDst, trackedAddrs);
+        const snDiff = calcSnapshotDiff(diffKey, snSrc, snDst, trackedAddrs, diff);
         this.new(diffKey, snDiff);
     }
     //
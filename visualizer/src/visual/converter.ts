@@ -110,7 +110,7 @@ export class Converter {
         const abst = box.absts[this.istat.getShapeView(box.key)];
         const data = {
             key: box.key,
-            type: box.type, addr: box.addr, label: box.label,
+            type: box.type, addr: box.addr, label: boxLabel(box),
             members: this.convertBoxMembers(box, abst),
             parent: box.parent,
         };
@@ -126,7 +126,7 @@ export class Converter {
         }
         let nodeData: BoxNodeData = {
             key: container.key,
-            type: container.type, addr: container.addr, label: container.label,
+            type: container.type, addr: container.addr, label: containerLabel(container),
             members: {},
             parent: container.parent,
         };
@@ -210,7 +210,7 @@ export class Converter {
             type: 'container',
             data: {
                 key: container.key,
-                type: container.type, addr: container.addr, label: container.label,
+                type: container.type, addr: container.addr, label: containerLabel(container),
                 members: Object.values(container.members).filter(member => member.key !== null),
                 parent: container.parent,
             },
@@ -337,6 +337,26 @@ const getEdgeProp = (isDiffAdd: boolean | undefined) => {
     }
 }
 
+function boxLabel(box: Box) {
+    // stubs of recursions beyond VISUALINUX_MAX_RECURSION_DEPTH, whose members are not evaluated
+    if (box.truncated) {
+        return `${box.label} (recursion truncated)`;
+    }
+    return box.label;
+}
+
+function containerLabel(container: Container) {
+    // truncated containers can be continued by vplot --more <key>
+    if (container.truncated && container.cursor) {
+        return `${container.label} (truncated at #${container.cursor.index})`;
+    }
+    // corrupted lists whose last member links back to the member #index
+    if (container.cycle) {
+        return `${container.label} (cycle at #${container.cycle.index})`;
+    }
+    return container.label;
+}
+
 function shouldCompactContainer(container: Container) {
-    return ['[Array]', '[XArray]'].includes(container.type);
+    return ['[Array]', '[XArray]', '[MapleTree]'].includes(container.type);
 }
@@ -1,7 +1,9 @@
-import { Snapshot, StateView, Box, Abst, Container, ContainerMember } from "./types";
+import { Snapshot, StateView, Box, Abst, Container, ContainerMember, SnapshotDiff, StateViewDiff, ContainerDiff } from "./types";
 
-export function calcSnapshotDiff(diffKey: string, snSrc: Snapshot, snDst: Snapshot, trackedAddrs: number[]): Snapshot {
-    return new SnapshotDiffSynthesizer(diffKey, snSrc, snDst, trackedAddrs).synthesize();
+// with the diff document computed by the gdb stub, container members are aligned by its edit scripts
+// instead of being searched here, while boxes are still compared here since preprocess may have compacted them.
+export function calcSnapshotDiff(diffKey: string, snSrc: Snapshot, snDst: Snapshot, trackedAddrs: number[], diff: SnapshotDiff | null = null): Snapshot {
+    return new SnapshotDiffSynthesizer(diffKey, snSrc, snDst, trackedAddrs, diff).synthesize();
 }
 
 class SnapshotDiffSynthesizer {
@@ -10,12 +12,14 @@ class SnapshotDiffSynthesizer {
     snDst: Snapshot;
     snRes: Snapshot;
     trackedAddrs: number[];
-    constructor(key: string, snSrc: Snapshot, snDst: Snapshot, trackedAddrs: number[]) {
+    diff: SnapshotDiff | null;
+    constructor(key: string, snSrc: Snapshot, snDst: Snapshot, trackedAddrs: number[], diff: SnapshotDiff | null) {
         this.key = key;
         this.snSrc = JSON.parse(JSON.stringify(snSrc));
         this.snDst = JSON.parse(JSON.stringify(snDst));
         this.snRes = { key: key, views: {}, pc: '', timestamp: 0 };
         this.trackedAddrs = trackedAddrs;
+        this.diff = diff;
     }
     synthesize() {
         console.log('synthesize diff', this.snSrc, this.snDst);
@@ -49,10 +53,13 @@ class SnapshotDiffSynthesizer {
             }
         }
         // containers
+        const viewDoc = this.diff?.[viewname];
         for (const [key, containerDst] of Object.entries(viewDst.pool.containers)) {
             if (key in viewSrc.pool.containers) {
                 const containerSrc = viewSrc.pool.containers[key];
-                viewDiff.pool.containers[key] = this.calcContainerDiff(containerSrc, containerDst);
+                viewDiff.pool.containers[key] = viewDoc
+                    ? this.calcContainerDiffByDoc(containerSrc, containerDst, viewDoc)
+                    : this.calcContainerDiff(containerSrc, containerDst);
             } else {
                 viewDiff.pool.containers[key] = { ...containerDst };
             }
@@ -190,6 +197,7 @@ class SnapshotDiffSynthesizer {
             type: boxDst.type, label: boxDst.label,
             absts: {},
             parent: boxDst.parent,
+            truncated: boxDst.truncated,
         };
         // views one by one
         for (const [viewname, viewDst] of Object.entries(boxDst.absts)) {
@@ -248,24 +256,7 @@ class SnapshotDiffSynthesizer {
         for (const memberDst of containerDst.members) {
             const memberSrc = containerSrc.members.find(m => m.key === memberDst.key);
             if (memberSrc) {
-                const memberDiff: ContainerMember = {
-                    key: memberDst.key,
-                    links: {},
-                };
-                for (const [label, linkDst] of Object.entries(memberDst.links)) {
-                    if (label in memberSrc.links) {
-                        const linkSrc = memberSrc.links[label];
-                        if (linkSrc.target != linkDst.target) {
-                            memberDiff.links[label + '$old'] = { ...linkSrc };
-                            memberDiff.links[label + '$new'] = { ...linkDst };
-                        } else {
-                            memberDiff.links[label] = { ...linkDst };
-                        }
-                    } else {
-                        console.warn(`container member ${memberDst.key} has link ${label} not found in source`);
-                    }
-                }
-                containerDiff.members.push(memberDiff);
+                containerDiff.members.push(this.calcContainerMemberDiff(memberSrc, memberDst));
             } else {
                 containerDiff.members.push({ ...memberDst });
             }
@@ -278,4 +269,85 @@ class SnapshotDiffSynthesizer {
         }
         return containerDiff;
     }
+    private calcContainerDiffByDoc(containerSrc: Container, containerDst: Container, viewDoc: StateViewDiff): Container {
+        const containerDiff: Container = {
+            key: containerDst.key, addr: containerDst.addr,
+            type: containerDst.type, label: containerDst.label,
+            members: [],
+            parent: containerDst.parent,
+        };
+        // members of containers not listed in the document are not changed
+        const containerDoc: ContainerDiff | undefined = viewDoc.containers[containerDst.key];
+        if (containerDoc === undefined) {
+            containerDiff.members = containerDst.members.map(member => ({ ...member }));
+            return containerDiff;
+        }
+        const relinked = new Map<number, Set<string>>(containerDoc.relinked.map(([index, labels]) => [index, new Set(labels)]));
+        const membersSrc = containerSrc.members, membersDst = containerDst.members;
+        if (containerDoc.ordered) {
+            let i = 0, j = 0;
+            for (const [op, count] of containerDoc.ops) {
+                for (let k = 0; k < count; k++) {
+                    if (op == '=') {
+                        containerDiff.members.push(this.calcContainerMemberDiff(membersSrc[i++], membersDst[j], relinked.get(j)));
+                        j++;
+                    } else if (op == '-') {
+                        containerDiff.members.push({ ...membersSrc[i++] });
+                    } else {
+                        containerDiff.members.push({ ...membersDst[j++] });
+                    }
+                }
+            }
+            return containerDiff;
+        }
+        // unordered members are matched by key, where the k-th occurrences of a key are matched, and followed by those only in src
+        const membersSrcByKey = new Map<string | null, ContainerMember[]>();
+        for (const member of membersSrc) {
+            const members = membersSrcByKey.get(member.key);
+            if (members) {
+                members.push(member);
+            } else {
+                membersSrcByKey.set(member.key, [member]);
+            }
+        }
+        const paired: Set<ContainerMember> = new Set();
+        let j = 0;
+        for (const [op, count] of containerDoc.ops) {
+            for (let k = 0; op != '-' && k < count; k++, j++) {
+                const memberSrc = op == '=' ? membersSrcByKey.get(membersDst[j].key)?.shift() : undefined;
+                if (memberSrc !== undefined) {
+                    paired.add(memberSrc);
+                    containerDiff.members.push(this.calcContainerMemberDiff(memberSrc, membersDst[j], relinked.get(j)));
+                } else {
+                    containerDiff.members.push({ ...membersDst[j] });
+                }
+            }
+        }
+        for (const memberSrc of membersSrc) {
+            if (!paired.has(memberSrc)) {
+                containerDiff.members.push({ ...memberSrc });
+            }
+        }
+        return containerDiff;
+    }
+    private calcContainerMemberDiff(memberSrc: ContainerMember, memberDst: ContainerMember, relinked?: Set<string>): ContainerMember {
+        const memberDiff: ContainerMember = {
+            key: memberDst.key,
+            links: {},
+        };
+        for (const [label, linkDst] of Object.entries(memberDst.links)) {
+            if (label in memberSrc.links) {
+                const linkSrc = memberSrc.links[label];
+                if (relinked ? relinked.has(label) : linkSrc.target != linkDst.target) {
+                    memberDiff.links[label + '$old'] = { ...linkSrc };
+                    memberDiff.links[label + '$new'] = { ...linkDst };
+                } else {
+                    memberDiff.links[label] = { ...linkDst };
+                }
+            } else {
+                console.warn(`container member ${memberDst.key} has link ${label} not found in source`);
+            }
+        }
+        return memberDiff;
+    }
 }
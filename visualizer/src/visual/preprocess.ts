@@ -121,6 +121,6 @@ class ViewPreprocessor {
         this.view.pool.boxes[compacted.key] = compacted;
     }
     private shouldCompactContainer(container: Container) {
-        return ['[Array]', '[XArray]'].includes(container.type);
+        return ['[Array]', '[XArray]', '[MapleTree]'].includes(container.type);
     }
 }
@@ -98,6 +98,43 @@ export class StateView {
     }
 }
 
+// the changes of a snapshot relative to a base snapshot of the same diagram, sent by the PATCH command
+export type SnapshotPatch = {
+    key: string
+    views: {[name: string]: StateViewPatch}
+    pc: string
+    timestamp: number
+}
+
+export type StateViewPatch = {
+    name: string
+    plot: ShapeKey[]
+    init_attrs: ViewAttrs
+    stat: number
+    boxes: {[key: ShapeKey]: Box}
+    containers: {[key: ShapeKey]: Container}
+    removed: {
+        boxes:      ShapeKey[]
+        containers: ShapeKey[]
+    }
+}
+
+// the diff of two snapshots computed by the gdb stub (see visualinux/snapshot/diff.py), sent by the DIFF command
+export type SnapshotDiff = {[name: string]: StateViewDiff}
+
+export type StateViewDiff = {
+    added:      ShapeKey[]
+    removed:    ShapeKey[]
+    boxes:      {[key: ShapeKey]: {[name: AbstName]: Label[]}}
+    containers: {[key: ShapeKey]: ContainerDiff}
+}
+
+export type ContainerDiff = {
+    ordered:  boolean
+    ops:      ['=' | '-' | '+', number][]
+    relinked: [number, Label[]][]
+}
+
 export type Pool = {
     boxes: {[key: ShapeKey]: Box},
     containers: {[key: ShapeKey]: Container}
@@ -116,6 +153,7 @@ export type Box = {
     label:  string
     absts:  {[name: AbstName]: Abst}
     parent: ShapeKey | null
+    truncated?: boolean
 }
 
 export type Abst = {
@@ -148,6 +186,20 @@ export type Container = {
     label:   string
     members: ContainerMember[]
     parent:  ShapeKey | null
+    truncated?: boolean
+    cursor?:    ContainerCursor | null
+    cycle?:     ContainerCycle | null
+}
+
+export type ContainerCursor = {
+    addr:  string
+    index: number
+}
+
+export type ContainerCycle = {
+    addr:   string
+    index:  number
+    length: number
 }
 
 export type ContainerMember = {
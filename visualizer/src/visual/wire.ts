@@ -0,0 +1,230 @@
+// decoder of the binary snapshot format (cbor-v1) encoded by visualinux/snapshot/wire.py,
+// which rebuilds the same json objects as if the command were sent in json.
+
+import {
+    Snapshot, Box, Abst, Member, Container, ContainerMember, LinkMember, ViewAttrs,
+} from "@app/visual/types";
+
+export type WireMessage = {
+    encoding: string
+    payload:  string
+}
+
+export function isWireMessage(data: any): data is WireMessage {
+    return typeof data === 'object' && data !== null && typeof data.encoding === 'string';
+}
+
+export function decodeWireMessage(message: WireMessage): any {
+    if (message.encoding !== 'cbor-v1') {
+        throw new Error(`decodeWireMessage: unsupported encoding ${message.encoding}`);
+    }
+    const binary = atob(message.payload);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return decodeSnapshotCommand(bytes);
+}
+
+//
+// CBOR (RFC 8949) subset: integers (bigint beyond 2^53), text strings, arrays, maps, null, booleans and floats
+//
+
+type CBORValue = number | bigint | string | boolean | null | CBORValue[] | {[key: string]: CBORValue}
+
+class CBORReader {
+    private view: DataView
+    private offset: number = 0
+    private textDecoder = new TextDecoder()
+    constructor(private bytes: Uint8Array) {
+        this.view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    }
+    private argument(info: number): number | bigint {
+        if (info < 24) {
+            return info;
+        }
+        const offset = this.offset;
+        switch (info) {
+            case 24: this.offset += 1; return this.view.getUint8(offset);
+            case 25: this.offset += 2; return this.view.getUint16(offset);
+            case 26: this.offset += 4; return this.view.getUint32(offset);
+            case 27: {
+                this.offset += 8;
+                const n = this.view.getBigUint64(offset);
+                return n <= BigInt(Number.MAX_SAFE_INTEGER) ? Number(n) : n;
+            }
+        }
+        throw new Error(`cbor: unsupported argument ${info} at ${offset}`);
+    }
+    private length(info: number): number {
+        const n = this.argument(info);
+        if (typeof n === 'bigint') {
+            throw new Error(`cbor: length ${n} too large`);
+        }
+        return n;
+    }
+    read(): CBORValue {
+        const head = this.view.getUint8(this.offset++);
+        const major = head >> 5, info = head & 0x1f;
+        switch (major) {
+            case 0: return this.argument(info);
+            case 1: {
+                const n = this.argument(info);
+                return typeof n === 'bigint' ? -1n - n : -1 - n;
+            }
+            case 3: {
+                const length = this.length(info);
+                this.offset += length;
+                return this.textDecoder.decode(this.bytes.subarray(this.offset - length, this.offset));
+            }
+            case 4: {
+                const length = this.length(info);
+                const array: CBORValue[] = new Array(length);
+                for (let i = 0; i < length; i++) {
+                    array[i] = this.read();
+                }
+                return array;
+            }
+            case 5: {
+                const length = this.length(info);
+                const map: {[key: string]: CBORValue} = {};
+                for (let i = 0; i < length; i++) {
+                    const key = this.read();
+                    map[String(key)] = this.read();
+                }
+                return map;
+            }
+            case 7: {
+                const offset = this.offset;
+                switch (info) {
+                    case 20: return false;
+                    case 21: return true;
+                    case 22: return null;
+                    case 23: return null;
+                    case 26: this.offset += 4; return this.view.getFloat32(offset);
+                    case 27: this.offset += 8; return this.view.getFloat64(offset);
+                }
+            }
+        }
+        throw new Error(`cbor: unsupported head ${head} at ${this.offset - 1}`);
+    }
+}
+
+//
+// cbor-v1 schema, whose layout is documented in WireEncoder.encode_view()
+//
+
+type Int = number | bigint
+type Ref = number | null
+
+const KIND_TEXT = 0;
+const KIND_LINK = 1;
+
+function hexAddr(addr: Int): string {
+    return addr < 0 ? '-0x' + (-addr).toString(16) : '0x' + addr.toString(16);
+}
+
+export function decodeSnapshotCommand(bytes: Uint8Array): any {
+    const [version, strings, command, snKey, body] = new CBORReader(bytes).read() as [string, string[], string, string, CBORValue[]];
+    if (version !== 'cbor-v1') {
+        throw new Error(`decodeSnapshotCommand: unsupported version ${version}`);
+    }
+    const str = (sid: CBORValue): string => strings[sid as number];
+    const strOrNull = (sid: CBORValue): string | null => sid === null ? null : strings[sid as number];
+    const [key, pc, timestamp, views] = body as [number, number, number, CBORValue[]];
+    const snapshot: Snapshot = {
+        key: str(key),
+        views: {},
+        pc: str(pc),
+        timestamp: timestamp,
+    };
+    for (const view of views) {
+        if (!Array.isArray(view)) {
+            // a view synced in a worker process is kept in the json form
+            const data = view as any;
+            snapshot.views[data.name] = data;
+            continue;
+        }
+        const [name, stat, plot, boxes, containers, initAttrs, keyTable] = view as [
+            number, number, Ref[], CBORValue[], CBORValue[], ViewAttrs, [(Int | null)[], number[]]
+        ];
+        const [keyAddrs, keyTypes] = keyTable;
+        const keys: string[] = keyAddrs.map((addr, i) => addr === null ? str(keyTypes[i]) : hexAddr(addr) + ':' + str(keyTypes[i]));
+        const ref = (index: CBORValue): string | null => index === null ? null : keys[index as number];
+        const pool = { boxes: {} as {[key: string]: Box}, containers: {} as {[key: string]: Container} };
+        // boxes and containers take the leading indexes of the key table in order
+        const [bTypes, bAddrs, bLabels, bParents, bAbsts, bTruncated] = boxes as [number[], Int[], number[], Ref[], CBORValue[][][], boolean[]];
+        for (let i = 0; i < bTypes.length; i++) {
+            const absts: {[name: string]: Abst} = {};
+            for (const [abstName, parent, labels, kinds, args, refs] of bAbsts[i] as [number, Ref, number[], number[], Ref[], Ref[]][]) {
+                const members: {[label: string]: Member} = {};
+                for (let j = 0; j < labels.length; j++) {
+                    if (kinds[j] === KIND_TEXT) {
+                        members[str(labels[j])] = { class: 'text', type: str(args[j]), value: strOrNull(refs[j]) } as Member;
+                    } else if (kinds[j] === KIND_LINK) {
+                        members[str(labels[j])] = { class: 'link', type: str(args[j]), target: ref(refs[j]) } as Member;
+                    } else {
+                        members[str(labels[j])] = { class: 'box', object: ref(refs[j]) } as Member;
+                    }
+                }
+                absts[str(abstName)] = { parent: strOrNull(parent), members };
+            }
+            pool.boxes[keys[i]] = {
+                key:    keys[i],
+                type:   str(bTypes[i]),
+                addr:   hexAddr(bAddrs[i]),
+                label:  str(bLabels[i]),
+                absts:  absts,
+                parent: ref(bParents[i]),
+                truncated: bTruncated[i],
+            };
+        }
+        const [cTypes, cAddrs, cLabels, cParents, cSources, cMembers, cCursors, cCycles] = containers as [
+            Ref[], Int[], number[], Ref[], Ref[], [Ref, [number[], number[], Ref[]] | null][][], ([Int, number] | null)[], ([Int, number, number] | null)[]
+        ];
+        for (let i = 0; i < cTypes.length; i++) {
+            const index = bTypes.length + i;
+            const members: ContainerMember[] = cMembers[i].map(([key, links]) => {
+                const xlinks: {[label: string]: LinkMember} = {};
+                if (links !== null) {
+                    const [labels, types, targets] = links;
+                    for (let j = 0; j < labels.length; j++) {
+                        xlinks[str(labels[j])] = { class: 'link', type: str(types[j]) as LinkMember['type'], target: ref(targets[j]) };
+                    }
+                }
+                return { key: ref(key), links: xlinks };
+            });
+            if (cSources[i] !== null) {
+                pool.containers[keys[index]] = {
+                    source:  ref(cSources[i]),
+                    key:     keys[index],
+                    addr:    '-1',
+                    label:   str(cLabels[i]),
+                    members: members,
+                    parent:  ref(cParents[i]),
+                } as unknown as Container;
+                continue;
+            }
+            const cursor = cCursors[i], cycle = cCycles[i];
+            pool.containers[keys[index]] = {
+                key:       keys[index],
+                type:      str(cTypes[i]),
+                addr:      hexAddr(cAddrs[i]),
+                label:     str(cLabels[i]),
+                members:   members,
+                parent:    ref(cParents[i]),
+                truncated: cursor !== null,
+                cursor:    cursor === null ? null : { addr: hexAddr(cursor[0]), index: cursor[1] },
+                cycle:     cycle === null ? null : { addr: hexAddr(cycle[0]), index: cycle[1], length: cycle[2] },
+            };
+        }
+        snapshot.views[str(name)] = {
+            name:       str(name),
+            pool:       pool,
+            plot:       plot.map(key => ref(key) as string),
+            init_attrs: initAttrs,
+            stat:       stat,
+        } as any;
+    }
+    return { command, snKey, snapshot };
+}